@@ -50,11 +50,16 @@ def run_designer(args):
 
     ##Also don't forget, when running a new config to i.e. rebuild the icons and stuff
 
-    from .runners import async_run_designer, async_stop_designer
     from inkBoard import logging as ib_logging
 
     ib_logging.init_logging()
 
+    if getattr(args, "headless", False):
+        from .headless import run_headless
+        return run_headless(args)
+
+    from .runners import async_run_designer, async_stop_designer
+
     try:
         asyncio.run(async_run_designer(args))
     except KeyboardInterrupt:
@@ -75,4 +80,19 @@ def _add_parser(parser: "argparse._SubParsersAction", name: str):
     designer_parser.add_argument(const.ARGUMENT_CONFIG, nargs="?",
                                 help="The YAML file used for the dashboard", default=None)
 
+    designer_parser.add_argument("--headless", action="store_true",
+                                help="Run the config without the designer window, rendering into memory. Useful for testing dashboards on machines without a display.")
+    designer_parser.add_argument("--frames", default=None,
+                                help="Headless mode: folder to save every printed frame to as png")
+    designer_parser.add_argument("--touch-script", default=None,
+                                help="Headless mode: json file with a list of touches (time, x, y and type) to send once printing starts")
+    designer_parser.add_argument("--replay-speed", type=float, default=1,
+                                help="Headless mode: speed to replay the touch script at. Use 0 to replay as fast as possible")
+    designer_parser.add_argument("--duration", type=float, default=None,
+                                help="Headless mode: seconds to run for before quitting")
+    designer_parser.add_argument("--screenshot", default=None,
+                                help="Headless mode: file to save the final screen image to")
+    designer_parser.add_argument("--startup-report", default=None,
+                                help="json file to write the duration of each startup phase to, to compare startup times")
+
     return
@@ -1,8 +1,6 @@
 import pkgutil
 from pathlib import Path
 
-import ttkbootstrap as ttk
-
 from inkBoard.constants import INKBOARD_COLORS, ARGUMENT_CONFIG
 from PythonScreenStackManager.devices.const import CANVASNAME
 
@@ -33,11 +31,16 @@ for i, mod in enumerate(RELOAD_MODULES):
 HIGHLIGHT_VAR_NAME = "hightlight" ##These have to correspond to the value in the settings
 SAVEAS_VAR_NAME = "saveas"
 DARKMODE_VAR_NAME = "darkmode"
+PROFILER_VAR_NAME = "profiler"
 
 LIST_VAR_NAME = "treeview-list-variable" ##Maybe this one not but will have to see obviously
 ELEMENT_TREE_OPTION = "Elements"
+PROFILER_TREE_OPTION = "Refresh Budget"
 NO_TREE_OPTION = "None"
 
+PROFILER_MAX_RECORDS = 500
+"Maximum amount of element updates kept by the refresh profiler (and shown in its tree)"
+
 CANVAS_NAME = CANVASNAME
 SCREEN_TAG = "pssm-screen"
 UI_FRAME_NAME = "designer-ui-frame"
@@ -67,11 +70,12 @@ THEME_DARK = "darkly"
 THEME_LIGHT = "yeti"
 TREEVIEW_STYLE = "custom.Treeview"
 SCROLLBAR_STYLE = "dark.Round.Vertical.TScrollbar"
-FEATURE_FRAME_STYLE = ttk.PRIMARY
+FEATURE_FRAME_STYLE = "primary"
 LOADBAR_LABEL_STYLE = "loadbar.TLabel"
 
 BUTTON_STYLE = "custom.TButton"
-TOOLTIP_STYLE = (ttk.DARK, ttk.INVERSE)
+##Bootstyle names are used as strings, so the constants (and the headless emulator) do not need tkinter
+TOOLTIP_STYLE = ("dark", "inverse")
 
 INTERACT_CURSOR = "hand2"
 
@@ -95,7 +99,7 @@ SETTINGS_HEIGHT = int(INTERFACE_WIDTH*0.3)
 SETTINGS_WIDTH = int(INTERFACE_WIDTH/4)
 SETTINGS_PADDING = 5
 LIST_WIDTH = 20 #This value is gotten via trial and error, for an INTERFACE_WIDTH of 200; tkinter width's are just kind of an illusion generally
-DEFAULT_LIST_OPTIONS = ["None", "Elements"]
+DEFAULT_LIST_OPTIONS = ["None", "Elements", "Refresh Budget"]
 
 HA_FONT_NAME = "Quicksand-bold.ttf"
 HA_FONT_FILE = PSSM_FOLDER / "fonts" / HA_FONT_NAME
@@ -113,9 +117,15 @@ CONFIG_OPEN_TIP = "Choose a config file to run."
 DARKMODE_TIP = "Toggle Dark Mode"
 HIGHLIGHT_TIP = "Highlight elements in the dashboard when selecting them in the entity or element list"
 SAVEAS_TIP = "Show a file explorer window when making a screenshot"
+PROFILER_TIP = "Time element updates and show them in the refresh budget list. Slows down updates a little while on."
 TREE_REFRESH_TIP = "Refresh the current treeview"
 
 CONFIG_OPTIONS_TIP = "Info on the currently opened config (if any), or open a new config."
+PROFILER_EXPORT_TIP = "Export the timings in the refresh budget list to a csv file."
+TOUCH_RECORD_TIP = "Record touches on the dashboard, and save them as a touch script when stopping."
+TOUCH_REPLAY_TIP = "Replay a touch script at its recorded speed, and log the time until each touch shows on screen."
+TOUCH_BENCHMARK_TIP = "Replay a touch script as fast as possible, and log the time until each touch shows on screen."
+STARTUP_EXPORT_TIP = "Export the duration of each startup phase to a json file, to compare startup times."
 DEVICE_TIP = "Info on the currently running device (if any), as well as some settings to alter emulation behaviour."
 
 DEFAULT_ELEMENT_ICON = "mdi:shape"
@@ -9,6 +9,7 @@ DEFAULT_DEVICE_SCHEMA = {
     "width": None,
     "height": None,
     "refresh_rate": 20,
+    "refresh_cost": None,
     "features": {
         FEATURES.FEATURE_NETWORK: True,
         FEATURES.FEATURE_INTERACTIVE: True,
@@ -26,5 +27,8 @@ SCREEN_TYPES = {
     "e-ink": "L"
 }
 
+HEADLESS_DEFAULT_SIZE = (800, 600)
+"Screen size used by the headless device if neither the config nor the platform set it"
+
 PLATFORM_FOLDER = Path(__file__).parent.parent / "platforms"
 "Folder holding the available platforms."
\ No newline at end of file
@@ -6,6 +6,7 @@ import typing
 from typing import *
 import random as rnd
 import json
+import time
 
 from pathlib import Path
 from math import ceil
@@ -20,15 +21,19 @@ from inkBoarddesigner.platforms.desktop import device
 from inkBoard.platforms.basedevice import InkboardDeviceFeatures, FEATURES
 
 from PythonScreenStackManager.devices import PSSMdevice, windowed
+from PythonScreenStackManager import tools
 from PythonScreenStackManager.tools import DummyTask, TouchEvent
 from PythonScreenStackManager import constants as pssmconst
 
 from . import const, pssm_functions
+from .profiler import RefreshProfiler, UpdateRecord
+from .touchreplay import TouchRecorder, TouchReplayer, TouchScriptEntry, format_latency_report
 
 from ..tkinter import window
 from ..tkinter.windows import DesignerWindow
 from ..tkinter.widgets import PSSMCanvas
 from .. import const as des_const
+from ..settings import EM_SETTINGS
 
 if TYPE_CHECKING:
     from inkBoard import config
@@ -182,6 +187,16 @@ class Device(device.Device):
                 _LOGGER.warning(f"Cannot validate config for platform {emulated_platform}, no emulator.json file")
 
         self._canvasLock = asyncio.Lock()
+        self._presentTask: asyncio.Task = DummyTask()
+        self._pendingImage: Image.Image = None
+        self._pendingArea: tuple[int,int,int,int] = None
+        self._framesPresented = 0
+        self._framesDropped = 0
+        self._pendingWaveform: str = None
+        self._pendingRecords: list[UpdateRecord] = []
+        self._profiler = RefreshProfiler()
+        self._touchRecorder = TouchRecorder()
+        self._touchReplayer: TouchReplayer = None
 
         ##These should be checked and be settable by reading out the config
         
@@ -207,6 +222,8 @@ class Device(device.Device):
         features = InkboardDeviceFeatures(**device_map["features"])
 
         self.refresh_rate = device_map["refresh_rate"]
+        self._refreshCostModel = RefreshCostModel(device_map["refresh_cost"])
+        self._waveform = self._refreshCostModel.default_waveform
 
         if "screen_mode" in device_map:
             screenMode = device_map["screenmode"]
@@ -276,6 +293,36 @@ class Device(device.Device):
         "The tkinter canvas widget that displays the PSSM screen image."
         return window.screenCanvas
 
+    @property
+    def framesPresented(self) -> int:
+        "The amount of frames that have been drawn on the canvas"
+        return self._framesPresented
+
+    @property
+    def framesDropped(self) -> int:
+        "The amount of frames that were merged into a newer frame before they could be drawn on the canvas"
+        return self._framesDropped
+
+    @property
+    def profiler(self) -> RefreshProfiler:
+        "Profiler timing element updates and the regions they print"
+        return self._profiler
+
+    @property
+    def touchRecorder(self) -> TouchRecorder:
+        "Recorder for touches on the canvas"
+        return self._touchRecorder
+
+    @property
+    def refreshCostModel(self) -> "RefreshCostModel":
+        "Model used to emulate the time the panel of the emulated platform takes to refresh. Only enabled if the platform's emulator.json provides a refresh_cost table."
+        return self._refreshCostModel
+
+    @property
+    def waveform(self) -> str:
+        "The waveform used to emulate refresh costs of printed regions"
+        return self._waveform
+
     @property
     def screenImage(self) -> Image.Image:
         "The actual image pictured on the screen, as gotten from PSSM. (I.e. the stack)"
@@ -337,6 +384,12 @@ class Device(device.Device):
         return
 
     def _quit(self, exce):
+        if self._refreshCostModel.enabled:
+            report = self._refreshCostModel.report()
+            _LOGGER.info(f"Emulated panel spent {report['refresh_time']:.2f}s refreshing over {report['elapsed']:.2f}s ({report['duty_cycle']:.1%})")
+
+        self._profiler.uninstall()
+
         for widget, seq, funcid in self._bound:
             if funcid in self.window._keep_bound:
                 continue
@@ -346,19 +399,158 @@ class Device(device.Device):
                 continue
         return
 
-    async def _update_canvas(self, img: Image.Image = None):
-        """Called by the base windowed device print_pil to update the canvas. Asyncio Lock is implemented to emulate device frame rates."""
-        img = img.copy()
+    def print_pil(self, img: Image.Image, x: int, y: int, isInverted=False):
+        """Prints a pillow image onto the screen at the provided coordinates.
+
+        Works the same as the windowed device, except that only the area that was printed is passed on to the canvas.
+
+        Parameters
+        ----------
+        img : Image.Image
+            the image object to be printed
+        x : int
+            x coordinates on the screen where the top left corner of the image will be placed.
+        y : int
+            y coordinates on the screen where the top left corner of the image will be placed.
+        isInverted : bool, optional
+            inverts the image before printing, by default False
+        """
+
+        if isInverted:
+            img = tools.invert_Image(img)
+
+        if img.mode == "RGBA" and self.screenMode == "RGBA":
+            self.screenImage.alpha_composite(img, (x,y))
+        elif "A" in img.mode:
+            self.screenImage.paste(img,(x,y), mask=img)
+        else:
+            self.screenImage.paste(img,(x,y))
+
+        box = self._get_region_box(x, y, img.size)
+        if box == None:
+            return
+
+        self.last_printed_PIL.paste(self.screenImage.crop(box), box[:2])
+        record = self._profiler.register_print(box)
+        if self.parentPSSMScreen.printing:
+            asyncio.run_coroutine_threadsafe(
+                self._update_canvas(self.last_printed_PIL, box, record),
+                loop=self.parentPSSMScreen.mainLoop
+            )
+
+    def set_waveform(self, mode: str = None):
+        """Sets the waveform used to emulate the refresh cost of printed regions.
+
+        Parameters
+        ----------
+        mode : str, optional
+            The waveform to use, i.e. 'A2', 'DU' or 'WFM_GC16'. By default None, which resets it to the default waveform of the platform.
+        """
+        if mode == None:
+            mode = self._refreshCostModel.default_waveform
+        else:
+            mode = RefreshCostModel.normalise_waveform(mode)
+
+        if self._refreshCostModel.enabled and mode not in self._refreshCostModel.waveforms:
+            _LOGGER.warning(f"Platform {self.emulated_platform} has no refresh cost for waveform {mode}. Refreshes will be emulated using the default waveform.")
+        self._waveform = mode
+
+    def refresh_screen(self):
+        "Emulates a full refresh of the screen, which redraws the entire canvas using the platform's full refresh waveform."
+        self._pendingWaveform = RefreshCostModel.FULL_REFRESH
+        asyncio.run_coroutine_threadsafe(
+            self._update_canvas(self.last_printed_PIL),
+            loop=self.parentPSSMScreen.mainLoop
+        )
+
+    def _get_region_box(self, x: int, y: int, size: tuple[int,int]) -> Optional[tuple[int,int,int,int]]:
+        "Returns the (left, upper, right, lower) box of a printed region, clipped to the screen size. None if the region falls outside the screen."
+        (w, h) = size
+        box = (max(x,0), max(y,0),
+            min(x + w, self.screenWidth), min(y + h, self.screenHeight))
+        if box[0] >= box[2] or box[1] >= box[3]:
+            return None
+        return box
+
+    async def _update_canvas(self, img: Image.Image = None, area: tuple[int,int,int,int] = None, record: UpdateRecord = None):
+        """Called by print_pil to update the canvas.
+        
+        Updates are coalesced: only the newest image is kept, and the regions that changed are merged until the next refresh tick draws them.
+        The Asyncio Lock is implemented to emulate device frame rates.
+
+        Parameters
+        ----------
+        img : Image.Image
+            The full screen image
+        area : tuple[int,int,int,int], optional
+            The (left, upper, right, lower) box of the region that changed, by default None, which updates the full canvas.
+        record : UpdateRecord, optional
+            The profiler record of the element update that printed the region, if any.
+        """
+        if area == None:
+            area = (0, 0, *img.size)
+
+        if record != None:
+            self._profiler.mark_queued(record)
+            self._pendingRecords.append(record)
+
+        if self._pendingArea == None:
+            self._pendingArea = area
+        else:
+            self._framesDropped += 1
+            self._pendingArea = (min(self._pendingArea[0], area[0]), min(self._pendingArea[1], area[1]),
+                                max(self._pendingArea[2], area[2]), max(self._pendingArea[3], area[3]))
+        self._pendingImage = img
+
+        if self._presentTask.done():
+            self._presentTask = asyncio.create_task(self._present_canvas())
+        return
+
+    async def _present_canvas(self):
+        "Draws the pending region on the canvas once per refresh tick, until no updates are pending anymore."
         async with self._canvasLock:
-            await asyncio.sleep(1/self.refresh_rate)
-            tkthread.call_nosync(self.__print_on_canvas, img)
+            while self._pendingArea != None:
+                if self._refreshCostModel.enabled:
+                    ##The panel is busy while refreshing, so the region is taken before waiting. Anything printed in the meantime is drawn in the next refresh.
+                    (img, area, waveform, records) = self.__take_pending_frame()
+                    cost = self._refreshCostModel.add_refresh(waveform, area)
+                    await asyncio.sleep(max(1/self.refresh_rate, cost))
+                else:
+                    await asyncio.sleep(1/self.refresh_rate)
+                    (img, area, _, records) = self.__take_pending_frame()
+                self._profiler.mark_presented(*records)
+                tkthread.call_nosync(self.__print_on_canvas, img, area[:2])
+                self._framesPresented += 1
+                if self._touchReplayer != None:
+                    self._touchReplayer.mark_presented()
         return
 
-    def __print_on_canvas(self, img):
-        self._canvasImageTk = ImageTk.PhotoImage(img)
-        if self._canvasImageTag:
-            self.canvas.itemconfig(self._canvasImageTag, image = self._canvasImageTk)
+    def __take_pending_frame(self) -> tuple[Image.Image, tuple[int,int,int,int], str, list[UpdateRecord]]:
+        "Returns the pending region, the box it covers, the waveform to refresh it with and the profiler records that printed it, and clears the pending frame."
+        area = self._pendingArea
+        img = self._pendingImage.crop(area)
+        waveform = self._pendingWaveform or self._waveform
+        records = self._pendingRecords
+        self._pendingArea = None
+        self._pendingImage = None
+        self._pendingWaveform = None
+        self._pendingRecords = []
+        return (img, area, waveform, records)
+
+    def __print_on_canvas(self, img: Image.Image, xy: tuple[int,int] = (0,0)):
+        ##A single PhotoImage is kept for the screen. Regions are copied into it, so Tk only has to upload the part that changed.
+        full_size = (self.screenWidth, self.screenHeight)
+        if img.size == full_size or (self._canvasImageTk.width(), self._canvasImageTk.height()) != full_size:
+            if img.size != full_size:
+                img = self.last_printed_PIL.copy()
+            self._canvasImageTk = ImageTk.PhotoImage(img)
+            if self._canvasImageTag:
+                self.canvas.itemconfig(self._canvasImageTag, image = self._canvasImageTk)
         else:
+            regionTk = ImageTk.PhotoImage(img)
+            self.canvas.tk.call(str(self._canvasImageTk), "copy", str(regionTk), "-to", *xy)
+
+        if not self._canvasImageTag:
             self._canvasImageTag = self.canvas.create_image(0,0, anchor=tk.NW, image=self._canvasImageTk,
                                     tag=des_const.SCREEN_TAG) 
         self.canvas.update()
@@ -385,12 +577,45 @@ class Device(device.Device):
                 self._interactEvent.clear()
                 x, y = (self._lastEvent.x, self._lastEvent.y)
                 _LOGGER.verbose(f"Passing touch at {(x,y)} as {t}")
-                await self.eventQueue.put(TouchEvent(x,y,t))
+                touch = TouchEvent(x,y,t)
+                self._touchRecorder.record(touch)
+                await self.eventQueue.put(touch)
+
+    async def replay_touches(self, script: list[TouchScriptEntry], speed: Optional[float] = 1) -> dict:
+        """Replays a touch script on the screen, and measures the time from each touch until the next frame is drawn on the canvas.
+
+        Parameters
+        ----------
+        script : list[TouchScriptEntry]
+            The touches to replay
+        speed : Optional[float], optional
+            Speed to replay at, by default 1. None replays as fast as possible.
+
+        Returns
+        -------
+        dict
+            The latency report, see `TouchReplayer.report`
+        """
+        if self._touchReplayer != None:
+            _LOGGER.warning("Already replaying touches")
+            return {}
+
+        self._touchReplayer = TouchReplayer(self.eventQueue, script, speed)
+        try:
+            report = await self._touchReplayer.run()
+        finally:
+            self._touchReplayer = None
+        _LOGGER.info(f"Touch replay finished: {format_latency_report(report)}")
+        return report
 
 
     async def event_bindings(self, eventQueue = None, grabInput=False):
         pssm_functions.build_element_tree(self.Screen)
 
+        self._profiler.add_listener(pssm_functions.update_profiler_tree)
+        if EM_SETTINGS.getboolean(des_const.PROFILER_VAR_NAME):
+            self._profiler.install(self.Screen)
+
         if self.has_feature(FEATURES.FEATURE_INTERACTIVE):
             self._eventQueue = eventQueue
             self._interactEvent = asyncio.Event()
@@ -455,6 +680,102 @@ class Device(device.Device):
             _LOGGER.error(f"Platform {self.emulated_platform} does not support the power feature")
         _LOGGER.info("This would have rebooted the device")
 
+class RefreshCostModel:
+    """Emulates the time an e-ink panel needs to refresh a region.
+
+    The cost of a refresh is a fixed time per waveform, plus a time per megapixel of the refreshed region.
+    The table is read from the refresh_cost entry in a platform's emulator.json file.
+
+    Parameters
+    ----------
+    cost_table : dict
+        The refresh_cost table. Holds the key 'waveforms', mapping waveform names to a dict with 'base' and 'per_megapixel' times in seconds, and optionally 'default_waveform'.
+    """
+
+    FULL_REFRESH = "FULL"
+    "Waveform name used for full (flashing) screen refreshes"
+
+    def __init__(self, cost_table: Optional[dict]):
+        if not cost_table:
+            cost_table = {}
+
+        self._waveforms: dict[str,dict[str,float]] = {}
+        for waveform, cost in cost_table.get("waveforms", {}).items():
+            self._waveforms[self.normalise_waveform(waveform)] = {
+                "base": float(cost.get("base", 0)),
+                "per_megapixel": float(cost.get("per_megapixel", 0))}
+
+        self._default_waveform = self.normalise_waveform(cost_table.get("default_waveform", "AUTO"))
+        if self._waveforms and self._default_waveform not in self._waveforms:
+            _LOGGER.warning(f"Default waveform {self._default_waveform} has no refresh cost, using {next(iter(self._waveforms))}")
+            self._default_waveform = next(iter(self._waveforms))
+
+        self._startTime = time.monotonic()
+        self._refreshTime = 0.0
+        self._refreshCounts: dict[str,int] = {}
+
+    @staticmethod
+    def normalise_waveform(waveform: str) -> str:
+        "Returns the waveform name in uppercase, without a WFM_ prefix (as used by FBInk)"
+        waveform = waveform.upper().replace(" ", "_")
+        return waveform.removeprefix("WFM_")
+
+    #region
+    @property
+    def enabled(self) -> bool:
+        "Whether refresh costs are emulated"
+        return bool(self._waveforms)
+
+    @property
+    def waveforms(self) -> dict[str,dict[str,float]]:
+        "The waveforms that have a refresh cost"
+        return self._waveforms.copy()
+
+    @property
+    def default_waveform(self) -> str:
+        "The waveform used when none is set"
+        return self._default_waveform
+
+    @property
+    def refreshTime(self) -> float:
+        "The total time, in seconds, the emulated panel has spent refreshing"
+        return self._refreshTime
+    #endregion
+
+    def get_cost(self, waveform: str, area: tuple[int,int,int,int]) -> float:
+        """Returns the time, in seconds, the panel needs to refresh the area with the given waveform.
+
+        Parameters
+        ----------
+        waveform : str
+            The waveform to refresh with. Falls back to the default waveform if it has no cost.
+        area : tuple[int,int,int,int]
+            The (left, upper, right, lower) box of the region to refresh.
+        """
+        if not self.enabled:
+            return 0.0
+        cost = self._waveforms.get(self.normalise_waveform(waveform), self._waveforms[self._default_waveform])
+        megapixels = (area[2] - area[0])*(area[3] - area[1])/1_000_000
+        return cost["base"] + cost["per_megapixel"]*megapixels
+
+    def add_refresh(self, waveform: str, area: tuple[int,int,int,int]) -> float:
+        "Registers a refresh of the area in the totals, and returns its cost in seconds."
+        cost = self.get_cost(waveform, area)
+        waveform = self.normalise_waveform(waveform)
+        self._refreshTime += cost
+        self._refreshCounts[waveform] = self._refreshCounts.get(waveform, 0) + 1
+        return cost
+
+    def report(self) -> dict:
+        "Returns the total refresh time, the elapsed time since the model was created, the fraction of that time spent refreshing and the number of refreshes per waveform."
+        elapsed = time.monotonic() - self._startTime
+        return {
+            "refresh_time": self._refreshTime,
+            "elapsed": elapsed,
+            "duty_cycle": self._refreshTime/elapsed if elapsed else 0.0,
+            "refreshes": self._refreshCounts.copy()
+        }
+
 class Battery(device.BaseBattery):
     
     randomise = True
@@ -0,0 +1,194 @@
+"""
+Headless emulator device, which renders into an in-memory framebuffer instead of the designer window.
+Used to run dashboards without a display, i.e. for rendering tests and measuring render throughput.
+Does not import tkinter, so it can be used on machines without a display.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import *
+from pathlib import Path
+
+from PIL import Image
+
+from inkBoard.platforms.basedevice import Device as BaseDevice, InkboardDeviceFeatures, FEATURES
+
+from PythonScreenStackManager import tools
+
+from . import const
+from .touchreplay import TouchScriptEntry, TouchReplayer, format_latency_report
+
+if TYPE_CHECKING:
+    from inkBoard import config
+
+_LOGGER = logging.getLogger(__name__)
+
+class HeadlessDevice(BaseDevice):
+    """Emulator device without a window. Prints are pasted into an in-memory framebuffer.
+
+    Parameters
+    ----------
+    config : config
+        The inkBoard config
+    frame_folder : Union[str, Path], optional
+        Folder to save each printed frame into as a png file, by default None (frames are not saved)
+    touch_script : list[TouchScriptEntry], optional
+        Touches to send to the screen once printing has started, by default None
+    replay_speed : Optional[float], optional
+        Speed to replay the touch script at, by default 1. None replays it as fast as possible.
+    """
+
+    def __init__(self, config: "config", frame_folder: Union[str, Path] = None, touch_script: list[TouchScriptEntry] = None,
+                replay_speed: Optional[float] = 1):
+
+        emulated_platform: str = config.device["platform"]
+        platform_folder = const.PLATFORM_FOLDER / emulated_platform
+
+        emulator_conf = {}
+        if (platform_folder / "emulator.json").exists():
+            with open(platform_folder / "emulator.json") as f:
+                emulator_conf = json.load(f)
+
+        device_map = const.DEFAULT_DEVICE_SCHEMA.copy()
+        device_map.update(emulator_conf)
+        self._device_map = device_map
+
+        model = config.device.get("model", f"{emulated_platform.title()} Device")
+        self._emulated_platform = emulated_platform
+
+        width = config.device.get("width", device_map["width"]) or const.HEADLESS_DEFAULT_SIZE[0]
+        height = config.device.get("height", device_map["height"]) or const.HEADLESS_DEFAULT_SIZE[1]
+
+        screentype = device_map["screen_type"]
+        self._screenType = screentype
+        screenMode = const.SCREEN_TYPES.get(screentype.lower(), const.SCREEN_TYPES["default"])
+        imgMode = device_map.get("img_mode", f"{screenMode}A")
+        defaultColor = device_map.get("defaultColor",None)
+
+        features = InkboardDeviceFeatures(FEATURES.FEATURE_INTERACTIVE)
+
+        name = config.device.get("name", None) or "inkBoard Headless Emulator"
+        super().__init__(features, width, height, width, height,
+                        screenMode, imgMode, defaultColor, name = name)
+        self._model = f"Headless {model}"
+
+        self._screenImage = Image.new(screenMode, (width, height), None)
+        self.last_printed_PIL = self._screenImage.copy()
+
+        if frame_folder != None:
+            frame_folder = Path(frame_folder)
+            frame_folder.mkdir(parents=True, exist_ok=True)
+        self._frameFolder = frame_folder
+
+        self._touchScript = touch_script or []
+        self._replaySpeed = replay_speed
+        self._touchReplayer: TouchReplayer = None
+        self._touchReport: dict = {}
+        self._eventQueue: asyncio.Queue = None
+
+        self._framesPrinted = 0
+        self._printTime = 0.0
+        self._startTime = time.monotonic()
+        return
+
+    #region
+    @property
+    def emulated_platform(self) -> str:
+        "The platform being emulated"
+        return self._emulated_platform
+
+    @property
+    def screenType(self) -> str:
+        "The type of screen being emulated"
+        return self._screenType
+
+    @property
+    def screenImage(self) -> Image.Image:
+        "The framebuffer holding the current screen image"
+        return self._screenImage
+
+    @property
+    def eventQueue(self) -> Optional[asyncio.Queue]:
+        "The queue touch events are put into"
+        return self._eventQueue
+
+    @property
+    def framesPrinted(self) -> int:
+        "The amount of times print_pil has been called"
+        return self._framesPrinted
+
+    @property
+    def printTime(self) -> float:
+        "Total time, in seconds, spent pasting prints into the framebuffer (and saving them, if a frame folder is set)"
+        return self._printTime
+    #endregion
+
+    def print_pil(self, img: Image.Image, x: int, y: int, isInverted=False):
+        t = time.monotonic()
+        if isInverted:
+            img = tools.invert_Image(img)
+
+        if img.mode == "RGBA" and self.screenMode == "RGBA":
+            self._screenImage.alpha_composite(img, (x,y))
+        elif "A" in img.mode:
+            self._screenImage.paste(img, (x,y), mask=img)
+        else:
+            self._screenImage.paste(img, (x,y))
+
+        self.last_printed_PIL = self._screenImage
+        self._framesPrinted += 1
+
+        if self._frameFolder != None:
+            self._screenImage.save(self._frameFolder / f"frame_{self._framesPrinted:05d}.png")
+
+        self._printTime += time.monotonic() - t
+
+        if self._touchReplayer != None:
+            ##print_pil is generally called from a worker thread
+            self.parentPSSMScreen.mainLoop.call_soon_threadsafe(self._touchReplayer.mark_presented)
+        return
+
+    async def event_bindings(self, eventQueue: asyncio.Queue = None, grabInput=False):
+        self._eventQueue = eventQueue
+        self._startTime = time.monotonic()
+        if self._touchScript and eventQueue != None:
+            self.parentPSSMScreen.mainLoop.create_task(self.run_touch_script(self._touchScript))
+        return
+
+    async def run_touch_script(self, script: list[TouchScriptEntry]) -> dict:
+        """Replays the touches from a touch script into the event queue, and measures the time until each touch is printed.
+
+        Parameters
+        ----------
+        script : list[TouchScriptEntry]
+            The touches to send
+
+        Returns
+        -------
+        dict
+            The latency report, see `TouchReplayer.report`
+        """
+        self._touchReplayer = TouchReplayer(self._eventQueue, script, self._replaySpeed)
+        try:
+            self._touchReport = await self._touchReplayer.run()
+        finally:
+            self._touchReplayer = None
+        _LOGGER.info(f"Touch script finished: {format_latency_report(self._touchReport)}")
+        return self._touchReport
+
+    def report(self) -> dict:
+        "Returns the amount of printed frames, the time spent printing, the resulting frames per second and the touch latency report, if a touch script was run."
+        elapsed = time.monotonic() - self._startTime
+        return {
+            "frames": self._framesPrinted,
+            "print_time": self._printTime,
+            "elapsed": elapsed,
+            "fps": self._framesPrinted/elapsed if elapsed else 0.0,
+            "touches": self._touchReport.copy()
+        }
+
+    def save_screenshot(self, file: Union[str, Path]):
+        "Saves the current framebuffer to file"
+        self._screenImage.save(file)
@@ -0,0 +1,224 @@
+"""Profiles screen updates, to find out which elements use up the refresh budget of a dashboard.
+
+Element updates are timed by wrapping `Element.async_update` and the screen's `print_stack`.
+The emulator device attaches the regions it prints to the update being profiled, and marks them once they have been drawn on the canvas.
+"""
+
+import csv
+import logging
+import time
+from typing import *
+from pathlib import Path
+from collections import deque
+from contextvars import ContextVar
+from contextlib import suppress
+from dataclasses import dataclass, field
+from functools import wraps
+
+from PythonScreenStackManager import elements
+
+from .. import const as des_const
+
+if TYPE_CHECKING:
+    from PythonScreenStackManager.pssm.screen import PSSMScreen
+
+_LOGGER = logging.getLogger(__name__)
+
+CSV_COLUMNS = ("index", "element_id", "area", "generate_time", "print_time", "lock_wait", "total_time")
+
+@dataclass
+class UpdateRecord:
+    "Timings of a single element update, in seconds"
+
+    index: int
+    element_id: str
+    element: "elements.Element" = field(repr=False)
+    start: float = field(repr=False)
+
+    area: Optional[tuple[int,int,int,int]] = None
+    "The (left, upper, right, lower) box of the region printed during the update"
+
+    generate_time: float = 0.0
+    print_time: float = 0.0
+    lock_wait: Optional[float] = None
+    "Time between the region being queued and the canvas starting to draw it. None if nothing was drawn (yet)."
+
+    total_time: Optional[float] = None
+
+    queued: Optional[float] = field(default=None, repr=False)
+
+    def add_area(self, box: tuple[int,int,int,int]):
+        "Merges a printed box into the area of the record"
+        if self.area == None:
+            self.area = tuple(box)
+        else:
+            self.area = (min(self.area[0], box[0]), min(self.area[1], box[1]),
+                        max(self.area[2], box[2]), max(self.area[3], box[3]))
+
+    def as_row(self) -> tuple:
+        "Returns the record as a row for the profiler csv"
+        return (self.index, self.element_id, self.area, self.generate_time, self.print_time, self.lock_wait, self.total_time)
+
+_current_record: ContextVar[Optional[UpdateRecord]] = ContextVar("_current_record", default=None)
+
+class RefreshProfiler:
+    """Collects the timings of element updates.
+
+    Parameters
+    ----------
+    max_records : int, optional
+        The maximum amount of records to keep, by default `des_const.PROFILER_MAX_RECORDS`. Older records are discarded.
+    """
+
+    def __init__(self, max_records: int = des_const.PROFILER_MAX_RECORDS):
+        self._records: deque[UpdateRecord] = deque(maxlen=max_records)
+        self._listeners: list[Callable[[UpdateRecord],None]] = []
+        self._index = 0
+
+        self._screen: "PSSMScreen" = None
+        self._original_update = None
+        self._original_print_stack = None
+
+    #region
+    @property
+    def records(self) -> tuple[UpdateRecord,...]:
+        "The collected records, oldest first"
+        return tuple(self._records)
+
+    @property
+    def installed(self) -> bool:
+        "Whether the profiler is currently hooked into the elements and screen"
+        return self._screen != None
+    #endregion
+
+    def add_listener(self, listener: Callable[[UpdateRecord],None]):
+        "Adds a function that is called with a record when it is finished, or when its region has been drawn. Called from the inkBoard thread."
+        self._listeners.append(listener)
+
+    def install(self, screen: "PSSMScreen"):
+        "Hooks the profiler into `Element.async_update` and the `print_stack` method of the screen"
+        if self.installed:
+            return
+
+        self._screen = screen
+        self._original_update = elements.Element.async_update
+        self._original_print_stack = screen.print_stack
+
+        profiler = self
+        original_update = self._original_update
+
+        @wraps(original_update)
+        async def async_update(element: "elements.Element", *args, **kwargs):
+            if _current_record.get() != None:
+                ##Part of an update that is already being profiled, i.e. a layout updating its child elements
+                return await original_update(element, *args, **kwargs)
+
+            record = profiler._new_record(element)
+            token = _current_record.set(record)
+            updated = False
+            try:
+                updated = await original_update(element, *args, **kwargs)
+                return updated
+            finally:
+                _current_record.reset(token)
+                profiler._finish_record(record, bool(updated))
+
+        original_print_stack = self._original_print_stack
+
+        @wraps(original_print_stack)
+        async def print_stack(*args, **kwargs):
+            record = _current_record.get()
+            if record == None:
+                return await original_print_stack(*args, **kwargs)
+
+            t = time.monotonic()
+            try:
+                return await original_print_stack(*args, **kwargs)
+            finally:
+                record.print_time += time.monotonic() - t
+
+        elements.Element.async_update = async_update
+        screen.print_stack = print_stack
+        return
+
+    def uninstall(self):
+        "Removes the hooks set by `install`"
+        if not self.installed:
+            return
+
+        elements.Element.async_update = self._original_update
+        with suppress(AttributeError):
+            del self._screen.print_stack
+        self._screen = None
+        self._original_update = None
+        self._original_print_stack = None
+
+    def clear(self):
+        "Removes all collected records"
+        self._records.clear()
+
+    def register_print(self, box: tuple[int,int,int,int]) -> Optional[UpdateRecord]:
+        """Registers a region printed by the device. Returns the record of the update it is part of, if any.
+
+        Parameters
+        ----------
+        box : tuple[int,int,int,int]
+            The (left, upper, right, lower) box that was printed
+        """
+        record = _current_record.get()
+        if record != None:
+            record.add_area(box)
+        return record
+
+    def mark_queued(self, record: UpdateRecord):
+        "Marks the region of the record as being queued to be drawn on the canvas"
+        if record.queued == None:
+            record.queued = time.monotonic()
+
+    def mark_presented(self, *records: UpdateRecord):
+        "Marks the records' regions as being drawn on the canvas, which sets their lock wait time."
+        now = time.monotonic()
+        for record in records:
+            if record.queued == None:
+                continue
+            record.lock_wait = now - record.queued
+            record.queued = None
+            self._notify(record)
+
+    def export_csv(self, file: Union[str, Path]):
+        """Writes all collected records to a csv file
+
+        Parameters
+        ----------
+        file : Union[str, Path]
+            The file to write to
+        """
+        with open(file, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_COLUMNS)
+            for record in self.records:
+                writer.writerow(record.as_row())
+        _LOGGER.info(f"Exported {len(self._records)} refresh profiler records to {file}")
+
+    def _new_record(self, element: "elements.Element") -> UpdateRecord:
+        self._index += 1
+        record = UpdateRecord(self._index, element.id, element, time.monotonic())
+        self._records.append(record)
+        return record
+
+    def _finish_record(self, record: UpdateRecord, updated: bool):
+        record.total_time = time.monotonic() - record.start
+        record.generate_time = max(record.total_time - record.print_time, 0.0)
+        if not updated and record.area == None:
+            ##The element did not update, so there is nothing to profile
+            with suppress(ValueError):
+                self._records.remove(record)
+            return
+        self._notify(record)
+
+    def _notify(self, record: UpdateRecord):
+        for listener in self._listeners:
+            try:
+                listener(record)
+            except Exception as exce:
+                _LOGGER.error(f"Refresh profiler listener {listener} errored: {exce}")
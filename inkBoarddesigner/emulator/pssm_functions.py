@@ -25,6 +25,7 @@ from ..tkinter.widgets import Treeview
 
 if TYPE_CHECKING:
     from PythonScreenStackManager.pssm.screen import PSSMScreen
+    from .profiler import UpdateRecord
 
 _LOGGER = inkBoard.getLogger(__name__)
 
@@ -171,6 +172,38 @@ def build_element_tree(screen: "PSSMScreen", open_items: bool = False):
     treeview.enable()
     return
 
+def update_profiler_tree(record: "UpdateRecord"):
+    "Adds or updates the row of a refresh profiler record in the profiler tree. Can be called from any thread."
+    tkthread.call_nosync(_update_profiler_row, record)
+
+def _update_profiler_row(record: "UpdateRecord"):
+    treeview = tree_frame.profiler_tree
+    iid = str(record.index)
+
+    area = "" if record.area == None else f"{record.area[2]-record.area[0]}x{record.area[3]-record.area[1]}"
+    wait = "" if record.lock_wait == None else f"{record.lock_wait*1000:.0f}"
+    values = (area, f"{record.generate_time*1000:.0f}", f"{record.print_time*1000:.0f}", wait)
+
+    if treeview.exists(iid):
+        treeview.item(iid, values=values)
+        return
+
+    tree_frame.profiler_records[iid] = record
+    treeview.insert("", 0, iid=iid, text=record.element_id, values=values,
+                    image=tk_functions.get_element_tree_icon(record.element))
+
+    rows = treeview.get_children()
+    if len(rows) > const.PROFILER_MAX_RECORDS:
+        for old_iid in rows[const.PROFILER_MAX_RECORDS:]:
+            treeview.delete(old_iid)
+            tree_frame.profiler_records.pop(old_iid, None)
+
+def profiler_tree_selected(tree: Treeview, event, iids):
+    "Highlights the element of the selected refresh profiler record"
+    records = tree_frame.profiler_records
+    eltList = [records[iid].element for iid in iids if iid in records]
+    highlight_element(*eltList)
+
 def element_tree_selected(tree: Treeview, event, iid):
     "Figure out which element was selected in the element tree, and pass it on to the indicator function"
     if not EM_SETTINGS.getboolean(const.HIGHLIGHT_VAR_NAME):
@@ -304,4 +337,7 @@ def import_funcs():
     element_tree.on_double_click = tree_double_click
     element_tree.on_hover = show_element_tip
 
+    profiler_tree = tree_frame.profiler_tree
+    profiler_tree.on_select = profiler_tree_selected
+
 window.call_in_main_thread(import_funcs)
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+Recording and replaying touches, to benchmark how fast a dashboard responds to them.
+Recorded sessions are saved as touch scripts, which can be replayed by the emulator or the headless device.
+Does not import tkinter.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from math import ceil
+from typing import *
+from pathlib import Path
+from contextlib import suppress
+
+from PythonScreenStackManager.tools import TouchEvent
+from PythonScreenStackManager import constants as pssmconst
+
+_LOGGER = logging.getLogger(__name__)
+
+TOUCH_TYPES = {
+    "tap": pssmconst.TOUCH_TAP,
+    "long": pssmconst.TOUCH_LONG,
+    "press": pssmconst.TOUCH_PRESS,
+    "release": pssmconst.TOUCH_RELEASE,
+}
+"Touch types that can be used in touch scripts, mapped to their pssm constant"
+
+LATENCY_PERCENTILES = (50, 90, 99)
+"Percentiles of the touch latency included in replay reports"
+
+class TouchScriptEntry(TypedDict):
+    "An entry in a touch script file"
+
+    time: float
+    "Time, in seconds since the script started, at which to send the touch"
+    x: int
+    y: int
+    type: Literal["tap", "long", "press", "release"]
+    "The type of touch, by default tap"
+
+def load_touch_script(file: Union[str, Path]) -> list[TouchScriptEntry]:
+    """Reads a touch script from a json file, which holds a list of touch entries.
+
+    Parameters
+    ----------
+    file : Union[str, Path]
+        The json file to read
+
+    Returns
+    -------
+    list[TouchScriptEntry]
+        The entries, sorted by time
+    """
+    with open(file) as f:
+        script = json.load(f)
+
+    if not isinstance(script, list):
+        raise ValueError(f"Touch script {file} must hold a list of touch entries")
+
+    for entry in script:
+        entry.setdefault("type", "tap")
+        assert entry["type"] in TOUCH_TYPES, f"Touch script entry {entry} has an invalid type. Must be one of {tuple(TOUCH_TYPES)}"
+    return sorted(script, key=lambda entry: entry["time"])
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    "Returns the percentile of the values, using the nearest rank."
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = max(ceil(percent/100*len(ordered)) - 1, 0)
+    return ordered[min(idx, len(ordered) - 1)]
+
+
+class TouchRecorder:
+    "Records touch events with the time they happened, so they can be saved as a touch script."
+
+    def __init__(self):
+        self._entries: list[TouchScriptEntry] = []
+        self._startTime: Optional[float] = None
+
+    #region
+    @property
+    def recording(self) -> bool:
+        "Whether touches are currently being recorded"
+        return self._startTime != None
+
+    @property
+    def entries(self) -> list[TouchScriptEntry]:
+        "The recorded touches"
+        return self._entries.copy()
+    #endregion
+
+    def start(self):
+        "Starts a new recording, discarding any previously recorded touches"
+        self._entries = []
+        self._startTime = time.monotonic()
+        _LOGGER.info("Started recording touches")
+
+    def stop(self) -> list[TouchScriptEntry]:
+        "Stops recording, and returns the recorded touches"
+        self._startTime = None
+        _LOGGER.info(f"Stopped recording touches, recorded {len(self._entries)} touches")
+        return self.entries
+
+    def record(self, event: TouchEvent):
+        "Adds a touch event to the recording, if recording"
+        if not self.recording:
+            return
+
+        touch_type = next((name for name, const_type in TOUCH_TYPES.items() if const_type == event.touch_type), None)
+        if touch_type == None:
+            _LOGGER.warning(f"Cannot record touch of type {event.touch_type}")
+            return
+
+        self._entries.append({
+            "time": round(time.monotonic() - self._startTime, 4),
+            "x": event.x,
+            "y": event.y,
+            "type": touch_type
+        })
+
+    def save(self, file: Union[str, Path]):
+        "Saves the recorded touches as a touch script"
+        with open(file, "w") as f:
+            json.dump(self._entries, f, indent=4)
+        _LOGGER.info(f"Saved {len(self._entries)} recorded touches to {file}")
+
+
+class TouchReplayer:
+    """Replays a touch script into a touch queue, and measures the latency between putting a touch in the queue and the next frame being presented.
+
+    The device presenting the frames must call `mark_presented` whenever a frame is shown.
+
+    Parameters
+    ----------
+    queue : asyncio.Queue
+        The queue to put the touches into
+    script : list[TouchScriptEntry]
+        The touches to replay
+    speed : Optional[float], optional
+        Playback speed relative to the recorded timing, by default 1.
+        Use None to replay as fast as possible, which sends the next touch as soon as the previous one was presented (or `max_wait` elapsed).
+    max_wait : float, optional
+        Maximum time, in seconds, to wait for a frame after a touch before considering it as not presented, by default 2
+    """
+
+    def __init__(self, queue: asyncio.Queue, script: list[TouchScriptEntry], speed: Optional[float] = 1, max_wait: float = 2):
+        self._queue = queue
+        self._script = script
+        self._speed = speed
+        self._maxWait = max_wait
+
+        self._pending: list[tuple[int, float]] = []
+        self._latencies: dict[int, float] = {}
+        self._presentEvent = asyncio.Event()
+
+    #region
+    @property
+    def latencies(self) -> dict[int, float]:
+        "Latency, in seconds, of each replayed touch that was presented, by index in the script"
+        return self._latencies.copy()
+    #endregion
+
+    def mark_presented(self):
+        "Call when a frame has been presented. Sets the latency of all touches still waiting on a frame. Must be called from the event loop the replayer runs in."
+        now = time.monotonic()
+        for (idx, put_time) in self._pending:
+            self._latencies[idx] = now - put_time
+        self._pending = []
+        self._presentEvent.set()
+
+    async def run(self) -> dict:
+        "Replays the script and returns the latency report"
+        start = time.monotonic()
+        for idx, entry in enumerate(self._script):
+            if self._speed != None:
+                delay = entry["time"]/self._speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            touch_type = TOUCH_TYPES[entry.get("type", "tap")]
+            self._presentEvent.clear()
+            self._pending.append((idx, time.monotonic()))
+            await self._queue.put(TouchEvent(entry["x"], entry["y"], touch_type))
+
+            if self._speed == None:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._presentEvent.wait(), self._maxWait)
+
+        if self._pending:
+            ##Give the last touches some time to be presented
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._presentEvent.wait(), self._maxWait)
+        return self.report()
+
+    def report(self) -> dict:
+        "Returns the amount of touches sent and presented, and the latency percentiles in seconds"
+        values = list(self._latencies.values())
+        report = {
+            "touches": len(self._script),
+            "presented": len(values),
+        }
+        for p in LATENCY_PERCENTILES:
+            report[f"p{p}"] = percentile(values, p)
+        report["max"] = max(values, default=0.0)
+        return report
+
+def format_latency_report(report: dict) -> str:
+    "Returns a readable summary of a replay report"
+    percentiles = ", ".join(f"p{p} {report[f'p{p}']*1000:.0f}ms" for p in LATENCY_PERCENTILES)
+    return f"{report['presented']}/{report['touches']} touches presented; {percentiles}, max {report['max']*1000:.0f}ms"
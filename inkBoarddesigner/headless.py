@@ -0,0 +1,111 @@
+"""
+Runs inkBoard configs with the headless emulator device, without building the designer window.
+Goes through the same setup steps as the designer, but does not import tkinter.
+"""
+
+import asyncio
+import concurrent.futures
+from contextlib import suppress
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+
+from . import const, _LOGGER
+from .startup import async_setup_inkboard, StartupTimer
+
+if TYPE_CHECKING:
+    import argparse
+
+async def async_run_headless(config_file: Union[str, Path], frame_folder: Union[str, Path] = None,
+                            touch_script: Union[str, Path] = None, duration: float = None,
+                            screenshot: Union[str, Path] = None, replay_speed: Optional[float] = 1,
+                            startup_report: Union[str, Path] = None) -> dict:
+    """Sets up and runs an inkBoard config on the headless device.
+
+    Parameters
+    ----------
+    config_file : Union[str, Path]
+        The YAML file with the configuration
+    frame_folder : Union[str, Path], optional
+        Folder to save every printed frame to as png, by default None
+    touch_script : Union[str, Path], optional
+        json file with touches to send once printing has started, by default None
+    duration : float, optional
+        Time in seconds to run for after printing started, by default None, which runs until inkBoard quits.
+    screenshot : Union[str, Path], optional
+        File to save the final screen image to, by default None
+    replay_speed : Optional[float], optional
+        Speed to replay the touch script at, by default 1. None replays as fast as possible.
+    startup_report : Union[str, Path], optional
+        json file to write the startup timings to, by default None
+
+    Returns
+    -------
+    dict
+        The render report of the device, see `HeadlessDevice.report`, with the startup timings under the "startup" key
+    """
+
+    timer = StartupTimer()
+    timer.start_phase("Importing base functions")
+
+    from inkBoard import core as CORE, bootstrap
+    from inkBoard.helpers import QuitInkboard
+
+    from .integrationloader import HeadlessIntegrationLoader
+    from .emulator.headless import HeadlessDevice
+    from .emulator.touchreplay import load_touch_script
+
+    script = load_touch_script(touch_script) if touch_script else None
+
+    async def setup_device(core: "CORE") -> HeadlessDevice:
+        device = HeadlessDevice(core.config, frame_folder, script, replay_speed)
+        await asyncio.sleep(0)
+        return device
+
+    def log_progress(value, text=None):
+        if text: _LOGGER.debug(f"[{value}%] {text}")
+
+    with concurrent.futures.ThreadPoolExecutor(None, const.IMPORTER_THREADPOOL) as importer:
+        await async_setup_inkboard(CORE, config_file, HeadlessIntegrationLoader, setup_device, log_progress,
+                                importer, timer)
+    timer.finish(config_file)
+    timer.log()
+    if startup_report:
+        timer.save_json(startup_report)
+
+    device: HeadlessDevice = CORE.device
+    run_task = asyncio.create_task(bootstrap.run_core(CORE))
+    try:
+        await asyncio.wait_for(asyncio.shield(run_task), duration)
+    except asyncio.TimeoutError:
+        CORE.screen.quit(QuitInkboard("Headless run duration elapsed"))
+        with suppress(QuitInkboard, asyncio.CancelledError):
+            await run_task
+    except QuitInkboard:
+        pass
+
+    if screenshot:
+        device.save_screenshot(screenshot)
+        _LOGGER.info(f"Saved final screen to {screenshot}")
+
+    report = device.report()
+    report["startup"] = timer.report()
+    _LOGGER.info(f"Printed {report['frames']} frames in {report['print_time']:.2f}s ({report['fps']:.1f} frames per second over {report['elapsed']:.1f}s)")
+    return report
+
+def run_headless(args: "argparse.Namespace") -> int:
+    """Runs the config from the command line arguments on the headless device.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        Command line arguments
+    """
+
+    if not args.configuration:
+        _LOGGER.error("Running headless requires a configuration file")
+        return 1
+
+    replay_speed = args.replay_speed if args.replay_speed > 0 else None
+    asyncio.run(async_run_headless(args.configuration, args.frames, args.touch_script, args.duration, args.screenshot, replay_speed,
+                                    args.startup_report))
+    return 0
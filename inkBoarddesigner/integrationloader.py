@@ -3,17 +3,20 @@ Handler to load inkBoard integrations present in the designer etc. folder.
 """
 
 import importlib.util
-from typing import Callable, TYPE_CHECKING, Literal, Any
+from typing import Callable, TYPE_CHECKING, Literal, Any, Optional
 from types import MappingProxyType
 import logging
 from pathlib import Path
 import sys
 import asyncio
 import json
+import concurrent.futures
 
 from inkBoard import loaders
 from inkBoard.helpers import classproperty, reload_full_module
 
+from .settings import MANIFEST_INDEX_FILE
+
 _LOGGER = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
@@ -22,6 +25,21 @@ if TYPE_CHECKING:
 class IntegrationLoader(loaders.IntegrationLoader):
     "Provides bindings to load inkBoard integrations including those in the designer."
 
+    _integration_dependencies: dict[str,tuple[str,...]] = {}
+
+    _manifest_index: dict[str,dict] = None
+    "Cached manifests per integration folder. Holds the folder's mtime, and the mtime and contents of the manifest for each integration in it."
+    _manifest_index_changed: bool = False
+
+    _reload_integrations: set[str] = set()
+    "Integrations to reload when importing them next, regardless of `_reload_imports`"
+
+    _integrations_stopped: bool = True
+    "Whether the stop functions of the integrations that were set up last have been called"
+
+    _use_designer_modules: bool = True
+    "Whether to import the designer modules of integrations, which add their widgets to the designer window"
+
     @classproperty
     def integration_keys(cls) -> dict[str,str]:
         return cls._integration_keys.copy()
@@ -30,11 +48,18 @@ class IntegrationLoader(loaders.IntegrationLoader):
     def get_integrations(cls, folders: dict[str,Path]):
         #folders: dict with base module name mapped to the folder path
         cls._reset()
+        cls._integration_dependencies = {}
+
+        if cls._manifest_index == None:
+            cls._manifest_index = cls._load_manifest_index()
 
         for base_module, folder in folders.items():
             if folder.exists():
                 cls._read_out_folder(base_module, folder)
 
+        if cls._manifest_index_changed:
+            cls._save_manifest_index()
+
         return MappingProxyType(cls._installed_integrations)
     
     @classmethod
@@ -46,72 +71,225 @@ class IntegrationLoader(loaders.IntegrationLoader):
             cls._integration_keys[key] = module_name    ##This should go the other way around.
         return
 
+    @classmethod
+    def mark_for_reload(cls, *integrations: str):
+        """Marks integrations to be reloaded the next time integrations are imported.
+
+        Used to only reload the integrations that changed, instead of reloading all of them.
+
+        Parameters
+        ----------
+        integrations : str
+            Names of the integrations to reload
+        """
+        cls._reload_integrations = cls._reload_integrations | set(integrations)
+
     @classmethod
     def _read_out_folder(cls, base_module: str, folder: Path):
-        folders = folder.iterdir()
-        for int_dir in filter(lambda p: (p.is_dir() and not p.name.startswith("_")), folders):
-            if int_dir.name in cls._installed_integrations:
-                _LOGGER.info(f"Integration {int_dir.name} has already been found in module {cls._integration_modules[int_dir.name]}. Will not import from {base_module}")
+        for int_name, manifest in cls._get_folder_manifests(folder).items():
+            int_dir = folder / int_name
+            if int_name in cls._installed_integrations:
+                _LOGGER.info(f"Integration {int_name} has already been found in module {cls._integration_modules[int_name]}. Will not import from {base_module}")
                 continue
 
-            manifest = int_dir / "manifest.json"
-            if not manifest.exists():
+            if manifest == None:
                 _LOGGER.error(f"Integration folder {int_dir} is missing the manifest.json file.")
                 continue
-
-            with open(manifest) as f:
-                manifest = json.load(f)
                 ##Support for requirements has not yet been implemented
             
             if c := manifest.get("config_entry",False):
                 #Will require config_keys, similar to esphome, which can be left empty if needed.
-                name = f"{base_module}.{int_dir.name}"
+                name = f"{base_module}.{int_name}"
                                         
 
                 ##These should not be checked by config key (i.e., save the key in the dict entry); key should be the folder name.
                 cls.add_integration_config_key(c, name)
-                cls._installed_integrations[int_dir.name] = int_dir
-                cls._integration_modules[int_dir.name] = name
+                cls._installed_integrations[int_name] = int_dir
+                cls._integration_modules[int_name] = name
+                cls._integration_dependencies[int_name] = tuple(manifest.get("dependencies", []))
             else:
-                _LOGGER.error(f"Integrations are required to have a config_entry key {int_dir.name} does not")
+                _LOGGER.error(f"Integrations are required to have a config_entry key {int_name} does not")
                 continue
 
     @classmethod
-    def import_integrations(cls, core: "CORE", progress_func=None, value_range=()):
-        config = core.config
-        import_set: set[tuple[str, Path]] = set()
+    def _get_folder_manifests(cls, folder: Path) -> dict[str,Optional[dict]]:
+        """Returns the manifests of the integrations in folder, mapped to the name of the integration folder (None if it has no manifest).
 
-        ##Import custom via appending to path.
-        ##And I think just import via here, but make the set or something recognise the base package too.
-        ##Or save strings to the modules instead of their folders.
+        The folder is only scanned again if its mtime changed, and manifests are only parsed again if their mtime changed.
+        """
+        key = str(folder.absolute())
+        folder_mtime = folder.stat().st_mtime_ns
+        cached = cls._manifest_index.get(key, {"mtime": None, "integrations": {}})
+
+        if cached["mtime"] == folder_mtime:
+            int_names = list(cached["integrations"])
+        else:
+            int_names = sorted(p.name for p in folder.iterdir() if p.is_dir() and not p.name.startswith("_"))
+
+        integrations = {}
+        for int_name in int_names:
+            manifest_file = folder / int_name / "manifest.json"
+            try:
+                manifest_mtime = manifest_file.stat().st_mtime_ns
+            except FileNotFoundError:
+                manifest_mtime = None
+
+            cached_entry = cached["integrations"].get(int_name, None)
+            if cached_entry != None and cached_entry["mtime"] == manifest_mtime:
+                integrations[int_name] = cached_entry
+                continue
+
+            manifest = None
+            if manifest_mtime != None:
+                with open(manifest_file) as f:
+                    manifest = json.load(f)
+            integrations[int_name] = {"mtime": manifest_mtime, "manifest": manifest}
+            cls._manifest_index_changed = True
+
+        if cached["mtime"] != folder_mtime or integrations.keys() != cached["integrations"].keys():
+            cls._manifest_index_changed = True
+
+        cls._manifest_index[key] = {"mtime": folder_mtime, "integrations": integrations}
+        return {int_name: entry["manifest"] for int_name, entry in integrations.items()}
+
+    @classmethod
+    def _load_manifest_index(cls) -> dict[str,dict]:
+        if not MANIFEST_INDEX_FILE.exists():
+            return {}
+        try:
+            with open(MANIFEST_INDEX_FILE) as f:
+                index = json.load(f)
+            assert isinstance(index, dict)
+            return index
+        except (OSError, ValueError, AssertionError) as exce:
+            _LOGGER.warning(f"Unable to read the integration manifest index, integration folders will be scanned again: {exce}")
+            return {}
+
+    @classmethod
+    def _save_manifest_index(cls):
+        try:
+            with open(MANIFEST_INDEX_FILE, "w") as f:
+                json.dump(cls._manifest_index, f)
+            cls._manifest_index_changed = False
+        except OSError as exce:
+            _LOGGER.warning(f"Unable to save the integration manifest index: {exce}")
+
+    @classmethod
+    def import_integrations(cls, core: "CORE", progress_func=None, value_range=(), executor: concurrent.futures.Executor = None):
+        """Imports the integrations used in the config.
+
+        If an executor is passed, integrations are imported concurrently on it. An integration is only submitted once the integrations in the `dependencies` of its manifest have been imported.
+        Progress is reported as each import finishes, and the imported modules are always registered in alphabetical order.
+
+        Parameters
+        ----------
+        core : CORE
+            The inkBoard core module
+        progress_func : _type_, optional
+            Function to report progress to, by default None
+        value_range : tuple, optional
+            The (start, end) range of the progress, by default ()
+        executor : concurrent.futures.Executor, optional
+            Executor to import integrations on, by default None, which imports them one after another.
+        """
+        config = core.config
+        import_dict: dict[str,str] = {}
 
         for config_entry in cls._integration_keys:
             if config_entry in config.configuration:
-                import_set.add((config_entry, cls._integration_keys[config_entry]))
+                name = cls._integration_keys[config_entry]
+                import_dict[name.split(".")[-1]] = name
         
-        if not import_set: 
+        if not import_dict: 
             return
 
+        import_order = sorted(import_dict)
+
         if progress_func:
-            progress_func(value_range[0] + 1, f"Importing {len(import_set)} integrations")
-            step = int((value_range[1] - value_range[0] - 1)/len(import_set))
+            progress_func(value_range[0] + 1, f"Importing {len(import_dict)} integrations")
+            step = int((value_range[1] - value_range[0] - 1)/len(import_dict))
             progress = value_range[0] + 1
 
-        for (config_key, name) in import_set:
-            integration = name.split(".")[-1]
+        modules = {}
+
+        def register_import(integration, module):
+            nonlocal progress
             if progress_func:
                 progress = progress + step
-                progress_func(progress, f"Importing integration {integration}")
-            module = cls._import_integration(name)
+                progress_func(progress, f"Imported integration {integration}")
+            modules[integration] = module
+
+        if executor == None:
+            for integration in import_order:
+                register_import(integration, cls._import_integration(import_dict[integration]))
+        else:
+            cls._import_concurrently(import_dict, import_order, executor, register_import)
+
+        for integration in import_order:
+            module = modules.get(integration, None)
             if not module:
-                _LOGGER.warning(f"Unable to successfully import integration {integration} from {name}")
+                _LOGGER.warning(f"Unable to successfully import integration {integration} from {import_dict[integration]}")
             else:
                 cls._imported_modules[integration] = module
 
         cls._reload_imports = False
+        cls._reload_integrations = set()
         return
         ##See code in hass core: https://github.com/home-assistant/core/blob/ab5ddb8edfb72d5f5915574f642eba93afc5abdc/homeassistant/loader.py#L1669
 
+    @classmethod
+    def _import_concurrently(cls, import_dict: dict[str,str], import_order: list[str], executor: concurrent.futures.Executor,
+                            done_callback: Callable[[str, Any], None]):
+        #Submits integrations to the executor once their dependencies are imported, and calls done_callback in this thread as each finishes.
+        #Reloads alter modules that are already imported, which is not thread safe, so those are done one after another first.
+        waiting = []
+        for integration in import_order:
+            if cls._reloads_on_import(integration, import_dict[integration]):
+                done_callback(integration, cls._safe_import_integration(import_dict[integration]))
+            else:
+                waiting.append(integration)
+
+        finished = set(import_order).difference(waiting)
+        running: dict[concurrent.futures.Future, str] = {}
+
+        def submit_ready():
+            for integration in waiting.copy():
+                deps = [d for d in cls._integration_dependencies.get(integration, ()) if d in import_dict]
+                if all(d in finished for d in deps):
+                    waiting.remove(integration)
+                    fut = executor.submit(cls._safe_import_integration, import_dict[integration])
+                    running[fut] = integration
+
+        submit_ready()
+        while running:
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for fut in sorted(done, key=lambda f: running[f]):
+                integration = running.pop(fut)
+                ##Failed integrations count as finished too, so integrations depending on them still get their own import attempt
+                finished.add(integration)
+                done_callback(integration, fut.result())
+            submit_ready()
+
+        if waiting:
+            ##Only happens with circular dependencies
+            _LOGGER.warning(f"Integrations {waiting} have circular dependencies, importing them one after another")
+            for integration in waiting:
+                done_callback(integration, cls._safe_import_integration(import_dict[integration]))
+
+    @classmethod
+    def _reloads_on_import(cls, integration: str, name: str) -> bool:
+        "Whether importing the integration reloads modules that are already imported"
+        return name in sys.modules and (cls._reload_imports or integration in cls._reload_integrations)
+
+    @classmethod
+    def _safe_import_integration(cls, name):
+        #Imports an integration and logs any error, so one failing integration does not stop the others from being imported.
+        try:
+            return cls._import_integration(name)
+        except Exception as exce:
+            _LOGGER.error(f"Error importing integration {name}", exc_info=exce)
+            return None
+
     @classmethod
     def _import_integration(cls, name):
             
@@ -123,9 +301,11 @@ class IntegrationLoader(loaders.IntegrationLoader):
         ##So: make different file, like integration.py or something, that provided the hooks for the integration_loader
         ##Or simply make writers use the init to provide the correct hooks *shrug*
 
-        spec = importlib.util.find_spec(f"{name}.designer")
+        reload = cls._reload_imports or integration in cls._reload_integrations
+
+        spec = importlib.util.find_spec(f"{name}.designer") if cls._use_designer_modules else None
         if spec:
-            if f"{name}.designer" in sys.modules and cls._reload_imports:
+            if f"{name}.designer" in sys.modules and reload:
                 try:
                         reload_full_module(name)
                         module = sys.modules.get(name,None)
@@ -141,6 +321,9 @@ class IntegrationLoader(loaders.IntegrationLoader):
             except ImportError:
                 return
         else:
+            if name in sys.modules and reload and not cls._reload_imports:
+                ##The base loader only reloads when all imports are being reloaded
+                reload_full_module(name)
             return super()._import_integration(name)
 
     @classmethod
@@ -184,6 +367,7 @@ class IntegrationLoader(loaders.IntegrationLoader):
         if not cls._imported_modules:
             return MappingProxyType({})
 
+        cls._integrations_stopped = False
         if progress_func:
             progress_func(value_range[0] + 1, f"Importing {len(cls._imported_modules)} integrations")
             step = int((value_range[1] - value_range[0] - 1)/len(cls._imported_modules))
@@ -233,6 +417,43 @@ class IntegrationLoader(loaders.IntegrationLoader):
 
         return MappingProxyType(integration_objects)    
     
+    @classmethod
+    async def async_stop_integrations(cls, core: "CORE"):
+        """
+        Calls the stop functions of the integrations that were set up.
+        inkBoard only calls this itself when reloading from version 0.3.0 on, so the designer calls it when unloading as well. Integrations are only stopped once per setup.
+
+        Parameters
+        ----------
+        core : CORE
+            The inkBoard core module
+        """
+        if cls._integrations_stopped:
+            return
+        cls._integrations_stopped = True
+
+        for integration, module in cls._imported_modules.items():
+            setup_res = core.integration_objects.get(integration,None)
+
+            if hasattr(module,"async_stop"):
+                stop_func = module.async_stop
+            elif hasattr(module,"stop"):
+                stop_func = module.stop
+            else:
+                continue
+
+            if not isinstance(stop_func,Callable):
+                _LOGGER.error(f"{integration} does not have a valid stop function")
+                continue
+
+            try:
+                if asyncio.iscoroutinefunction(stop_func):
+                    await stop_func(core, setup_res)
+                else:
+                    stop_func(core, setup_res)
+            except Exception:
+                _LOGGER.exception(f"Unable to stop integration {integration}")
+
     @classmethod
     async def async_start_integrations(cls, core: "CORE"):
         """
@@ -368,3 +589,10 @@ class IntegrationLoader(loaders.IntegrationLoader):
                         _LOGGER.error(f"Integration {t.get_name()} ran into an error while running: {t.exception()}")
 
 
+class HeadlessIntegrationLoader(IntegrationLoader):
+    """Integration loader for the headless emulator.
+
+    Works the same as the designer loader, but does not import the designer modules of integrations, since those build widgets in the designer window and import tkinter.
+    """
+
+    _use_designer_modules = False
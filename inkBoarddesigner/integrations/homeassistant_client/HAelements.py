@@ -37,7 +37,7 @@ from .constants import UNAVAILABLE_COLOR, UNAVAILABLE_ICON, UNKNOWN_ICON, UNKNOW
 
 from .helpers import EntityType, WeatherData, stateDictType, triggerDictType, parse_entity_tag
 
-from . import trigger_functions as triggers
+from . import trigger_functions as triggers, conditions
 from .trigger_functions import set_trigger_function
 
 from . import icon_sets
@@ -261,6 +261,17 @@ class HAelement(elements.Element, metaclass=HAmetaElement): #, ABC):
         if not isinstance(value, dict):
             raise TypeError(f"{self}: Element state must be a dict, not {type(value)}: {value}.")
         self._state_styles = value.copy()
+        self._stateConditions = None
+
+    @property
+    def state_conditions(self) -> tuple[conditions.Condition, ...]:
+        "The keys in ``state_styles`` that are conditions, compiled. Compiled again when ``state_styles`` changes."
+        cached = getattr(self, "_stateConditions", None)
+        if cached == None or cached[0] is not self._state_styles:
+            ##Also checks the dict itself, since wrapping elements sets _state_styles directly
+            cached = (self._state_styles, conditions.compile_conditions(self._state_styles))
+            self._stateConditions = cached
+        return cached[1]
 
     @property
     def attribute_styles(self) -> triggers.attribute_stylesType:
@@ -417,6 +428,7 @@ class HAelement(elements.Element, metaclass=HAmetaElement): #, ABC):
             "entity": ("_entity",None),
             "entity_attribute": ("_entity_attribute",False),
             "state_styles": ("_state_styles",{}),
+            "state_conditions": ("_stateConditions", None),
             "attribute_styles" : ("_attribute_styles", []),
             "state_colors": ("_state_colors",False),
             "state_conditionals": ("_state_conditionals", False),
@@ -2471,7 +2483,7 @@ class MediaPlayer(_EntityLayout):
         else:
             self._optimistic_trigger["attributes"] = optmdict
 
-        self.HAclient.call_service(service="media_player.media_seek", target=self.entity, service_data={"seek_position": new_position})
+        self.HAclient.call_service(service="media_player.media_seek", target=self.entity, service_data={"seek_position": new_position}, debounce=True)
     
     def _set_volume(self, *args, new_volume : float = None):
         "Sets the volume of the media player. Uses the volume of the slider if new_volume is None."
@@ -2483,7 +2495,7 @@ class MediaPlayer(_EntityLayout):
         else:
             self._optimistic_trigger["attributes"] = {"volume_level": new_volume}
 
-        self.HAclient.call_service(service="media_player.volume_set", target=self.entity, service_data={"volume_level": new_volume})
+        self.HAclient.call_service(service="media_player.volume_set", target=self.entity, service_data={"volume_level": new_volume}, debounce=True)
     
     def _play_pause(self, *args, action : Literal["play","pause"] = None):
         "Toggles the state of the media player if action is not set. Otherwise does action"
@@ -3,7 +3,7 @@ This library manages elements from PSSM and linked entities from Home Assistant,
 Import it first, or at least before importing the element library to allow it to add to the PSSM default colors and fonts.
 """
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Literal
 from types import MappingProxyType
 import logging
 
@@ -53,6 +53,13 @@ async def async_start(core: "CORE", client : "client.HAclient"):
     await client.connect_client()
     return
 
+async def async_stop(core: "CORE", client : "client.HAclient"):
+    await client.async_flush_service_calls()
+    client.dispatcher.stop()
+    await client.httpSession.async_close()
+    client.stop_recording()
+    return
+
 class home_assistantMap(TypedDict):
     "Dict with settings required for the home assistant client"
 
@@ -70,7 +77,34 @@ class home_assistantMap(TypedDict):
     """
 
     ping_pong_interval : 'pssm.DurationType'
-    "Interval inbetween checking the connection to the server. Generally you can keep this undefined."
+    "Time without messages from the server before checking the connection to it with a ping. Generally you can keep this undefined."
+
+    group_subscriptions : bool
+    "Subscribe to the state changes of all entities with a single trigger, instead of one trigger per entity. Speeds up connecting with many entities."
+
+    compressed_states : bool
+    "Get entity states and state changes with subscribe_entities, which only sends the configured entities in a compressed format, and changes as diffs. Falls back to get_states and state triggers if the server does not support it."
+
+    json_codec : Literal["auto", "orjson", "msgspec", "json"]
+    "The library used to encode and decode websocket messages. auto uses orjson or msgspec if installed, and json otherwise."
+
+    record_traffic : Optional[str]
+    "File to append every received message to. Can be used to benchmark the json codecs, see the codec module."
+
+    http_connections : int
+    "Maximum amount of http requests to run at the same time, e.g. when requesting entity pictures."
+
+    http_timeout : float
+    "Time in seconds before an http request is cancelled."
+
+    service_debounce : float
+    "Time in seconds sliders and counters wait for new input before calling their service action. Only the last value is send, and it is shown straight away while the call is pending."
+
+    image_cache_size : int
+    "Maximum amount of images from Home Assistant (like entity pictures) to keep in memory."
+
+    image_cache_disk_size : float
+    "Maximum size, in megabytes, of the images from Home Assistant cached in the .cache folder of the config. Set to 0 to not cache images on disk."
 
     unknown_icon : Optional['mdiType']
     "Default icon to indicate that an entity's state is unknown"
@@ -79,4 +113,4 @@ class home_assistantMap(TypedDict):
     "Default icon to indicate that an entity is unavailable"
 
 home_assistantMap.__required_keys__ = frozenset({'url','token'})
-home_assistantMapDefaults = MappingProxyType({"state_colors": {}, "ping_pong_interval": 50, 'unknown_icon': "mdi:help", 'unavailable_icon': "mdi:exclamation-thick"})
+home_assistantMapDefaults = MappingProxyType({"state_colors": {}, "ping_pong_interval": 50, "group_subscriptions": False, "compressed_states": True, "json_codec": "auto", "http_connections": 4, "http_timeout": 10, "service_debounce": 0.3, "image_cache_size": 32, "image_cache_disk_size": 50, 'unknown_icon': "mdi:help", 'unavailable_icon': "mdi:exclamation-thick"})
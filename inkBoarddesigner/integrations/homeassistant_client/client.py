@@ -2,6 +2,8 @@
 
 import asyncio
 import json
+import time
+import tracemalloc
 from datetime import datetime
 import logging
 from typing import Union, Callable, TYPE_CHECKING, TypedDict, Optional, Literal, TypeVar, Any, Coroutine, Sequence
@@ -22,11 +24,24 @@ from PythonScreenStackManager.tools import DummyTask
 
 from .helpers import triggerDictType, stateDictType, actionCallDict, EntityType, _gather_entities_and_actions, parse_entity_tag
 from .constants import ENTITY_TAG_KEY, \
-                        DEFAULT_PING_INTERVAL, MAX_PONGS_MISSED, DEFAULT_HA_DT_FORMAT
+                        DEFAULT_PING_INTERVAL, MAX_PONGS_MISSED, DEFAULT_HA_DT_FORMAT, DEFAULT_GROUP_SUBSCRIPTIONS, \
+                        DEFAULT_COMPRESSED_STATES, SUBSCRIBE_ENTITIES_MIN_VERSION, SUBSCRIBE_ENTITIES_TIMEOUT, DEFAULT_JSON_CODEC, \
+                        IMAGE_CACHE_FOLDER, IMAGE_CACHE_MEMORY_SIZE, IMAGE_CACHE_DISK_SIZE, HTTP_MAX_CONNECTIONS, HTTP_TIMEOUT, \
+                        OUTBOUND_BATCH_SIZE, SEND_TIMEOUT, SERVICE_DEBOUNCE_DELAY, PING_IDLE_BACKOFF_MAX, PONG_DETECTION_MAX, \
+                        OPTIMISTIC_STATE_TIMEOUT, MISSING_ENTITY_STATE
 
 from .HAelements import HAelement
 from .clientelements import ClientElement
 from . import trigger_functions
+from .codec import get_codec
+from .dispatcher import TriggerDispatcher
+from .imagecache import ImageCache
+from .httpsession import HTTPSession
+from .router import ResponseRouter
+from .outbound import IdAllocator, OutboundMessage
+from .debounce import ServiceDebouncer, OptimisticState, merge_state
+from .liveness import RTTEstimator
+from .compressed_states import ENTITIES_ADDED, expand_compressed_states, apply_entities_event
 
 
 if TYPE_CHECKING:
@@ -57,27 +72,43 @@ class ServerConfigDict(TypedDict):
     "The default units this server uses"
 
 #Builds the headers to send to subscribe to triggers
-def trigger_headers(entities : Union[list,tuple],last_id : int):
+def trigger_headers(entities : Union[list,tuple], ids : Union[IdAllocator,int,None] = None, group : bool = False):
     """
     Builds a list of headers to send to a client to subscribe to state changes of the entities in entities
         Parameters:
             entities: iterable with strings containing the entity_id's to subscribe to
-            last_id: the last message id send to the websocket API
+            ids: the id allocator of the connection (or the last message id send to the websocket API), to give the headers an id. Leave it out for headers put in the message queue, which get their id when they are send.
+            group: build a single header that subscribes to all entities at once, instead of one header per entity
     """
+    if isinstance(ids, int):
+        ids = IdAllocator(ids)
+
     headers = []
     entity_list = []
     if type(entities) is str:
         #Simple rewite to keep the code below functioning in case of inputting a single entity
         entities = [entities]
 
-    for index, entity in enumerate(entities):
+    if group and entities:
+        subscribe_header = {
+            "type": "subscribe_trigger",
+            "trigger": {
+                "platform": "state",
+                "entity_id": list(entities)
+            }, }
+        if ids != None:
+            subscribe_header["id"] = ids.next()
+        return [subscribe_header]
+
+    for entity in entities:
         subscribe_header = {
-            "id": last_id + index+1,
             "type": "subscribe_trigger",
             "trigger": {
                 "platform": "state",
                 "entity_id": entity
             }, }
+        if ids != None:
+            subscribe_header["id"] = ids.next()
         headers.append(subscribe_header)
         entity_list.append((entity))
     return headers
@@ -107,7 +138,7 @@ class HAclient:
 
         self._all_entities, self._all_service_actions = _gather_entities_and_actions(core)
 
-        self.__last_id = 0
+        self._ids = IdAllocator()
         self.loglist = []
         self._HAconfig = ServerConfigDict(name=None, time_zone=None, version=None, integration=False, unit_system={})
         self._elementDict : dict[str,set[EntityType]] = {}
@@ -117,14 +148,51 @@ class HAclient:
 
         self.__websocketCondition = asyncio.Condition()
 
+        ping_interval = self.hass_data.get("ping_pong_interval", ping_interval)
+        if isinstance(ping_interval, str):
+            ping_interval = tools.parse_duration_string(ping_interval)
         self.ping_interval = ping_interval
+        self._rtt = RTTEstimator()
+        self._lastReceived: float = 0
+        "Monotonic time the last message was received from the server"
+        self._groupSubscriptions: bool = self.hass_data.get("group_subscriptions", DEFAULT_GROUP_SUBSCRIPTIONS)
+        self._compressedStates: bool = self.hass_data.get("compressed_states", DEFAULT_COMPRESSED_STATES)
+        self._entitySubscriptions: dict[int, Optional[asyncio.Future]] = {}
+        "subscribe_entities subscriptions, and the future to set when their initial states are received"
+        self._stateSubscription: Optional[int] = None
+        "Id of the subscribe_entities subscription state changes are received from. None if state triggers are used."
+        self._joinStats: dict = {}
+        self._resumable: bool = False
+        "Whether the elements and functions have been updated after a connection before, so reconnecting only needs to trigger the entities that changed"
+
+        self._dispatcher = TriggerDispatcher(self._async_trigger_entity, self._entity_on_screen)
+        self._dirtyElements: dict[HAelement, triggerDictType] = {}
+        "Elements that were not on screen when their entity triggered, and the trigger to run when they are added to the screen"
+
+        hass_url = self.hass_data["url"]
+        if not "http" in hass_url:
+            hass_url = "http://" + hass_url
+        self._httpSession = HTTPSession(hass_url, self.hass_data.get("token", None),
+                                    self.hass_data.get("http_connections", HTTP_MAX_CONNECTIONS), self.hass_data.get("http_timeout", HTTP_TIMEOUT))
+        disk_size = self.hass_data.get("image_cache_disk_size", IMAGE_CACHE_DISK_SIZE)
+        self._imageCache = ImageCache(self._httpSession, core.config.baseFolder / IMAGE_CACHE_FOLDER if disk_size else None,
+                                    self.hass_data.get("image_cache_size", IMAGE_CACHE_MEMORY_SIZE), disk_size)
+
+        self._codec = get_codec(self.hass_data.get("json_codec", DEFAULT_JSON_CODEC))
+        _LOGGER.debug(f"Using {self._codec.name} to encode and decode messages")
+        self._trafficFile = None
+        if self.hass_data.get("record_traffic", None):
+            self._trafficFile = open(self.hass_data["record_traffic"], "ab")
         self.listenerTask : asyncio.Task = DummyTask()
         self.commanderTask : asyncio.Task = DummyTask()
         self.pingpongTask : asyncio.Task = DummyTask()
         self.longrunningTasks: asyncio.Task = DummyTask()
         self.reconnect_task : asyncio.Task = DummyTask()
 
-        self._callback_queues : dict["id", asyncio.Queue]= {} ##Dict with keys corresponding to message id's, values being asyncio events
+        self._router = ResponseRouter()
+        self._debouncer = ServiceDebouncer(self._send_debounced, self.hass_data.get("service_debounce", SERVICE_DEBOUNCE_DELAY))
+        self._optimisticStates: dict[EntityType, OptimisticState] = {}
+        "Entities with a state that is assumed until the debounced service call setting it has been handled"
         self.__message_queue = asyncio.Queue()
         self._commanderLock = asyncio.Lock()
         self._listenerLock = asyncio.Lock()
@@ -148,9 +216,8 @@ class HAclient:
     
     @property
     def next_id(self) -> int:
-        "Returns the next message id and increments last_id"
-        self.__last_id += 1
-        return self.__last_id
+        "Returns a new message id. Only for messages send directly over the websocket, messages put in the message queue get their id when they are send."
+        return self._ids.next()
 
     @property
     def connection(self) -> bool:
@@ -201,6 +268,36 @@ class HAclient:
         "dict with the current states of all subscribed to entities"
         return MappingProxyType(self._stateDict)
     
+    @property
+    def latency(self) -> MappingProxyType:
+        "Round trip times to the server, measured by the ping-pong script: the last and smoothed round trip time and its variation in milliseconds, the time to wait on a pong, and the amount of pongs received and missed"
+        return MappingProxyType(self._rtt.stats)
+
+    @property
+    def joinStats(self) -> MappingProxyType:
+        "How the initial states were fetched when last connecting: the method, amount of entities, time it took (seconds), payload size (bytes) and peak memory (bytes, only if tracemalloc is tracing)"
+        return MappingProxyType(self._joinStats)
+
+    @property
+    def dispatcher(self) -> TriggerDispatcher:
+        "The dispatcher that handles entity triggers"
+        return self._dispatcher
+
+    @property
+    def httpSession(self) -> HTTPSession:
+        "Pooled session for http requests to the server, like requesting entity pictures"
+        return self._httpSession
+
+    @property
+    def imageCache(self) -> ImageCache:
+        "Cache for images requested from the server, like entity pictures"
+        return self._imageCache
+
+    @property
+    def router(self) -> ResponseRouter:
+        "Routes responses from the server to the messages waiting on them"
+        return self._router
+
     @property
     def messageQueue(self) -> asyncio.Queue:
         "Queue with messages to send to the server"
@@ -245,6 +342,7 @@ class HAclient:
 
     async def disconnect_client(self):
         "Disconnects from the Home Assistant client."
+        await self.async_flush_service_calls()
         await self.websocket.close()
         async with self.websocketCondition:
             self.websocketCondition.notify_all()
@@ -267,13 +365,14 @@ class HAclient:
             "access_token": token     }
         _LOGGER.debug("Attempting connection to {}".format(uri))        
 
-        async for websocket in ws_client.connect(uri, additional_headers=auth_header):
+        ##The ping-pong script sends pings only when the connection is idle, so the keepalive of websockets is not used
+        async for websocket in ws_client.connect(uri, additional_headers=auth_header, ping_interval=None):
             _LOGGER.debug("Setting up websocket connection to Home Assistant")  
             try:                
                 self._websocket = websocket
                 await self.websocket.recv() #The first message send by the server requests authentication. Needs to be received to start it.
-                await self.websocket.send(json.dumps(auth_header))
-                auth_res = json.loads(await self.websocket.recv())
+                await self.websocket.send(self._codec.dumps(auth_header))
+                auth_res = await self._async_recv()
                 if auth_res["type"] == "auth_ok":
                     self.authenthicated = True
                     _LOGGER.info(f"Connected to Home Assistant {auth_res}")
@@ -282,8 +381,8 @@ class HAclient:
                     return
                 
                 HAconf_header = {"id": self.next_id, "type": "get_config" }
-                await self.websocket.send(json.dumps(HAconf_header))
-                HAconf_res = json.loads(await self.websocket.recv())
+                await self.websocket.send(self._codec.dumps(HAconf_header))
+                HAconf_res = await self._async_recv()
                 if HAconf_res["success"]:
                     HAconf_res = HAconf_res["result"]
                     self._HAconfig = {
@@ -294,18 +393,15 @@ class HAclient:
                                     "unit_system": HAconf_res["unit_system"]
                                     }
 
-                states_header = {"id": self.next_id, "type": "get_states" } 
-                await self.websocket.send(json.dumps(states_header))
-                all_states = json.loads(await self.websocket.recv())
-                if not all_states.get("success",False):
-                    _LOGGER.error(f"Failed to get states, Home Assistant returned response: {all_states}")
+                self._stateSubscription = None
+                initial_dict = await self._async_get_initial_states()
+                if initial_dict == None:
                     continue
+                elif self._resumable:
+                    changed = self._resume_states(initial_dict)
+                    _LOGGER.info(f"Resumed connection to Home Assistant, {changed} entities changed while disconnected")
                 else:
                     _LOGGER.debug("Received all states from Home Assistant")
-                    initial_states = list(filter(lambda entity: entity["entity_id"] in self._all_entities, all_states["result"])) 
-                    initial_dict = {}
-                    for entity in initial_states:
-                        initial_dict[entity["entity_id"]] = entity
                     self._stateDict = initial_dict
                     
                     timeout = self._core.config.inkBoard.integration_start_time
@@ -351,21 +447,15 @@ class HAclient:
                             if task.exception() != None:
                                 coro = task.get_coro()
                                 _LOGGER.warning(f"{coro.__qualname__} raised an error while connecting: {task.exception()}")
+                    self._resumable = True
 
-                subscribe_headers = trigger_headers(self._all_entities,self.__last_id)
-                subscribe_fails = 0
-
-                for header in subscribe_headers:
-                    res = await self.subscribe_to_trigger(None,header)
-                    
-                    if res == header:
-                        continue
-                    else:
-                        subscribe_fails += 1
-                if subscribe_fails == 0:
-                    _LOGGER.info("Succesfully subscribed to all entities")
-                
-                self.__last_id = header["id"]
+                if self._stateSubscription != None:
+                    _LOGGER.info("Receiving state changes of all entities via subscribe_entities")
+                else:
+                    subscribe_headers = trigger_headers(self._all_entities, self._ids, self._groupSubscriptions)
+                    subscribe_fails = await self._async_subscribe_pipelined(subscribe_headers)
+                    if subscribe_fails == 0:
+                        _LOGGER.info("Succesfully subscribed to all entities")
                 async with self.websocketCondition:
                     self.websocketCondition.notify_all()
 
@@ -374,7 +464,8 @@ class HAclient:
 
                 self.listenerTask = self.loop.create_task(self.__async_listen())
                 self.commanderTask = self.loop.create_task(self.__async_command())
-                runners = [self.listenerTask, self.commanderTask]
+                self.pingpongTask = self.loop.create_task(self.__async_ping_pong())
+                runners = [self.listenerTask, self.commanderTask, self.pingpongTask]
 
                 self._longrunningTasks = asyncio.gather(*runners, return_exceptions=True)
 
@@ -400,6 +491,192 @@ class HAclient:
                 raise
         return
 
+    def _resume_states(self, states: dict[EntityType, stateDictType]) -> int:
+        """
+        Replaces the state dict with the states gotten after reconnecting, and only triggers the entities whose state or attributes changed while disconnected.
+        Entities that are no longer on the server get the unknown state, like when subscribing to new entities.
+
+        Returns
+        -------
+        int
+            The amount of entities that changed
+        """
+        old_states = self._stateDict
+        self._stateDict = states
+
+        for entity in filter(lambda entity: entity not in states, old_states):
+            if old_states[entity]["state"] != MISSING_ENTITY_STATE:
+                _LOGGER.warning(f"entity {entity} could not be found on the Home Assistant server anymore. Setting it's state to unknown.")
+            states[entity] = stateDictType(entity_id=entity,state=MISSING_ENTITY_STATE, attributes={}, last_changed=None, last_reported=None,last_updated=None, context=None)
+
+        changed = 0
+        for entity, new_state in states.items():
+            old_state = old_states.get(entity, None)
+            ##Timestamps are not compared, since last_reported changes without anything that is shown changing
+            if (old_state != None and old_state.get("state", None) == new_state.get("state", None)
+                and old_state.get("attributes", None) == new_state.get("attributes", None)):
+                continue
+            changed += 1
+            self._dispatcher.put(triggerDictType(entity_id=entity, from_state=old_state, to_state=new_state, context=new_state.get("context", None)))
+        return changed
+
+    def _supports_subscribe_entities(self) -> bool:
+        "Whether compressed states are enabled and the server is new enough to support subscribe_entities"
+        if not self._compressedStates:
+            return False
+        try:
+            version = tuple(int(v) for v in self._HAconfig["version"].split(".")[:2])
+        except (AttributeError, KeyError, ValueError):
+            return False
+        return version >= SUBSCRIBE_ENTITIES_MIN_VERSION
+
+    async def _async_get_initial_states(self) -> Optional[dict[EntityType, stateDictType]]:
+        """
+        Gets the states of all entities in the config while connecting.
+        Uses subscribe_entities if the server supports it, so only the states of those entities are send, in the compressed format. Otherwise, or if that fails, the result of get_states is filtered.
+        The method used, the time it took and the size of the payload are logged and kept in `joinStats`. Peak memory is included too if tracemalloc is tracing.
+
+        Returns
+        -------
+        Optional[dict[EntityType, stateDictType]]
+            The states, or None if they could not be gotten
+        """
+        entities = set(self._all_entities)
+        if not entities:
+            ##Both methods would send the state of every entity on the server
+            return {}
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        start = time.monotonic()
+
+        method = "subscribe_entities"
+        result = None
+        if self._supports_subscribe_entities():
+            result = await self._async_get_states_compressed(entities)
+            if result == None:
+                _LOGGER.warning("Unable to get states using subscribe_entities, falling back to get_states")
+
+        if result == None:
+            method = "get_states"
+            result = await self._async_get_states_full(entities)
+            if result == None:
+                return None
+
+        (states, payload_size) = result
+        self._joinStats = {"method": method, "entities": len(states), "time": time.monotonic() - start, "payload": payload_size}
+        if tracing:
+            self._joinStats["peak_memory"] = tracemalloc.get_traced_memory()[1]
+
+        memory = f", peak memory {self._joinStats['peak_memory']/1024:.0f}kB" if tracing else ""
+        _LOGGER.info(f"Got {len(states)} states using {method} in {self._joinStats['time']*1000:.0f}ms, payload {payload_size/1024:.0f}kB{memory}")
+        return states
+
+    async def _async_get_states_full(self, entities: set[EntityType]) -> Optional[tuple[dict[EntityType, stateDictType], int]]:
+        #Gets the states of all entities on the server, and filters out the entities in entities. Returns the states and the payload size in bytes.
+        #Reads from the websocket directly, so only use it before the listener has started.
+        states_header = {"id": self.next_id, "type": "get_states" } 
+        await self.websocket.send(self._codec.dumps(states_header))
+
+        all_states = {}
+        while all_states.get("id", None) != states_header["id"]:
+            raw = await self._async_recv_raw()
+            all_states = self._codec.loads(raw)
+            if all_states.get("type", None) == "event":
+                self._dispatch_event(all_states)
+
+        if not all_states.get("success",False):
+            _LOGGER.error(f"Failed to get states, Home Assistant returned response: {all_states}")
+            return None
+
+        initial_dict = {}
+        for entity in filter(lambda entity: entity["entity_id"] in entities, all_states["result"]):
+            initial_dict[entity["entity_id"]] = entity
+        return (initial_dict, len(raw))
+
+    async def _async_get_states_compressed(self, entities: set[EntityType]) -> Optional[tuple[dict[EntityType, stateDictType], int]]:
+        #Subscribes to the entities using subscribe_entities, and keeps the subscription to receive state changes. Returns the initial states and the payload size in bytes.
+        #Reads from the websocket directly, so only use it before the listener has started.
+        sub_id = self.next_id
+        header = {"id": sub_id, "type": "subscribe_entities", "entity_ids": sorted(entities)}
+        self._entitySubscriptions[sub_id] = None
+        await self.websocket.send(self._codec.dumps(header))
+
+        payload_size = 0
+
+        async def receive_states() -> Optional[dict[EntityType, stateDictType]]:
+            nonlocal payload_size
+            while True:
+                raw = await self._async_recv_raw()
+                message = self._codec.loads(raw)
+                if message.get("id", None) != sub_id:
+                    continue
+
+                payload_size += len(raw)
+                if message.get("type", None) == "result" and not message.get("success", False):
+                    _LOGGER.debug(f"subscribe_entities failed: {message}")
+                    return None
+                elif message.get("type", None) == "event" and ENTITIES_ADDED in message.get("event", {}):
+                    return expand_compressed_states(message["event"][ENTITIES_ADDED])
+
+        try:
+            states = await asyncio.wait_for(receive_states(), SUBSCRIBE_ENTITIES_TIMEOUT)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(f"Did not receive states from subscribe_entities within {SUBSCRIBE_ENTITIES_TIMEOUT} seconds")
+            ##The subscription may still have been made, its result is skipped like any other message
+            await self.websocket.send(self._codec.dumps({"id": self.next_id, "type": "unsubscribe_events", "subscription": sub_id}))
+            states = None
+
+        if states == None:
+            self._entitySubscriptions.pop(sub_id, None)
+            return None
+
+        self._stateSubscription = sub_id
+        return (states, payload_size)
+
+    async def _async_subscribe_entities_states(self, entities: set[EntityType]) -> Optional[dict[EntityType, stateDictType]]:
+        #Subscribes to entities using subscribe_entities via the commander, and returns their initial states. Returns None if it fails.
+        initial = self.loop.create_future()
+        message = {"type": "subscribe_entities", "entity_ids": sorted(entities)}
+
+        def register(sub_id: int):
+            ##The initial states can arrive right after the result, so the subscription is registered before sending
+            self._entitySubscriptions[sub_id] = initial
+
+        response = await self._async_get_message_result(message, on_send=register)
+        sub_id = message.get("id", None)
+        if not response.get("success", False):
+            self._entitySubscriptions.pop(sub_id, None)
+            return None
+
+        try:
+            compressed = await asyncio.wait_for(initial, SUBSCRIBE_ENTITIES_TIMEOUT)
+        except asyncio.TimeoutError:
+            _LOGGER.warning(f"Did not receive states from subscribe_entities within {SUBSCRIBE_ENTITIES_TIMEOUT} seconds")
+            await self.messageQueue.put({"type": "unsubscribe_events", "subscription": sub_id})
+            return None
+        return expand_compressed_states(compressed)
+
+    async def _async_recv_raw(self) -> bytes:
+        "Receives the next message from the websocket without decoding it. Records it if traffic is being recorded."
+        raw = await self.websocket.recv(decode=False)
+        self._lastReceived = time.monotonic()
+        if self._trafficFile != None:
+            self._trafficFile.write(raw + b"\n")
+            self._trafficFile.flush()
+        return raw
+
+    def stop_recording(self):
+        "Stops recording traffic and closes the file it is recorded to, if any"
+        if self._trafficFile != None:
+            self._trafficFile.close()
+            self._trafficFile = None
+
+    async def _async_recv(self) -> dict:
+        "Receives the next message from the websocket and decodes it"
+        return self._codec.loads(await self._async_recv_raw())
+
     async def __async__reconnect(self, init_Wait: float = 15, max_Attempts=0, wait_Increase: int =2, wait_Max: float = 300):
         """
         Reconnect function
@@ -472,37 +749,34 @@ class HAclient:
         _LOGGER.debug("Starting Listener")
         async with self._listenerLock:
             try:
-                async for message in self.websocket: #@IgnoreException
-                    message = json.loads(message)
+                while True:
+                    message = await self._async_recv() #@IgnoreException
                     id = message["id"]
                     _LOGGER.debug(f"Received message {id}")
                     _LOGGER.verbose(message)
-                    if id in self._callback_queues:
-                        queue = self._callback_queues[id]
-                        _LOGGER.debug(f"Putting response from message id {id} in queue")
-                        try:
-                            queue.put_nowait(message)
-                        except asyncio.QueueFull:
-                            _LOGGER.error(f"Message id {id} has already queued a response")
-                    
                     if message.get("type") == "event":
-                        try:
-                            asyncio.create_task(self.update_states(message))
-                        except (TypeError, KeyError, IndexError, OSError) as exce:
-                            _LOGGER.error(f"Error in update states for {message}: {exce}")
+                        self._dispatch_event(message)
+                    elif self._router.resolve(message):
+                        _LOGGER.debug(f"Passed response to message id {id}")
                     elif message.get("type") == "result":
                         if not message.get("success", False):
                             err = message.get("error",{})
                             _LOGGER.warning(f"Unsuccesful request {err.get('code','unknown code')}: {err.get('message','No message')}")
+            except websockets.exceptions.ConnectionClosedOK:
+                pass
             except websockets.exceptions.ConnectionClosedError as exce:
                 _LOGGER.error(f"Listener stopped due to connection closing")
                 _LOGGER.debug(exce)
             except asyncio.CancelledError:
                 pass
+            finally:
+                self._router.fail_all("Listener stopped")
                         
         _LOGGER.warning("Listener stopped")
         if not self.commanderTask.done():
             self.commanderTask.cancel()
+        if not self.pingpongTask.done():
+            self.pingpongTask.cancel()
         async with self.websocketCondition:
             self.websocketCondition.notify_all()
 
@@ -516,32 +790,36 @@ class HAclient:
                 await self._empty_message_queue()
 
             while self.connection:
+                batch = []
                 try:
                     _LOGGER.verbose(f"Waiting for message from commander queue")
-                    cmd = await self.messageQueue.get()
+                    batch.append(await self.messageQueue.get())
+                    ##Everything queued in the meantime is send along, with one timeout for the whole batch
+                    while len(batch) < OUTBOUND_BATCH_SIZE and not self.messageQueue.empty():
+                        batch.append(self.messageQueue.get_nowait())
 
-                    if "id" not in cmd:
-                        cmd["id"] = self.next_id
-                    else:
-                        msg_id = cmd["id"]
-                        if msg_id < self.__last_id:
-                            _LOGGER.debug(f"{msg_id} was already used for a websocket message. Increasing id of command {cmd}")
-                            new_id = self.next_id
-                            cmd["id"] = new_id
-                            if msg_id in self._callback_queues:
-                                _LOGGER.debug(f"Message {msg_id} has a callback. Removing object from key {msg_id} and putting it in {new_id}.")
-                                self._callback_queues[new_id] = self._callback_queues.pop(msg_id)
-
-                    send = await asyncio.wait_for(self.websocket.send(json.dumps(cmd)), timeout=10) #@IgnoreException
-                    _LOGGER.debug(f"Command send")
-                    _LOGGER.verbose(cmd)
-                except TimeoutError:
-                    if cmd["type"] == "call_service":
-                        _LOGGER.warning(f"Calling service action {cmd['domain']}.{cmd['service']} timed out")
+                    frames = []
+                    for item in batch.copy():
+                        try:
+                            frames.append(self._prepare_outbound(item))
+                        except (TypeError, KeyError, IndexError, ValueError) as exce:
+                            _LOGGER.error(f"Exception occured in commander while preparing command {item}: {exce}")
+                            batch.remove(item)
+                            self._fail_outbound(item, reason=f"Unable to prepare message: {exce}")
+
+                    await asyncio.wait_for(self._async_send_frames(frames), timeout=SEND_TIMEOUT) #@IgnoreException
+                    _LOGGER.debug(f"Send {len(frames)} command(s)")
+                except (TimeoutError, asyncio.TimeoutError):
+                    messages = [item.message if isinstance(item, OutboundMessage) else item for item in batch]
+                    services = [f"{cmd['domain']}.{cmd['service']}" for cmd in messages if cmd.get("type", None) == "call_service"]
+                    if services:
+                        _LOGGER.warning(f"Calling service action(s) {', '.join(services)} timed out")
                     else:
-                        _LOGGER.warning(f"Sending message {cmd['type']} timed out")
-                except (TypeError, KeyError, IndexError, OSError) as exce:
-                    _LOGGER.error(f"Exception occured in commander while sending command {cmd}: {exce}")
+                        _LOGGER.warning(f"Sending {len(messages)} message(s) timed out")
+                    self._fail_outbound(*batch, reason=f"Sending timed out after {SEND_TIMEOUT} seconds")
+                except OSError as exce:
+                    _LOGGER.error(f"Exception occured in commander while sending commands: {exce}")
+                    self._fail_outbound(*batch, reason=f"Unable to send message: {exce}")
                 except websockets.exceptions.ConnectionClosedError as exce:
                     _LOGGER.error(f"Commander stopped due to connection closing")
                     _LOGGER.debug(exce)
@@ -551,52 +829,282 @@ class HAclient:
 
         _LOGGER.error("Commander stopped")
 
+    def _prepare_outbound(self, item: Union[dict, OutboundMessage]) -> Union[str,bytes]:
+        """
+        Gives a message from the message queue its id and returns it encoded.
+        Messages that were put in the queue with an id keep it if it is still usable, otherwise they get a new one, and anything waiting on the response is moved to the new id.
+        """
+        if not isinstance(item, OutboundMessage):
+            item = OutboundMessage(item)
+        message = item.message
+
+        if "id" not in message:
+            message["id"] = self._ids.next()
+        elif not self._ids.observe(message["id"]):
+            msg_id = message["id"]
+            _LOGGER.debug(f"{msg_id} was already used for a websocket message. Increasing id of command {message}")
+            message["id"] = self._ids.next()
+            self._router.rekey(msg_id, message["id"])
+
+        if item.on_send != None:
+            item.on_send(message["id"])
+        if item.response != None:
+            self._router.attach(message["id"], item.response)
+        _LOGGER.verbose(message)
+        return self._codec.dumps(message)
+
+    def _fail_outbound(self, *items: Union[dict, OutboundMessage], reason: str):
+        "Fails the responses of messages from the message queue that could not be sent, so nothing waits on them until it times out"
+        for item in items:
+            if isinstance(item, OutboundMessage) and item.response != None:
+                self._router.fail_send(item.response, reason)
+
+    async def _async_send_frames(self, frames: list[Union[str,bytes]]):
+        "Writes the frames to the websocket, in order"
+        for frame in frames:
+            await self.websocket.send(frame)
+
+    def queue_message(self, message: dict, expect_response: bool = False, on_send: Callable[[int],None] = None) -> Optional[asyncio.Future]:
+        """
+        Puts a message in the message queue. Its id is set by the commander when it is send, so messages are always send with increasing ids.
+        Must be called from the event loop the client runs in.
+
+        Parameters
+        ----------
+        message : dict
+            The message to send. Leave out the id.
+        expect_response : bool, optional
+            Whether the response of the server is needed, by default False
+        on_send : Callable[[int],None], optional
+            Function that is called with the id of the message right before it is send, by default None
+
+        Returns
+        -------
+        Optional[asyncio.Future]
+            If expect_response, a future that is set to the response. Use `router.async_wait` to wait on it with a timeout.
+        """
+        response = self.loop.create_future() if expect_response else None
+        self.messageQueue.put_nowait(OutboundMessage(message, response, on_send))
+        return response
+
     async def __async_ping_pong(self):
         '''
-        Sends pings and receives the pongs from the Home Assistant Server
+        Checks if the connection to the Home Assistant server is still alive.
+        Any message from the server counts as a sign of life, so pings are only send when nothing was received for the ping interval. While the connection stays idle, the interval doubles after each pong, up to `PING_IDLE_BACKOFF_MAX` times the ping interval.
+        Pings are websocket ping frames, so they do not go through the message queue. The time to wait on a pong follows the measured round trip time. After a missed pong, the next ping is send right away. If `MAX_PONGS_MISSED` pongs in a row are missed, or no pong came back for `PONG_DETECTION_MAX` seconds, the websocket is closed, which makes the client reconnect.
         '''
         _LOGGER.info("Starting ping-pong script")
-        pong_timeout = 10
         pongs_missed = 0
-        missed_max = MAX_PONGS_MISSED
-        while self.connection:  
-            await asyncio.sleep(self.ping_interval)  
-            # self.last_id += 1
-            ping_id = self.next_id
-            ping_dict = {"id": ping_id, "type": "ping"}
-            pong_task = self.add_callback(ping_id)
+        missed_since = None
+        interval = self.ping_interval
+        idle_since = time.monotonic()
+        while self.connection:
+            if self._lastReceived > idle_since:
+                interval = self.ping_interval
+
+            quiet = time.monotonic() - max(self._lastReceived, idle_since)
+            if quiet < interval:
+                await asyncio.sleep(interval - quiet)
+                continue
 
-            _LOGGER.debug(f"Sending Ping id {ping_id}")
+            timeout = self._rtt.timeout
+            if missed_since != None:
+                ##Keep the total time to detect a lost connection bounded
+                timeout = max(min(timeout, missed_since + PONG_DETECTION_MAX - time.monotonic()), 0.1)
+            sent = time.monotonic()
+            _LOGGER.debug(f"Sending ping after {quiet:.0f} seconds without messages")
             try:
-                await self.messageQueue.put(ping_dict)
-                res = await asyncio.wait_for(pong_task, timeout=pong_timeout) #@IgnoreException
-                ping_id = res["id"] ##Update the ping_id in case the commander increased it
-                pongs_missed = 0
-            except asyncio.exceptions.TimeoutError:
+                pong_waiter = await self.websocket.ping()
+                await asyncio.wait_for(pong_waiter, timeout) #@IgnoreException
+            except asyncio.TimeoutError:
+                idle_since = time.monotonic()
+                if self._lastReceived > sent:
+                    ##Messages came in while waiting, so the connection is alive even without the pong
+                    pongs_missed = 0
+                    missed_since = None
+                    interval = self.ping_interval
+                    continue
                 pongs_missed += 1
-                _LOGGER.error(f"Did not receive pong back from Home Assistant within {pong_timeout} seconds, missed {pongs_missed} pongs in a row")
-                if pongs_missed >= missed_max: 
-                    self.__connection = False
+                if missed_since == None:
+                    missed_since = sent
+                self._rtt.backoff()
+                _LOGGER.warning(f"Did not receive pong back from Home Assistant within {timeout:.1f} seconds, missed {pongs_missed} pongs in a row")
+                if pongs_missed >= MAX_PONGS_MISSED or time.monotonic() - missed_since >= PONG_DETECTION_MAX:
                     break
-            except websockets.exceptions.ConnectionClosedError as exce:
+                ##Ping again straight away, instead of waiting out the (idle) interval
+                interval = 0
+                await self._async_notify_latency()
+                continue
+            except websockets.exceptions.ConnectionClosed as exce:
                 _LOGGER.error(f"Ping Pong errored due to connection closing: {exce}")
-                self.__connection = False
                 break
+            except asyncio.CancelledError:
+                return
 
-            _LOGGER.debug(f"Received pong from ping id {ping_id}")
+            rtt = time.monotonic() - sent
+            self._rtt.update(rtt)
+            if pongs_missed:
+                interval = self.ping_interval
+            else:
+                interval = min(interval*2, self.ping_interval*PING_IDLE_BACKOFF_MAX)
+            pongs_missed = 0
+            missed_since = None
+            idle_since = time.monotonic()
+            _LOGGER.debug(f"Received pong after {rtt*1000:.0f}ms, pong timeout is now {self._rtt.timeout:.1f} seconds")
+            await self._async_notify_latency()
 
-        _LOGGER.warning("Ping pong function has stopped, Closing websocket to start reconnect")
-        await self.websocket.close()
+        if self.connection:
+            _LOGGER.warning("Connection to Home Assistant seems lost, closing websocket to reconnect")
+            await self.websocket.close()
+
+    async def _async_notify_latency(self):
+        "Notifies the websocket condition after a ping, so elements showing the latency can update"
         async with self.websocketCondition:
             self.websocketCondition.notify_all()
-        self.reconnect_client()
+
+    def _dispatch_event(self, message: dict):
+        "Handles an event message from the server. Updates the state dict, and puts the trigger in the dispatcher."
+        if message.get("id", None) in self._entitySubscriptions:
+            self._handle_entities_event(message)
+            return
+
+        try:
+            trigger_dict = self._apply_trigger_event(message)
+        except (TypeError, KeyError, IndexError) as exce:
+            _LOGGER.error(f"Error in update states for {message}: {exce}")
+            return
+        if trigger_dict["entity_id"] in self._optimisticStates:
+            trigger_dict = self._hold_optimistic(trigger_dict)
+        self._dispatcher.put(trigger_dict)
+
+    def _entity_on_screen(self, entity_id: EntityType) -> bool:
+        "Whether triggers of the entity should be prioritised, i.e. if it has functions connected to it, or elements that are on screen."
+        if entity_id in self._functionDict:
+            return True
+        return any(getattr(element, "onScreen", False) for element in self._elementDict.get(entity_id, ()))
+
+    def _handle_entities_event(self, message: dict):
+        """
+        Handles an event from a subscribe_entities subscription.
+        The initial states are passed to the future waiting on them, if any. Otherwise the added, changed and removed states are applied to the state dict, and a trigger is made for each changed entity.
+        """
+        initial = self._entitySubscriptions.get(message["id"], None)
+        event = message.get("event", {})
+        if ENTITIES_ADDED in event and initial != None and not initial.done():
+            initial.set_result(event[ENTITIES_ADDED])
+            return
+
+        ##Changes are applied to the states of the server, not to the assumed ones
+        for entity, optimistic in self._optimisticStates.items():
+            self._stateDict[entity] = optimistic.server_state
+
+        for trigger_dict in apply_entities_event(self._stateDict, event):
+            if trigger_dict["entity_id"] in self._optimisticStates:
+                trigger_dict = self._hold_optimistic(trigger_dict)
+            self._dispatcher.put(trigger_dict)
+
+        for entity, optimistic in self._optimisticStates.items():
+            self._stateDict[entity] = merge_state(optimistic.server_state, optimistic.overrides)
+
+    def _hold_optimistic(self, trigger_dict: triggerDictType) -> triggerDictType:
+        "Keeps the assumed state of an entity with a pending service call, and stores the state reported by the server for when the call has been handled"
+        entity = trigger_dict["entity_id"]
+        optimistic = self._optimisticStates[entity]
+        if trigger_dict["to_state"] == None:
+            ##Entity was removed
+            self._optimisticStates.pop(entity)
+            return trigger_dict
+
+        self._optimisticStates[entity] = optimistic._replace(server_state=trigger_dict["to_state"], received=True)
+        to_state = merge_state(trigger_dict["to_state"], optimistic.overrides)
+        self._stateDict[entity] = to_state
+        return triggerDictType(entity_id=entity, from_state=trigger_dict.get("from_state", None), to_state=to_state, context=trigger_dict.get("context", None))
+
+    def _set_optimistic(self, entity: EntityType, header: dict, overrides: dict):
+        "Assumes the state in overrides for the entity until the service call in header has been handled, and updates the elements"
+        if entity not in self._stateDict:
+            return
+        
+        if entity in self._optimisticStates:
+            optimistic = self._optimisticStates[entity]
+            self._optimisticStates[entity] = optimistic._replace(header=header, overrides=merge_state(optimistic.overrides, overrides))
+        else:
+            self._optimisticStates[entity] = OptimisticState(header, overrides, self._stateDict[entity])
+
+        from_state = self._stateDict[entity]
+        to_state = merge_state(self._optimisticStates[entity].server_state, self._optimisticStates[entity].overrides)
+        self._stateDict[entity] = to_state
+        self._dispatcher.put(triggerDictType(entity_id=entity, from_state=from_state, to_state=to_state, context=None))
+
+    def _release_optimistic(self, entity: EntityType, header: dict, response: asyncio.Future):
+        """
+        Stops assuming the state of the entity once the service call setting it has been handled.
+        If the server reported a state in the meantime, or the call failed, the state of the server is shown again.
+        """
+        optimistic = self._optimisticStates.get(entity, None)
+        if optimistic == None or optimistic.header is not header:
+            ##A newer call took over
+            return
+        self._optimisticStates.pop(entity)
+
+        success = (not response.cancelled() and response.exception() == None
+                and response.result().get("success", False))
+        if success and not optimistic.received:
+            ##The state change is likely still on its way, until then the assumed state is the best guess
+            self.loop.call_later(OPTIMISTIC_STATE_TIMEOUT, self._expire_optimistic, entity, self._stateDict.get(entity, None), optimistic.server_state)
+            return
+
+        if not success:
+            _LOGGER.warning(f"Service action {header.get('domain')}.{header.get('service')} for {entity} failed, reverting to its last known state")
+
+        from_state = self._stateDict.get(entity, None)
+        if from_state != optimistic.server_state:
+            self._stateDict[entity] = optimistic.server_state
+            self._dispatcher.put(triggerDictType(entity_id=entity, from_state=from_state, to_state=optimistic.server_state, context=None))
+
+    def _expire_optimistic(self, entity: EntityType, assumed_state: stateDictType, server_state: stateDictType):
+        "Shows the state of the server again if the assumed state was not replaced by a state reported by the server, or by a newer service call"
+        if entity in self._optimisticStates or self._stateDict.get(entity, None) is not assumed_state:
+            return
+
+        _LOGGER.debug(f"Server did not report the new state of {entity} within {OPTIMISTIC_STATE_TIMEOUT} seconds, reverting to its last known state")
+        self._stateDict[entity] = server_state
+        self._dispatcher.put(triggerDictType(entity_id=entity, from_state=assumed_state, to_state=server_state, context=None))
+
+    async def async_flush_service_calls(self):
+        "Sends debounced service action calls that are still waiting right away, and waits until the commander has taken them from the message queue"
+        if not self._debouncer.pending:
+            return
+        self._debouncer.flush()
+
+        deadline = time.monotonic() + SEND_TIMEOUT
+        while self.commanding and not self.messageQueue.empty() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    def _debounce_service_call(self, header: dict, entity: Optional[EntityType], overrides: Optional[dict]):
+        "Submits a service call to the debouncer, and sets the optimistic state of the entity if given"
+        if entity != None and overrides:
+            self._set_optimistic(entity, header, overrides)
+        else:
+            entity = None
+        self._debouncer.submit(header, entity)
+
+    def _send_debounced(self, header: dict, entity: Optional[EntityType]):
+        "Puts a service call from the debouncer in the message queue"
+        if entity == None:
+            self.queue_message(header)
+            return
+        response = self.queue_message(header, expect_response=True)
+        response.add_done_callback(lambda fut: self._release_optimistic(entity, header, fut))
 
     async def _empty_message_queue(self):
         """
         Empties the queue with messages to be send to the commander, to prevent any service-actions from being performed on reconnect
         """
         while not self.messageQueue.empty():
-            await self.messageQueue.get()
+            item = await self.messageQueue.get()
+            if isinstance(item, OutboundMessage) and item.response != None:
+                self._router.fail(item.response, "Message was discarded before it was send")
             self.messageQueue.task_done()
 
     async def _new_entities_subscribe(self, *entities):
@@ -611,36 +1119,39 @@ class HAclient:
 
         _LOGGER.debug(f"Subscribing to new entities {entities}.")
 
-        states_msg = {
-        "id": self.next_id,
-        "type": "get_states"
-        }
+        states = None
+        if self._stateSubscription != None:
+            states = await self._async_subscribe_entities_states(set(entities))
+        subscribe_triggers = states == None
 
-        result = await self._async_get_message_result(states_msg)
-        states = result["result"]
+        if states == None:
+            states_msg = {
+            "type": "get_states"
+            }
 
-        for ent_state in filter(lambda ent_state: ent_state["entity_id"] in entities, states):
-            self._stateDict[ent_state["entity_id"]] = ent_state
+            result = await self._async_get_message_result(states_msg)
+            if not result.get("success", False):
+                _LOGGER.error(f"Unable to get the states of new entities {entities}")
+                return
+            states = {ent_state["entity_id"]: ent_state for ent_state in result["result"] if ent_state["entity_id"] in entities}
+
+        self._stateDict.update(states)
 
         for entity in filter(lambda entity: entity not in self._stateDict, entities):
             _LOGGER.error(f"entity {entity} could not be found on the Home Assistant server. Setting it's state to unknown.")
-            state = stateDictType(entity_id=entity,state="unknown", attributes={}, last_changed=None, last_reported=None,last_updated=None, context=None)
+            state = stateDictType(entity_id=entity,state=MISSING_ENTITY_STATE, attributes={}, last_changed=None, last_reported=None,last_updated=None, context=None)
             self._stateDict[entity] = state
 
-        ##Will remove the last_id later and have it set by the commander
-        for subscr in trigger_headers(entities, last_id=self.__last_id):
-            await self.messageQueue.put(subscr)
-        
-        last_id = subscr["id"]
-        if last_id > self.__last_id:
-            self.__last_id = last_id
+        if subscribe_triggers:
+            for subscr in trigger_headers(entities, group=self._groupSubscriptions):
+                self.queue_message(subscr)
         
         _LOGGER.info(f"Succesfully subscribed to new entities {entities}.")
 
-    def add_callback(self, message_id : int) -> asyncio.Task:
+    def add_callback(self, message_id : int) -> asyncio.Future:
         """
-        Indicates the response of the server from the message with the specified id is needed somewhere, and puts it in an asyncio queue when received.
-        The queue object is discarded from the callbacks afterwards (Since message_id's cannot be reused), and the task object returns the response.
+        Indicates the response of the server from the message with the specified id is needed somewhere.
+        Use `router.async_wait` to wait on it with a timeout, or cancel the future to stop waiting.
 
         Parameters
         ----------
@@ -649,26 +1160,11 @@ class HAclient:
 
         Returns
         -------
-        asyncio.Task
-            A task that can be awaited on, that will return the response from the server.
+        asyncio.Future
+            A future that can be awaited on, that will return the response from the server.
+            Raises a `ResponseLostError` if the listener stops before the response arrives.
         """        
-        if message_id in self._callback_queues:
-            _LOGGER.warning(f"A message with id {message_id} already has a callback assigned. Returning that queue")
-            return self._callback_queues[message_id]
-        
-        def remove_queue(future : asyncio.Future):
-            try:
-                id = future.result()["id"]
-                pop_id = id
-            except (asyncio.CancelledError, asyncio.exceptions.InvalidStateError):
-                pop_id = message_id
-            self._callback_queues.pop(pop_id, None)
-
-        resp_queue = asyncio.Queue(1)
-        self._callback_queues[message_id] = resp_queue
-        task = asyncio.create_task(resp_queue.get())
-        task.add_done_callback(remove_queue)
-        return task
+        return self._router.expect(message_id)
     #endregion
 
     def register_new_element(self, element : elements.Element):
@@ -695,7 +1191,8 @@ class HAclient:
             _LOGGER.debug(f"{entity_id} is not defined in config, adding it.")
             
             if self.websocket is not None:      
-                self.messageQueue.put_nowait(trigger_headers(entity_id,self.__last_id))
+                for header in trigger_headers(entity_id):
+                    self.queue_message(header)
 
             self._all_entities[entity_id] = {'entity_id': entity_id}
 
@@ -703,6 +1200,7 @@ class HAclient:
             self._elementDict[entity_id].add(element)
         else:
             self._elementDict[entity_id] = set([element])
+        self._add_visibility_hook(element)
 
     def _add_element(self, *element_list, update_elements=True, layout_element=None, internalbatch=True):
         '''
@@ -727,7 +1225,8 @@ class HAclient:
                 if entity_id not in self._all_entities:
                     _LOGGER.info(f"{entity_id} is not defined in config, adding it.")
                     if self.websocket is not None:      
-                        self.messageQueue.put_nowait(trigger_headers(entity_id,self.__last_id))
+                        for header in trigger_headers(entity_id):
+                            self.queue_message(header)
 
                     self._all_entities[entity_id] = {'entity_id': entity_id}
 
@@ -735,11 +1234,52 @@ class HAclient:
                     self._elementDict[entity_id].add(element)
                 else:
                     self._elementDict[entity_id] = set([element])
+                self._add_visibility_hook(element)
 
             if isinstance(element,elements.Layout):
                 for subElement in element.createEltList():
                     self.add_element(subElement, layout_element=element, update_elements=False, internalbatch=internalbatch)
                     
+    def _element_visible(self, element: HAelement) -> bool:
+        "Whether the trigger of the element should run now. Before the screen starts printing all elements are considered visible, so the first print shows the correct states."
+        if not self.pssmScreen.printing:
+            return True
+        return getattr(element, "onScreen", True)
+
+    def _mark_dirty(self, element: HAelement, trigger_dict: triggerDictType):
+        "Saves the trigger of an element that is not on screen, to run it once the element is added to the screen. Keeps the from_state of a trigger that was already waiting."
+        waiting = self._dirtyElements.get(element, None)
+        from_state = waiting["from_state"] if waiting != None else trigger_dict["from_state"]
+        self._dirtyElements[element] = triggerDictType(entity_id=trigger_dict["entity_id"], to_state=trigger_dict["to_state"],
+                                                    from_state=from_state, context=trigger_dict.get("context", None))
+
+    def _add_visibility_hook(self, element: HAelement):
+        "Wraps the on_add function of the element, so waiting triggers are run when it is added to the screen, i.e. when showing a popup or switching tabs."
+        on_add = getattr(element, "on_add", None)
+        if getattr(on_add, "_client_visibility_hook", False):
+            return
+
+        client = self
+        def visibility_on_add(*args, **kwargs):
+            if callable(on_add):
+                on_add(*args, **kwargs)
+            if element in client._dirtyElements:
+                ##on_add may be called from outside the event loop
+                asyncio.run_coroutine_threadsafe(client._async_run_dirty_trigger(element), client.pssmScreen.mainLoop)
+
+        visibility_on_add._client_visibility_hook = True
+        element.on_add = visibility_on_add
+
+    async def _async_run_dirty_trigger(self, element: HAelement):
+        "Runs the waiting trigger of an element"
+        trigger_dict = self._dirtyElements.pop(element, None)
+        if trigger_dict == None:
+            return
+        try:
+            await tools.wrap_to_coroutine(element.trigger_function, element, MappingProxyType(trigger_dict))
+        except FuncExceptions as exce:
+            _LOGGER.error(f"{element} trigger_function returned an exception: {exce}")
+
     def update_element_entity(self, element : HAelement, new_entity : str, old_entity = None, update_now=True):
         """
         Updated the entity associated with the element to new_entity
@@ -827,13 +1367,22 @@ class HAclient:
 
     async def update_states(self,trigger):
         "Updates the clients state dict from the trigger. Calls any update functions (elements and general functions) associated with the entity as well."
+        trigger_dict = self._apply_trigger_event(trigger)
+        await self._async_trigger_entity(trigger_dict)
+
+    def _apply_trigger_event(self, trigger: dict) -> triggerDictType:
+        "Updates the state dict from a state trigger event, and returns the trigger dict"
         updated_entity = trigger["event"]["variables"]["trigger"]["entity_id"]
         to_state = trigger["event"]["variables"]["trigger"]["to_state"]
 
         trigger_dict = trigger["event"]["variables"]["trigger"]
         trigger_dict["context"] = trigger["event"]["context"]
         self._stateDict[updated_entity] = to_state
-        
+        return trigger_dict
+
+    async def _async_trigger_entity(self, trigger_dict: triggerDictType):
+        "Calls the functions and updates the elements associated with the entity in the trigger. The state dict must already hold the new state."
+        updated_entity = trigger_dict["entity_id"]
         trigger_dict = MappingProxyType(trigger_dict)
 
         coro_list = []
@@ -852,6 +1401,9 @@ class HAclient:
                     element : HAelement
                     if not hasattr(element,"trigger_function"):
                         continue
+                    if not self._element_visible(element):
+                        self._mark_dirty(element, trigger_dict)
+                        continue
                     func = element.trigger_function
                     coro_list.append(tools.wrap_to_coroutine(func,element,trigger_dict))
                     func_list.append(func)
@@ -864,32 +1416,70 @@ class HAclient:
                 if isinstance(res,Exception): 
                     _LOGGER.error(f"{func_list[i]} returned an exception: {res} ")
 
+    async def _async_subscribe_pipelined(self, headers: list[dict]) -> int:
+        """
+        Sends all subscribe headers at once, and collects the responses as they come in, instead of waiting on the response of each header before sending the next.
+        Events received in the meantime are passed to the dispatcher.
+        Reads from the websocket directly, so only use it before the listener has started.
+
+        Parameters
+        ----------
+        headers : list[dict]
+            The subscribe_trigger headers to send
+
+        Returns
+        -------
+        int
+            The amount of subscriptions that failed
+        """
+        pending = {header["id"]: header for header in headers}
+        for header in headers:
+            await self.websocket.send(self._codec.dumps(header))
+        _LOGGER.debug(f"Send {len(headers)} subscribe headers, waiting for responses")
+
+        fails = 0
+        while pending:
+            subscr_resp = await self._async_recv()
+
+            if subscr_resp.get("type", None) == "event":
+                self._dispatch_event(subscr_resp)
+                continue
+
+            header = pending.pop(subscr_resp.get("id", None), None)
+            if header == None:
+                continue
+
+            if not subscr_resp.get("success", False):
+                fails += 1
+                _LOGGER.error(f'Failed to subscribe to {header["trigger"]["entity_id"]}, server responded with {subscr_resp}')
+            else:
+                for func in self._subcribe_callbacks:
+                    func(self, header)
+        return fails
+
     async def subscribe_to_trigger(self, entity: Union[str,list[str]] = None, trigger: dict = None):
         if entity == None and trigger == None:
             return
 
         if entity:
-            header = trigger_headers(entity, self.__last_id)
+            header = trigger_headers(entity, group=True)[0]
         else:
             header = trigger
         
         if self.commanding:
-            t = self.add_callback(header["id"])
-            await self.messageQueue.put(header)
-            subscr_resp = await t
+            fut = self.queue_message(header, expect_response=True)
+            subscr_resp = await self._router.async_wait(fut)
         else:
-            await self.websocket.send(json.dumps(header))
+            if "id" not in header or not self._ids.observe(header["id"]):
+                header["id"] = self.next_id
+            await self.websocket.send(self._codec.dumps(header))
             subscr_resp = {}
 
             while subscr_resp.get("id", None) != header["id"]:
-                subscr_resp = await self.websocket.recv()
-                subscr_resp = json.loads(subscr_resp)
+                subscr_resp = await self._async_recv()
 
                 if subscr_resp.get("type", None) == "event":
-                    try:
-                        asyncio.create_task(self.update_states(subscr_resp))
-                    except (TypeError, KeyError, IndexError, OSError) as exce:
-                        _LOGGER.error(f"Error in update states for {subscr_resp}: {exce}")
+                    self._dispatch_event(subscr_resp)
 
         _LOGGER.debug(subscr_resp)
         if not "success" in subscr_resp:
@@ -926,7 +1516,7 @@ class HAclient:
 
     def call_service_action(self, elt : Union[HAelement,elements.Element]=None, coords : screen.CoordType = None, 
                             action : str = None, action_data : Union[dict,str] = None, target : Union[dict,str,None] = None, response : bool = False, service_id : Optional[str] = None,
-                            *args, **action_data_kwargs) -> Union[asyncio.Task[Any,dict],None]:
+                            *args, debounce : bool = False, **action_data_kwargs) -> Union[asyncio.Task[Any,dict],None]:
         '''
         Builds a message for the commander to call a service action on the Home Assistant server. Mainly made to work as the tap_action function of PSSM elements, but can also be called separately
         Calls a home assistant service action
@@ -938,6 +1528,7 @@ class HAclient:
                 target: target (entity id, area etc.) to call the action on. Overwrites element target is one has been passed.
                 response_function (bool): If true, the response of the action call will be caught and forwarded via the task
                 response (bool): If true, the function tell the client to catch the result of the action call. In this case, the `call_service_action` function will return an asyncio Task that can be awaited, which will return the result of the response (or the entire response if the call was unsuccesfull)
+                debounce (bool): If true, calls for the same action and target made in quick succession are collapsed into the last one (i.e. when dragging a slider). If elt shows a single value of its entity, that value is shown optimistically until the call has been handled. Ignored if response is true.
         '''
         _LOGGER.debug("Calling a service action")
         service_header = {}
@@ -961,6 +1552,9 @@ class HAclient:
             response_task = self.loop.create_task(self._async_get_message_result( service_header, elt, coords))
             _LOGGER.debug("Made task for service callback and added to queue")
             return response_task
+        elif debounce and service_header:
+            (entity, overrides) = self._optimistic_overrides(elt, service_header)
+            self.loop.call_soon_threadsafe(self._debounce_service_call, service_header, entity, overrides)
         else:
             asyncio.run_coroutine_threadsafe(
                 self.messageQueue.put(service_header),
@@ -968,6 +1562,22 @@ class HAclient:
             )
         return
 
+    def _optimistic_overrides(self, elt : Optional[Union[HAelement,elements.Element]], service_header : dict) -> tuple[Optional[EntityType], Optional[dict]]:
+        """
+        Gets the state to assume for the entity of an element while the service call from it is pending.
+        Only possible for elements that set a single value, like sliders and counters. The value is assumed for the element's entity_attribute, or its state if it does not have one.
+        """
+        entity = getattr(elt, "entity", None)
+        service_data = service_header.get("service_data", None)
+        if not isinstance(entity, str) or not isinstance(service_data, dict) or len(service_data) != 1:
+            return (entity, None)
+
+        value = next(iter(service_data.values()))
+        attribute = getattr(elt, "entity_attribute", None)
+        if attribute:
+            return (entity, {"attributes": {attribute: value}})
+        return (entity, {"state": str(value)})
+
     def build_service_header(self, action_id : str, action_data : Optional[dict], target : Optional[Union[dict,str]] = None, return_response : bool=False) -> actionCallDict:
         '''
         Builds the header to send to Home Assistant to call the asked for service with the service data and target ID
@@ -992,9 +1602,7 @@ class HAclient:
             _LOGGER.warning(f"Error in service action call {full_service}", exc_info=True)
             return
 
-        msg_id = self.next_id
         service_header = { 
-            "id": msg_id,
             "type": "call_service",
             "domain": serv_domain,
             "service": serv_service,
@@ -1070,7 +1678,7 @@ class HAclient:
         service_message = self.build_service_header(service_id, service_data, target)
         return service_message
 
-    async def _async_get_message_result(self, message, *args) -> Union[Any,Literal[False]]:
+    async def _async_get_message_result(self, message, *args, timeout: float = None, on_send: Callable[[int],None] = None) -> Union[Any,Literal[False]]:
         """
         Quick hand to easily get the response of a message send to the command.
         Simply 
@@ -1078,7 +1686,11 @@ class HAclient:
         Parameters
         ----------
         message : dict
-            The message to put in the message queue. If it does not have an id yet, the id will be set automatically
+            The message to put in the message queue. Its id is set when it is send.
+        timeout : float, optional
+            Time in seconds to wait on the response, by default None, which uses `RESPONSE_TIMEOUT`. If it times out, an unsuccessful result is returned.
+        on_send : Callable[[int],None], optional
+            Function that is called with the id of the message right before it is send, by default None
 
         Returns
         -------
@@ -1086,19 +1698,10 @@ class HAclient:
             The response. If the reponse was successful, it just returns the ["result"]["response"] part of the response (Like you would see in the developer_tools perform action part of the frontend). Returns False if the response was not succesful.
         """        
 
-        if "id" not in message:
-            message_id = self.next_id
-            message["id"] = message_id
-        else:
-            message_id = message["id"]
-
-        task = self.add_callback(message_id)
-
-        #self.next_message = service_header
-        await self.messageQueue.put(message)
-        _LOGGER.debug(f"Waiting for service response from id {message_id}")
-        response = await task
-        _LOGGER.debug(f"Message {message_id} returned service response.")
+        fut = self.queue_message(message, expect_response=True, on_send=on_send)
+        _LOGGER.debug(f"Waiting for response to {message.get('type', 'message')}")
+        response = await self._router.async_wait(fut, timeout)
+        _LOGGER.debug(f"Message {message.get('id', None)} returned service response.")
         if not response.get("success",False):
             _LOGGER.error(f"Error getting a service action response. Received {response}")
         return response
@@ -1208,6 +1811,10 @@ class HAclient:
                         ent_dict = {"entity_id": entity_id, "to_state": to_state, 'from_state': None, 'context': None}
                         ent_dict = triggerDictType(**ent_dict)
 
+                        if hasattr(element,"trigger_function") and not self._element_visible(element):
+                            self._mark_dirty(element, ent_dict)
+                            continue
+
                         if isinstance(element,elements.Slider) and hasattr(element,"trigger_function"):
                             #The slider update would jump around a bit since the lights fade. It updates on touch, and then has a delayed callback to update the indicator precisely
                             #The delay is thus not called if the service was not called recently (so when fading it from your phone eg)
@@ -76,6 +76,7 @@ class HomeAssistantMenu(menu.UniquePopupMenu):
         titleTxt = f"Not connected to Home Assistant"
         self.__titleButton = base.Button(titleTxt, **buttonSettings)
         self.__integrationButton = base.Button("inkBoard integration not found", **buttonSettings)
+        self.__latencyButton = base.Button("Round trip time not measured yet", **buttonSettings)
         
         buttonSettings["background_color"] = menu.DEFAULT_MENU_BUTTON_COLOR
         buttonSettings["text_x_position"] = "center"
@@ -88,11 +89,12 @@ class HomeAssistantMenu(menu.UniquePopupMenu):
         iconCol = "home-assistant"
         self.__clientElt = ClientElement(tap_action=None, icon_color = iconCol)
         self.__integrationIcon = base.Icon("mdi:devices", icon_color=iconCol)
+        self.__latencyIcon = base.Icon("mdi:timer-sand", icon_color=iconCol)
 
         self.__HAclient = None
 
         popupid = "home-assistant-menu"
-        height = 225
+        height = 280
 
         super().__init__(popupid, "Home Assistant", height=height, id=popupid, **kwargs)
 
@@ -129,6 +131,8 @@ class HomeAssistantMenu(menu.UniquePopupMenu):
             [h_margin],
             [h, (None,m), (self.__integrationIcon, "r"), (None,m), (self.__integrationButton,"?")],
             [h_margin],
+            [h, (None,m), (self.__latencyIcon, "r"), (None,m), (self.__latencyButton,"?")],
+            [h_margin],
             ["?", (self.__reconnectButton,"?"), (self.__connectButton,"?"), (self.__disconnectButton,"?")]
         ]
         
@@ -144,13 +148,15 @@ class HomeAssistantMenu(menu.UniquePopupMenu):
         
         self.HAclient ##Is this still None? -> should not be the case
         condition : asyncio.Condition = self.HAclient.websocketCondition
-        testVal = getattr(self.HAclient,"clientState")
+        testVal = (self.HAclient.clientState, self.HAclient.latency["pongs"], self.HAclient.latency["missed"])
         asyncio.create_task(self._update_buttons())
 
+        ##The ping-pong script notifies the condition after each ping, so the round trip time is kept up to date as well
+        state = lambda : (self.HAclient.clientState, self.HAclient.latency["pongs"], self.HAclient.latency["missed"])
         while self.onScreen:
             async with condition:
-                await condition.wait_for(lambda : testVal != self.HAclient.clientState)
-                testVal = self.HAclient.clientState
+                await condition.wait_for(lambda : testVal != state())
+                testVal = state()
 
                 asyncio.create_task(self._update_buttons())
         
@@ -181,5 +187,12 @@ class HomeAssistantMenu(menu.UniquePopupMenu):
         update_coros.add(self.__integrationButton.async_update({"text": ib_int_text}))
         update_coros.add(self.__integrationIcon.async_update({"badge_icon": badge}))
 
+        latency = self.HAclient.latency
+        if latency["srtt"] == None:
+            latency_text = "Round trip time not measured yet"
+        else:
+            latency_text = f"Round trip {latency['srtt']:.0f}ms (last {latency['rtt']:.0f}ms), {latency['missed']} pongs missed"
+        update_coros.add(self.__latencyButton.async_update({"text": latency_text}))
+
         await asyncio.gather(*update_coros)
         return
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""
+JSON codecs for the messages send over the websocket.
+orjson or msgspec are used if they are installed, since they are a lot faster at parsing state events than the json module, which is used otherwise.
+Decoders accept the raw bytes of a frame, so frames do not need to be decoded to a string first.
+
+Run this module with a file of recorded traffic (see the `record_traffic` option of the client) to benchmark the available codecs:
+`python -m inkBoarddesigner.integrations.homeassistant_client.codec traffic.jsonl`
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Literal, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+CodecName = Literal["auto", "orjson", "msgspec", "json"]
+
+CODEC_PREFERENCE = ("orjson", "msgspec", "json")
+"Order in which codecs are picked when using auto"
+
+@dataclass(frozen=True)
+class JSONCodec:
+    "Functions to encode and decode websocket messages"
+
+    name: str
+    loads: Callable[[Union[str,bytes]], Any]
+    "Decodes a message, from either bytes or a string"
+
+    dumps: Callable[[Any], str]
+    "Encodes a message into a string, since Home Assistant expects text frames"
+
+def _json_codec() -> JSONCodec:
+    encoder = json.JSONEncoder(separators=(",", ":"))
+    return JSONCodec("json", json.loads, encoder.encode)
+
+def _orjson_codec() -> JSONCodec:
+    import orjson
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+    return JSONCodec("orjson", orjson.loads, dumps)
+
+def _msgspec_codec() -> JSONCodec:
+    import msgspec
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+    def dumps(obj) -> str:
+        return encoder.encode(obj).decode()
+    return JSONCodec("msgspec", decoder.decode, dumps)
+
+_CODECS: dict[str, Callable[[], JSONCodec]] = {
+    "orjson": _orjson_codec,
+    "msgspec": _msgspec_codec,
+    "json": _json_codec,
+}
+
+def get_codec(name: CodecName = "auto") -> JSONCodec:
+    """Returns the codec with the given name. If it cannot be imported, the json module is used.
+
+    Parameters
+    ----------
+    name : CodecName, optional
+        The codec to use, by default auto, which uses the first installed codec from `CODEC_PREFERENCE`
+
+    Returns
+    -------
+    JSONCodec
+        The codec
+    """
+    if name == "auto":
+        for codec_name in CODEC_PREFERENCE:
+            try:
+                return _CODECS[codec_name]()
+            except ImportError:
+                continue
+
+    if name not in _CODECS:
+        _LOGGER.warning(f"Unknown json codec {name}, using json")
+        return _json_codec()
+
+    try:
+        return _CODECS[name]()
+    except ImportError:
+        _LOGGER.warning(f"Unable to import {name}, using json to decode messages")
+        return _json_codec()
+
+def available_codecs() -> list[JSONCodec]:
+    "Returns all codecs that can be imported"
+    codecs = []
+    for name in CODEC_PREFERENCE:
+        try:
+            codecs.append(_CODECS[name]())
+        except ImportError:
+            continue
+    return codecs
+
+def load_traffic(file: Union[str, Path]) -> list[bytes]:
+    "Reads a file with recorded traffic, which holds a received message per line"
+    with open(file, "rb") as f:
+        return [line.rstrip(b"\n") for line in f if line.strip()]
+
+def benchmark(messages: list[bytes], rounds: int = 10) -> dict[str, dict[str, float]]:
+    """Times decoding and encoding the messages with each available codec.
+
+    Parameters
+    ----------
+    messages : list[bytes]
+        The raw messages, as received from the websocket
+    rounds : int, optional
+        How often to process all messages, by default 10
+
+    Returns
+    -------
+    dict[str, dict[str, float]]
+        Per codec, the average time in microseconds to decode and to encode a message
+    """
+    results = {}
+    for codec in available_codecs():
+        decoded = [codec.loads(msg) for msg in messages]
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for msg in messages:
+                codec.loads(msg)
+        decode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for obj in decoded:
+                codec.dumps(obj)
+        encode_time = time.perf_counter() - start
+
+        count = max(len(messages)*rounds, 1)
+        results[codec.name] = {"decode": decode_time/count*1e6, "encode": encode_time/count*1e6}
+    return results
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the available json codecs on recorded Home Assistant traffic")
+    parser.add_argument("traffic", help="File with recorded traffic, one message per line")
+    parser.add_argument("--rounds", type=int, default=10, help="How often to process all messages")
+    args = parser.parse_args()
+
+    messages = load_traffic(args.traffic)
+    size = sum(len(msg) for msg in messages)
+    print(f"{len(messages)} messages, {size/1024:.0f}kB")
+    for name, res in benchmark(messages, args.rounds).items():
+        print(f"{name:>8}: decode {res['decode']:.1f}us, encode {res['encode']:.1f}us per message")
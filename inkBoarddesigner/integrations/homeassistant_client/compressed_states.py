@@ -0,0 +1,185 @@
+"""
+Handles the compressed state format Home Assistant uses for `subscribe_entities` messages.
+The compressed format uses short keys, and timestamps instead of datetime strings, which makes the messages a lot smaller than the full states returned by `get_states`.
+State changes are send as diffs, holding only the changed parts of a state, which are applied onto the states the client already has.
+"""
+
+from datetime import datetime, timezone
+from typing import TypedDict, Optional, Union
+import logging
+
+from .constants import MISSING_ENTITY_STATE
+from .helpers import stateDictType, triggerDictType
+
+_LOGGER = logging.getLogger(__name__)
+
+COMPRESSED_STATE = "s"
+COMPRESSED_ATTRIBUTES = "a"
+COMPRESSED_CONTEXT = "c"
+COMPRESSED_LAST_CHANGED = "lc"
+COMPRESSED_LAST_UPDATED = "lu"
+
+ENTITIES_ADDED = "a"
+"Key in subscribe_entities events holding the full (compressed) states of entities"
+
+ENTITIES_CHANGED = "c"
+"Key in subscribe_entities events holding the changes to entity states"
+
+ENTITIES_REMOVED = "r"
+"Key in subscribe_entities events holding the entity_ids of removed entities"
+
+DIFF_ADDITIONS = "+"
+"Key in a state diff holding the changed and added values"
+
+DIFF_REMOVALS = "-"
+"Key in a state diff holding the removed values, i.e. the keys of removed attributes"
+
+REMOVED_STATE = MISSING_ENTITY_STATE
+"State given to entities removed from the server. The same as entities that were missing when connecting, since to the client there is no difference."
+
+compressedStateType = TypedDict("compressedStateType", {"s": str, "a": dict, "c": Union[str,dict], "lc": float, "lu": float}, total=False)
+"Typed dict for an entity state in the compressed format"
+
+def timestamp_to_str(timestamp: Optional[float]) -> Optional[str]:
+    "Converts a timestamp from a compressed state to the datetime string format used in full states"
+    if timestamp == None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+def context_to_dict(context: Union[str,dict,None]) -> Optional[dict]:
+    "Converts a compressed context, which is either the context id or the full context, to a context dict"
+    if context == None:
+        return None
+    if isinstance(context, str):
+        return {"id": context, "parent_id": None, "user_id": None}
+    return context
+
+def expand_compressed_state(entity_id: str, compressed: compressedStateType) -> stateDictType:
+    """Converts a compressed state into the state dict format returned by `get_states` and state triggers.
+
+    Parameters
+    ----------
+    entity_id : str
+        The entity the state belongs to
+    compressed : compressedStateType
+        The compressed state
+
+    Returns
+    -------
+    stateDictType
+        The full state
+    """
+    last_changed = timestamp_to_str(compressed.get(COMPRESSED_LAST_CHANGED, None))
+    last_updated = timestamp_to_str(compressed.get(COMPRESSED_LAST_UPDATED, None)) or last_changed
+    return stateDictType(
+        entity_id=entity_id,
+        state=compressed.get(COMPRESSED_STATE, MISSING_ENTITY_STATE),
+        attributes=dict(compressed.get(COMPRESSED_ATTRIBUTES, {})),
+        last_changed=last_changed,
+        last_reported=last_updated,
+        last_updated=last_updated,
+        context=context_to_dict(compressed.get(COMPRESSED_CONTEXT, None))
+    )
+
+def expand_compressed_states(compressed_states: dict[str, compressedStateType]) -> dict[str, stateDictType]:
+    "Converts the added entities from a subscribe_entities event into full states"
+    return {entity_id: expand_compressed_state(entity_id, compressed) for entity_id, compressed in compressed_states.items()}
+
+def apply_compressed_diff(state: stateDictType, diff: dict) -> stateDictType:
+    """Applies a compressed state diff to a state.
+
+    The state itself is not altered, since it is still needed as the `from_state` of the trigger.
+    The new state is a shallow copy, so unchanged attributes are shared with the old state instead of being parsed again.
+
+    Parameters
+    ----------
+    state : stateDictType
+        The current state of the entity
+    diff : dict
+        The diff, with the changes under `+` and the removed attributes under `-`
+
+    Returns
+    -------
+    stateDictType
+        The new state
+    """
+    new_state = dict(state)
+    additions: compressedStateType = diff.get(DIFF_ADDITIONS, {})
+    removals: dict = diff.get(DIFF_REMOVALS, {})
+
+    if COMPRESSED_STATE in additions:
+        new_state["state"] = additions[COMPRESSED_STATE]
+
+    if COMPRESSED_ATTRIBUTES in additions or COMPRESSED_ATTRIBUTES in removals:
+        attributes = dict(state.get("attributes", {}))
+        attributes.update(additions.get(COMPRESSED_ATTRIBUTES, {}))
+        for attr in removals.get(COMPRESSED_ATTRIBUTES, []):
+            attributes.pop(attr, None)
+        new_state["attributes"] = attributes
+
+    if COMPRESSED_CONTEXT in additions:
+        ##In diffs, a string is only the new context id, and a dict only holds the changed keys
+        context = dict(state.get("context", None) or context_to_dict(""))
+        if isinstance(additions[COMPRESSED_CONTEXT], str):
+            context["id"] = additions[COMPRESSED_CONTEXT]
+        else:
+            context.update(additions[COMPRESSED_CONTEXT])
+        new_state["context"] = context
+
+    ##Home Assistant only sends last_updated if last_changed did not change
+    if COMPRESSED_LAST_CHANGED in additions:
+        new_state["last_changed"] = timestamp_to_str(additions[COMPRESSED_LAST_CHANGED])
+        new_state["last_updated"] = new_state["last_changed"]
+        new_state["last_reported"] = new_state["last_changed"]
+    elif COMPRESSED_LAST_UPDATED in additions:
+        new_state["last_updated"] = timestamp_to_str(additions[COMPRESSED_LAST_UPDATED])
+        new_state["last_reported"] = new_state["last_updated"]
+
+    return new_state
+
+def apply_entities_event(states: dict[str, stateDictType], event: dict) -> list[triggerDictType]:
+    """Applies a subscribe_entities event to the states, and returns the triggers for each entity that changed.
+
+    Added entities replace the state, changed entities have their diff applied, and removed entities are set to unavailable.
+
+    Parameters
+    ----------
+    states : dict[str, stateDictType]
+        The states to update, keyed by entity_id
+    event : dict
+        The event from the subscription
+
+    Returns
+    -------
+    list[triggerDictType]
+        Trigger dicts for the entities that changed, in the same shape as those from state triggers
+    """
+    triggers = []
+
+    for entity_id, compressed in event.get(ENTITIES_ADDED, {}).items():
+        new_state = expand_compressed_state(entity_id, compressed)
+        triggers.append(_make_trigger(entity_id, states.get(entity_id, None), new_state))
+        states[entity_id] = new_state
+
+    for entity_id, diff in event.get(ENTITIES_CHANGED, {}).items():
+        if entity_id not in states:
+            _LOGGER.debug(f"Received a state diff for {entity_id}, but it has no state yet")
+            continue
+        old_state = states[entity_id]
+        new_state = apply_compressed_diff(old_state, diff)
+        triggers.append(_make_trigger(entity_id, old_state, new_state))
+        states[entity_id] = new_state
+
+    for entity_id in event.get(ENTITIES_REMOVED, []):
+        old_state = states.get(entity_id, None)
+        if old_state == None:
+            continue
+        new_state = dict(old_state)
+        new_state["state"] = REMOVED_STATE
+        triggers.append(_make_trigger(entity_id, old_state, new_state))
+        states[entity_id] = new_state
+
+    return triggers
+
+def _make_trigger(entity_id: str, from_state: Optional[stateDictType], to_state: stateDictType) -> triggerDictType:
+    return triggerDictType(entity_id=entity_id, to_state=to_state, from_state=from_state, context=to_state.get("context", None))
@@ -0,0 +1,121 @@
+"""
+Compiles the conditions used as keys in `state_styles` and `attribute_styles`, like `'state < 5'`.
+Conditions are parsed once into a code object, instead of being passed to `eval` on every trigger.
+Only simple expressions are allowed: comparisons, arithmetic, boolean logic, literals, public attributes, and a few builtin functions and methods.
+The only name available is `state`, so conditions cannot import modules or access anything outside of the state.
+"""
+
+import ast
+import logging
+from functools import lru_cache
+from types import CodeType
+from typing import Any, Iterable, NamedTuple, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+CONDITION_NAME = "state"
+"The name the state is available under in conditions"
+
+ALLOWED_FUNCTIONS = {f.__name__: f for f in (abs, bool, float, int, len, max, min, round, str)}
+"Builtin functions that can be called in conditions"
+
+ALLOWED_METHODS = frozenset({
+    "startswith", "endswith", "lower", "upper", "strip", "lstrip", "rstrip", "split", "replace", "count", "find",
+    "isdigit", "isnumeric", "isalpha", "isalnum", "get", "keys", "values", "items",
+})
+"Methods that can be called in conditions. Methods like `str.format` are not allowed, since they can reach attributes outside of the state."
+
+ALLOWED_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load,
+    ast.BoolOp, ast.And, ast.Or,
+    ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.Compare, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn, ast.Is, ast.IsNot,
+    ast.IfExp, ast.Tuple, ast.List, ast.Set, ast.Dict,
+    ast.Subscript, ast.Slice,
+    ast.Attribute, ast.Call,
+)
+"AST nodes conditions may consist of"
+
+EVAL_EXCEPTIONS = (NameError, TypeError, ValueError, AttributeError, IndexError, KeyError, ZeroDivisionError)
+"Exceptions that make a condition evaluate as not matching"
+
+_GLOBALS = {"__builtins__": {}, **ALLOWED_FUNCTIONS}
+
+class Condition(NamedTuple):
+    "A condition string and its compiled code"
+
+    condition: str
+    code: CodeType
+
+def _validate(tree: ast.AST):
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"{node.__class__.__name__} is not allowed")
+        if isinstance(node, ast.Name) and node.id != CONDITION_NAME and node.id not in ALLOWED_FUNCTIONS:
+            raise ValueError(f"Unknown name {node.id}")
+        if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            raise ValueError(f"Private attribute {node.attr} is not allowed")
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Attribute):
+                if node.func.attr not in ALLOWED_METHODS:
+                    raise ValueError(f"Method {node.func.attr} is not allowed")
+            elif not isinstance(node.func, ast.Name):
+                raise ValueError("Only functions and methods can be called")
+
+def compile_condition(condition: str) -> Optional[Condition]:
+    """Compiles a condition. Results are cached, since the same conditions are often used by multiple elements.
+
+    Parameters
+    ----------
+    condition : str
+        The condition, e.g. `'state < 5'`
+
+    Returns
+    -------
+    Optional[Condition]
+        The compiled condition, or None if the string is not a condition (it does not use `state`, or is not a valid expression) or uses something that is not allowed.
+    """
+    if not isinstance(condition, str) or CONDITION_NAME not in condition:
+        return None
+    return _compile(condition)
+
+@lru_cache(maxsize=512)
+def _compile(condition: str) -> Optional[Condition]:
+    try:
+        tree = ast.parse(condition.strip(), mode="eval")
+    except SyntaxError:
+        ##Not an expression, so the key is likely just a state
+        return None
+
+    try:
+        _validate(tree)
+    except ValueError as exce:
+        _LOGGER.warning(f"Condition '{condition}' cannot be used: {exce}")
+        return None
+
+    return Condition(condition, compile(tree, f"<condition {condition}>", "eval"))
+
+def compile_conditions(conditions: Iterable[str]) -> tuple[Condition, ...]:
+    "Compiles the conditions and returns the valid ones, in order"
+    return tuple(c for cond in conditions if (c := compile_condition(cond)) != None)
+
+def evaluate(condition: Condition, state: Any) -> bool:
+    """Evaluates a compiled condition for the state.
+
+    Parameters
+    ----------
+    condition : Condition
+        The compiled condition
+    state : Any
+        The value available as `state`
+
+    Returns
+    -------
+    bool
+        Whether the condition holds. Conditions that raise an error, for example when comparing a string to a number, do not hold.
+    """
+    try:
+        return bool(eval(condition.code, _GLOBALS, {CONDITION_NAME: state}))
+    except EVAL_EXCEPTIONS:
+        return False
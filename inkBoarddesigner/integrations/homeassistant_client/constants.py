@@ -49,9 +49,78 @@ That means this constant is likely not necessary anywhere, but leaving it here i
 DEFAULT_PING_INTERVAL : int = 50 #seconds
 "Default time in seconds to send a new ping"
 
+DEFAULT_GROUP_SUBSCRIPTIONS : bool = False
+"Default for subscribing to all entities with a single trigger, instead of one trigger per entity"
+
+DEFAULT_COMPRESSED_STATES : bool = True
+"Default for using subscribe_entities, which sends states in a compressed format and only for the requested entities, if the server supports it."
+
+SUBSCRIBE_ENTITIES_MIN_VERSION : tuple[int,int] = (2022, 4)
+"The first Home Assistant version (year, month) that supports the subscribe_entities command"
+
+SUBSCRIBE_ENTITIES_TIMEOUT : int = 10
+"Time in seconds to wait for the initial states after subscribing to entities"
+
+DEFAULT_JSON_CODEC : Literal["auto", "orjson", "msgspec", "json"] = "auto"
+"Default codec to encode and decode messages with. auto uses orjson or msgspec if installed, and json otherwise."
+
+DISPATCH_WORKERS : int = 4
+"Maximum amount of entities of which the triggers are handled at the same time"
+
+IMAGE_CACHE_FOLDER : str = ".cache/home_assistant/images"
+"Folder, relative to the config folder, to cache images from Home Assistant in"
+
+IMAGE_CACHE_MEMORY_SIZE : int = 32
+"Default maximum amount of decoded images to keep in memory"
+
+IMAGE_CACHE_DISK_SIZE : int = 50
+"Default maximum size of the image cache on disk, in megabytes"
+
+HTTP_MAX_CONNECTIONS : int = 4
+"Default maximum amount of http requests (e.g. for entity pictures) running at the same time"
+
+HTTP_TIMEOUT : int = 10
+"Default time in seconds before an http request is cancelled"
+
+RESPONSE_TIMEOUT : int = 30
+"Default time in seconds to wait for the server to respond to a message"
+
+MAX_PENDING_RESPONSES : int = 256
+"Maximum amount of messages waiting on a response. When exceeded, the oldest ones stop waiting"
+
+OUTBOUND_BATCH_SIZE : int = 32
+"Maximum amount of queued messages the commander sends in one go"
+
+SEND_TIMEOUT : int = 10
+"Time in seconds the commander waits on sending a batch of messages before giving up"
+
+SERVICE_DEBOUNCE_DELAY : float = 0.3
+"Default time in seconds without new calls before a debounced service action call (e.g. from a slider) is sent"
+
+MISSING_ENTITY_STATE : str = "unknown"
+"State given to entities that are not (or no longer) on the Home Assistant server"
+
+OPTIMISTIC_STATE_TIMEOUT : float = 5
+"Time in seconds an assumed state is kept after its service action call succeeded, if the server does not report the new state"
+
 MAX_PONGS_MISSED : int = 5
 "Max amount of pongs to be missed before the connection is considered broken."
 
+PING_IDLE_BACKOFF_MAX : int = 4
+"Maximum factor the ping interval grows by while the connection is idle"
+
+PONG_TIMEOUT_INITIAL : float = 10
+"Time in seconds to wait on a pong before the round trip time has been measured"
+
+PONG_TIMEOUT_MIN : float = 2
+"Minimum time in seconds to wait on a pong, regardless of the measured round trip time"
+
+PONG_TIMEOUT_MAX : float = 30
+"Maximum time in seconds to wait on a pong"
+
+PONG_DETECTION_MAX : float = 45
+"Maximum time in seconds from the first missed pong until the connection is considered lost"
+
 HOMEASSISTANT_BLUE : tuple = (3, 169, 244, 255)
 "The Blue Color used in Home Assistant Branding :)"
 
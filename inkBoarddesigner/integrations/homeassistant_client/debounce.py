@@ -0,0 +1,112 @@
+"""
+Debounces service action calls from continuous controls, like sliders and counters.
+Calls for the same action and target made in quick succession are collapsed into the last one, which is sent once no new call has come in for the debounce delay (trailing edge).
+While a call is pending, the client shows the value optimistically, so the interface does not wait on the round trip to Home Assistant.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, NamedTuple
+
+from .constants import SERVICE_DEBOUNCE_DELAY
+from .helpers import stateDictType
+
+_LOGGER = logging.getLogger(__name__)
+
+class OptimisticState(NamedTuple):
+    "Optimistic state of an entity, kept until the service call setting it has been handled"
+
+    header: dict
+    "The service call that will set the state"
+
+    overrides: dict
+    "The state and/or attributes that are assumed, in the format of a state dict"
+
+    server_state: stateDictType
+    "The last state reported by the server"
+
+    received: bool = False
+    "Whether the server reported a state since the optimistic state was set"
+
+def merge_state(state: stateDictType, overrides: dict) -> stateDictType:
+    "Returns a copy of the state with the state and attributes in overrides applied"
+    new_state = dict(state)
+    if "state" in overrides:
+        new_state["state"] = overrides["state"]
+    if "attributes" in overrides:
+        new_state["attributes"] = {**state.get("attributes", {}), **overrides["attributes"]}
+    return new_state
+
+class ServiceDebouncer:
+    """Collapses bursts of service calls into the last call of each burst.
+
+    Parameters
+    ----------
+    send : Callable[[dict, Any], Any]
+        Function that sends a service call. Called with the header and the context it was submitted with.
+    delay : float, optional
+        Time in seconds without new calls before the last one is sent, by default `SERVICE_DEBOUNCE_DELAY`
+    """
+
+    def __init__(self, send: Callable[[dict, Any], Any], delay: float = SERVICE_DEBOUNCE_DELAY):
+        self._send = send
+        self._delay = delay
+        self._pending: dict[str, tuple[dict, Any, asyncio.TimerHandle]] = {}
+        self._collapsed = 0
+
+    #region
+    @property
+    def delay(self) -> float:
+        "Time in seconds without new calls before the last one is sent"
+        return self._delay
+
+    @property
+    def pending(self) -> int:
+        "Amount of calls waiting to be sent"
+        return len(self._pending)
+
+    @property
+    def collapsed(self) -> int:
+        "Amount of calls that were replaced by a newer call before being sent"
+        return self._collapsed
+    #endregion
+
+    @staticmethod
+    def key(header: dict) -> str:
+        "Calls with the same key replace each other: the same action, on the same target"
+        return json.dumps([header.get("domain"), header.get("service"), header.get("target", None)], sort_keys=True, default=str)
+
+    def submit(self, header: dict, context: Any = None):
+        """Schedules a service call, replacing any call with the same key that has not been sent yet.
+        Must be called from the event loop.
+
+        Parameters
+        ----------
+        header : dict
+            The call_service message
+        context : Any, optional
+            Passed to the send function along with the header, by default None
+        """
+        key = self.key(header)
+        if key in self._pending:
+            self._pending[key][2].cancel()
+            self._collapsed += 1
+
+        handle = asyncio.get_running_loop().call_later(self._delay, self._fire, key)
+        self._pending[key] = (header, context, handle)
+
+    def flush(self):
+        "Sends all pending calls right away"
+        for key in list(self._pending):
+            self._pending[key][2].cancel()
+            self._fire(key)
+
+    def _fire(self, key: str):
+        if key not in self._pending:
+            return
+        (header, context, _) = self._pending.pop(key)
+        try:
+            self._send(header, context)
+        except Exception as exce:
+            _LOGGER.error(f"Unable to send service action {header.get('domain')}.{header.get('service')}: {exce}")
@@ -0,0 +1,134 @@
+"""
+Dispatches entity triggers to the functions and elements connected to the entity.
+Triggers of the same entity are handled in order, and if an entity triggers again before its previous trigger was handled, only the latest trigger is kept.
+Entities are put in one of two lanes: one for entities that are visible on screen, which are always handled first, and one for the rest.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from .helpers import triggerDictType, EntityType
+from .constants import DISPATCH_WORKERS
+
+_LOGGER = logging.getLogger(__name__)
+
+class TriggerDispatcher:
+    """Queues entity triggers and calls the handler for them, coalescing triggers of entities that are still waiting.
+
+    Parameters
+    ----------
+    handler : Callable[[triggerDictType], Awaitable]
+        Coroutine function that handles a trigger
+    priority_check : Callable[[EntityType], bool]
+        Function that returns whether triggers of an entity go into the priority lane, i.e. if the entity has elements on screen
+    workers : int, optional
+        The maximum amount of entities to handle at the same time, by default `DISPATCH_WORKERS`
+    """
+
+    def __init__(self, handler: Callable[[triggerDictType], Awaitable], priority_check: Callable[[EntityType], bool], workers: int = DISPATCH_WORKERS):
+        self._handler = handler
+        self._priorityCheck = priority_check
+        self._maxWorkers = workers
+
+        self._pending: dict[EntityType, triggerDictType] = {}
+        self._priorityLane: deque[EntityType] = deque()
+        self._backgroundLane: deque[EntityType] = deque()
+        self._running: set[EntityType] = set()
+
+        self._wakeup = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+        self._coalesced = 0
+        self._handled = 0
+
+    #region
+    @property
+    def pending(self) -> int:
+        "The amount of entities with a trigger waiting to be handled"
+        return len(self._pending)
+
+    @property
+    def coalesced(self) -> int:
+        "The amount of triggers that were merged into a trigger that was still waiting"
+        return self._coalesced
+
+    @property
+    def handled(self) -> int:
+        "The amount of triggers that have been handled"
+        return self._handled
+    #endregion
+
+    def put(self, trigger_dict: triggerDictType):
+        """Queues a trigger. If the entity already has a trigger waiting, it is replaced, keeping the `from_state` of the waiting trigger.
+
+        Parameters
+        ----------
+        trigger_dict : triggerDictType
+            The trigger to handle. The state dict of the client should already hold the new state.
+        """
+        entity_id = trigger_dict["entity_id"]
+        if entity_id in self._pending:
+            waiting = self._pending[entity_id]
+            self._pending[entity_id] = triggerDictType(entity_id=entity_id, to_state=trigger_dict["to_state"],
+                                                    from_state=waiting["from_state"], context=trigger_dict.get("context", None))
+            self._coalesced += 1
+            return
+
+        self._pending[entity_id] = trigger_dict
+        if entity_id not in self._running:
+            self._queue(entity_id)
+        self._start_workers()
+
+    def stop(self):
+        "Cancels the workers. Waiting triggers are discarded."
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._pending.clear()
+        self._priorityLane.clear()
+        self._backgroundLane.clear()
+
+    def _queue(self, entity_id: EntityType):
+        if self._priorityCheck(entity_id):
+            self._priorityLane.append(entity_id)
+        else:
+            self._backgroundLane.append(entity_id)
+        self._wakeup.set()
+
+    def _next_entity(self) -> Optional[EntityType]:
+        if self._priorityLane:
+            return self._priorityLane.popleft()
+        if self._backgroundLane:
+            return self._backgroundLane.popleft()
+        return None
+
+    def _start_workers(self):
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        if len(self._workers) >= self._maxWorkers:
+            return
+        loop = asyncio.get_running_loop()
+        for _ in range(self._maxWorkers - len(self._workers)):
+            self._workers.append(loop.create_task(self._worker()))
+
+    async def _worker(self):
+        while True:
+            entity_id = self._next_entity()
+            if entity_id == None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            trigger_dict = self._pending.pop(entity_id)
+            self._running.add(entity_id)
+            try:
+                await self._handler(trigger_dict)
+            except Exception as exce:
+                _LOGGER.error(f"Error handling trigger of {entity_id}: {exce}")
+            finally:
+                self._handled += 1
+                self._running.discard(entity_id)
+                if entity_id in self._pending:
+                    ##Triggered again while it was being handled
+                    self._queue(entity_id)
@@ -18,6 +18,7 @@ from .constants import ENTITY_TAG_KEY
 
 if TYPE_CHECKING:
     from inkBoard import core as CORE
+    from .httpsession import HTTPSession
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -55,7 +56,7 @@ _all_entities = {}
 _substitutions = {}
 _all_service_actions = {}
 
-async def request_image_threadsafe(image_url : str) -> tuple[Union[Image.Image, requests.Response],int]: #Union[tuple[Image.Image,Literal["status_code"]],tuple[requests.Response, Literal["status_code"]]]:    
+async def request_image_threadsafe(image_url : str, session: "HTTPSession" = None) -> tuple[Union[Image.Image, requests.Response],int]: #Union[tuple[Image.Image,Literal["status_code"]],tuple[requests.Response, Literal["status_code"]]]:    
     """
     Gets an image from a request.get response in a non-blocking manner.
     Method from: https://superfastpython.com/python-async-requests/
@@ -64,6 +65,8 @@ async def request_image_threadsafe(image_url : str) -> tuple[Union[Image.Image,
     ----------
     image_url : str
         url to get the image from
+    session : HTTPSession, optional
+        The pooled session to request the image with, e.g. the client's `httpSession`. If None, a new connection is made on a separate thread.
 
     Returns
     -------
@@ -71,6 +74,12 @@ async def request_image_threadsafe(image_url : str) -> tuple[Union[Image.Image,
         If the status code is 200 (i.e. the request was succesfull) a tuple is returned with the gotten Image and the status code. 
         Otherwise a tuple with the full response and the status code is returned.
     """
+    if session != None:
+        response = await session.async_fetch_image(image_url)
+        if response.status == 200 and response.image != None:
+            return (response.image, response.status)
+        return (response, response.status)
+
     try:
         response = await asyncio.to_thread(requests.get, image_url)
     except (requests.exceptions.InvalidURL):
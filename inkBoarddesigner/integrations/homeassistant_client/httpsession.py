@@ -0,0 +1,233 @@
+"""
+HTTP session the client uses to request images, like entity pictures.
+Uses aiohttp if it is installed. Otherwise requests is used, with a pooled session running on its own threads, so image requests do not occupy the default executor.
+Connections are kept alive and reused, and the amount of requests running at the same time is capped.
+Images are decoded on the request threads, at a reduced scale if they are a lot larger than the element they are shown in, and converted to the mode the screen builds images in.
+"""
+
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Mapping, NamedTuple, Optional
+
+import requests
+from PIL import Image
+
+from .constants import HTTP_MAX_CONNECTIONS, HTTP_TIMEOUT
+
+_LOGGER = logging.getLogger(__name__)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class ImageResponse(NamedTuple):
+    "The result of requesting an image"
+
+    status: int
+    "Status code of the response, or -1 if the request failed"
+
+    headers: Mapping[str, str]
+    "The response headers"
+
+    image: Optional[Image.Image] = None
+    "The decoded image, if the response held one"
+
+    content: bytes = b""
+    "The raw body"
+
+    digest: Optional[str] = None
+    "sha256 of the body"
+
+    @property
+    def status_code(self) -> int:
+        "Same as status, for compatibility with functions that used to return a requests response"
+        return self.status
+
+def reduce_image(img: Image.Image, size: tuple[int,int]) -> Image.Image:
+    "Reduces the image by the largest integer factor that keeps it at least as large as size, so it can still cover it."
+    (w, h) = img.size
+    factor = min(w // max(size[0], 1), h // max(size[1], 1))
+    if factor < 2:
+        return img
+    return img.reduce(factor)
+
+def decode_image(content: bytes, size: Optional[tuple[int,int]] = None, mode: Optional[str] = None) -> Image.Image:
+    """Decodes an image, at a reduced scale if it is a lot larger than size.
+
+    JPEG images are decoded at a reduced scale directly, using draft mode, which is a lot faster and uses a lot less memory than decoding the full image.
+    Other formats are reduced after decoding. Images are never made smaller than size.
+
+    Parameters
+    ----------
+    content : bytes
+        The encoded image
+    size : Optional[tuple[int,int]], optional
+        The size of the area the image is shown in, by default None, which decodes the full image
+    mode : Optional[str], optional
+        Mode to convert the image to, by default None
+
+    Returns
+    -------
+    Image.Image
+        The decoded image
+    """
+    img = Image.open(BytesIO(content))
+    if size != None and img.format == "JPEG":
+        ##Grayscale screens can have the image decoded as grayscale directly
+        draft_mode = "L" if mode in ("L", "LA") else None
+        img.draft(draft_mode, size)
+    img.load()
+
+    if size != None:
+        img = reduce_image(img, size)
+    if mode != None and img.mode != mode:
+        img = img.convert(mode)
+    return img
+
+def _make_response(status: int, headers: Mapping[str, str], content: bytes,
+                size: Optional[tuple[int,int]], mode: Optional[str]) -> ImageResponse:
+    try:
+        img = decode_image(content, size, mode)
+    except (OSError, ValueError) as exce:
+        _LOGGER.warning(f"Response does not hold a valid image: {exce}")
+        img = None
+    return ImageResponse(status, headers, img, content, hashlib.sha256(content).hexdigest())
+
+class HTTPSession:
+    """Pooled HTTP session for requests to the Home Assistant server and other image urls.
+
+    Parameters
+    ----------
+    base_url : str
+        The url of the Home Assistant server, including the protocol. Requests to this url are authenticated with the token.
+    token : Optional[str]
+        The access token to authenticate requests to the server with
+    max_connections : int, optional
+        Maximum amount of requests running at the same time, by default `HTTP_MAX_CONNECTIONS`
+    timeout : float, optional
+        Time in seconds before a request is cancelled, by default `HTTP_TIMEOUT`
+    """
+
+    def __init__(self, base_url: str, token: Optional[str], max_connections: int = HTTP_MAX_CONNECTIONS, timeout: float = HTTP_TIMEOUT):
+        self._baseUrl = base_url.rstrip("/")
+        self._authHeaders = {"Authorization": f"Bearer {token}"} if token else {}
+        self._maxConnections = max_connections
+        self._timeout = timeout
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._aiohttpSession: Optional["aiohttp.ClientSession"] = None
+        self._requestsSession: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    #region
+    @property
+    def backend(self) -> str:
+        "The library used to make requests"
+        return "aiohttp" if aiohttp != None else "requests"
+
+    @property
+    def baseUrl(self) -> str:
+        "The url of the Home Assistant server"
+        return self._baseUrl
+    #endregion
+
+    def make_url(self, path: str) -> str:
+        "Returns the full url for a path on the Home Assistant server. Full urls are returned as is."
+        if path.startswith(("http://", "https://")):
+            return path
+        return self._baseUrl + path
+
+    async def async_fetch_image(self, url: str, headers: Optional[Mapping[str, str]] = None,
+                            size: Optional[tuple[int,int]] = None, mode: Optional[str] = None) -> ImageResponse:
+        """Requests an image.
+
+        Parameters
+        ----------
+        url : str
+            The url of the image
+        headers : Optional[Mapping[str, str]], optional
+            Additional headers to send, e.g. for conditional requests, by default None
+        size : Optional[tuple[int,int]], optional
+            The size of the area the image is shown in, to decode it at a reduced scale, by default None. See `decode_image`.
+        mode : Optional[str], optional
+            Mode to convert the image to, by default None
+
+        Returns
+        -------
+        ImageResponse
+            The response. Holds the decoded image if the status is 200.
+        """
+        req_headers = dict(headers or {})
+        if url.startswith(self._baseUrl):
+            ##Only send the token to the Home Assistant server
+            req_headers.update(self._authHeaders)
+
+        if self._semaphore == None:
+            self._semaphore = asyncio.Semaphore(self._maxConnections)
+
+        async with self._semaphore:
+            try:
+                if aiohttp != None:
+                    return await self._async_fetch_aiohttp(url, req_headers, size, mode)
+                else:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self._get_executor(), self._fetch_requests, url, req_headers, size, mode)
+            except asyncio.TimeoutError:
+                _LOGGER.error(f"Request for {url} timed out")
+            except requests.exceptions.InvalidURL:
+                _LOGGER.error(f"Cannot request image from {url}, invalid url")
+            except requests.exceptions.RequestException as exce:
+                _LOGGER.error(f"Unable to request image from {url}: {exce}")
+            except Exception as exce:
+                if aiohttp != None and isinstance(exce, aiohttp.ClientError):
+                    _LOGGER.error(f"Unable to request image from {url}: {exce}")
+                else:
+                    raise
+        return ImageResponse(-1, {})
+
+    async def async_close(self):
+        "Closes the connections and stops the request threads"
+        if self._aiohttpSession != None:
+            await self._aiohttpSession.close()
+            self._aiohttpSession = None
+        if self._requestsSession != None:
+            self._requestsSession.close()
+            self._requestsSession = None
+        if self._executor != None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _async_fetch_aiohttp(self, url: str, headers: dict, size: Optional[tuple[int,int]], mode: Optional[str]) -> ImageResponse:
+        if self._aiohttpSession == None or self._aiohttpSession.closed:
+            connector = aiohttp.TCPConnector(limit=self._maxConnections)
+            self._aiohttpSession = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self._timeout))
+
+        async with self._aiohttpSession.get(url, headers=headers) as response:
+            if response.status != 200:
+                return ImageResponse(response.status, dict(response.headers))
+            content = await response.read()
+            resp_headers = dict(response.headers)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), _make_response, 200, resp_headers, content, size, mode)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor == None:
+            self._executor = ThreadPoolExecutor(self._maxConnections, thread_name_prefix="homeassistant-http")
+        return self._executor
+
+    def _fetch_requests(self, url: str, headers: dict, size: Optional[tuple[int,int]], mode: Optional[str]) -> ImageResponse:
+        if self._requestsSession == None:
+            self._requestsSession = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=self._maxConnections)
+            self._requestsSession.mount("http://", adapter)
+            self._requestsSession.mount("https://", adapter)
+
+        response = self._requestsSession.get(url, headers=headers, timeout=self._timeout)
+        if response.status_code != 200:
+            return ImageResponse(response.status_code, dict(response.headers))
+        return _make_response(response.status_code, dict(response.headers), response.content, size, mode)
@@ -0,0 +1,283 @@
+"""
+Caches images requested from Home Assistant, like entity pictures and album art.
+Images are stored by the hash of their content, so the same picture is only decoded and stored once, even if it is requested via different urls (entity picture urls include an access token that changes periodically).
+Images are decoded at the size they are shown at (see `httpsession.decode_image`). Decoded images are kept in memory, and the raw files are kept on disk, both up to a maximum size, removing the least recently used images first.
+Urls that have been requested before are requested conditionally, using the ETag and Last-Modified headers of the previous response.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+from PIL import Image
+
+from .constants import IMAGE_CACHE_MEMORY_SIZE, IMAGE_CACHE_DISK_SIZE
+from .httpsession import HTTPSession, ImageResponse, decode_image, reduce_image
+
+_LOGGER = logging.getLogger(__name__)
+
+INDEX_FILE = "index.json"
+"File in the cache folder holding the cached urls"
+
+MemoryKey = tuple[str, Optional[tuple[int,int]], Optional[str]]
+"Key of a decoded image in memory: the digest of the image, the size it was decoded for and its mode"
+
+class CacheEntry(NamedTuple):
+    "A cached url"
+
+    digest: str
+    "sha256 of the image content"
+
+    etag: Optional[str]
+    "ETag header of the response"
+
+    last_modified: Optional[str]
+    "Last-Modified header of the response"
+
+class ImageCache:
+    """Shared cache for images requested from urls.
+
+    Parameters
+    ----------
+    session : HTTPSession
+        The session to request images with
+    folder : Optional[Path]
+        Folder to store the image files in. If None, images are only cached in memory.
+    memory_size : int, optional
+        Maximum amount of decoded images to keep in memory, by default `IMAGE_CACHE_MEMORY_SIZE`. Versions of an image at different sizes count as separate images.
+    disk_size : int, optional
+        Maximum size of the image files on disk, in megabytes, by default `IMAGE_CACHE_DISK_SIZE`
+    """
+
+    def __init__(self, session: HTTPSession, folder: Optional[Path], memory_size: int = IMAGE_CACHE_MEMORY_SIZE, disk_size: float = IMAGE_CACHE_DISK_SIZE):
+        self._folder = Path(folder) if folder != None else None
+        self._memorySize = max(memory_size, 1)
+        self._diskSize = int(disk_size*1024*1024)
+
+        self._session = session
+        self._memory: OrderedDict[MemoryKey, Image.Image] = OrderedDict()
+        self._index: dict[str, CacheEntry] = {}
+        self._files: dict[str, int] = {}
+        "Size of the image files on disk, per digest"
+        self._fileLock = threading.Lock()
+
+        self._pending: dict[tuple[str, Optional[tuple[int,int]], Optional[str]], asyncio.Task] = {}
+
+        self._hits = 0
+        self._misses = 0
+
+        if self._folder != None:
+            self._load_index()
+
+    #region
+    @property
+    def folder(self) -> Optional[Path]:
+        "Folder the image files are stored in"
+        return self._folder
+
+    @property
+    def hits(self) -> int:
+        "Amount of requests for which a cached image was used"
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        "Amount of requests that downloaded and decoded an image that was not cached"
+        return self._misses
+
+    @property
+    def diskUsage(self) -> int:
+        "Size, in bytes, of the image files on disk"
+        with self._fileLock:
+            return sum(self._files.values())
+    #endregion
+
+    async def async_get(self, url: str, size: Optional[tuple[int,int]] = None, mode: Optional[str] = None) -> tuple[Union[Image.Image, ImageResponse, None], int]:
+        """Gets an image, from the cache if it has not changed on the server.
+
+        Requests for the same url, size and mode made while it is still being requested wait for that request instead.
+
+        Parameters
+        ----------
+        url : str
+            The url of the image
+        size : Optional[tuple[int,int]], optional
+            Size of the area the image is shown in, by default None. Images that are a lot larger are decoded at a reduced scale, but never smaller than size.
+        mode : Optional[str], optional
+            Mode to convert the image to, by default None, which keeps the mode of the image
+
+        Returns
+        -------
+        tuple[Image.Image | ImageResponse | None, int]
+            The image and status code 200 if successful. Otherwise the response and its status code, or None and -1 if the request failed.
+            Images are copies, so they can be altered without altering the cached image.
+        """
+        if size != None:
+            size = tuple(size)
+        key = (url, size, mode)
+        if key not in self._pending:
+            ##The fetch runs in its own task, so cancelling one requester does not leave the others waiting forever
+            task = asyncio.get_running_loop().create_task(self._async_fetch(url, size, mode))
+            self._pending[key] = task
+            task.add_done_callback(lambda t: self._fetch_done(key, t))
+        (img, status) = await asyncio.shield(self._pending[key])
+
+        if status == 200:
+            return (img.copy(), status)
+        return (img, status)
+
+    def clear(self):
+        "Clears the memory cache. Files on disk are kept."
+        self._memory.clear()
+
+    def _fetch_done(self, key: tuple, task: asyncio.Task):
+        if self._pending.get(key, None) is task:
+            self._pending.pop(key)
+        if not task.cancelled():
+            ##Retrieve the exception, so it is not logged again if every requester was cancelled
+            task.exception()
+
+    async def _async_fetch(self, url: str, size: Optional[tuple[int,int]], mode: Optional[str]) -> tuple[Union[Image.Image, ImageResponse, None], int]:
+        entry = self._index.get(url, None)
+        headers = {}
+        if entry != None and self._has_image(entry.digest):
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        response = await self._session.async_fetch_image(url, headers, size, mode)
+        if response.status == -1:
+            return (None, -1)
+
+        if response.status == 304 and entry != None:
+            img = await self._async_get_image(entry.digest, size, mode)
+            if img != None:
+                self._hits += 1
+                return (img, 200)
+            ##Image was removed from the cache in the meantime
+            self._index.pop(url, None)
+            return await self._async_fetch(url, size, mode)
+
+        if response.status != 200:
+            _LOGGER.warning(f"Unable to get requested image, status {response.status}")
+            return (response, response.status)
+        if response.image == None:
+            return (response, -1)
+
+        digest = response.digest
+        self._index[url] = CacheEntry(digest, response.headers.get("ETag", None), response.headers.get("Last-Modified", None))
+
+        key = (digest, size, mode)
+        if key in self._memory:
+            ##Same picture as another url, or the server does not support conditional requests
+            self._hits += 1
+            self._memory.move_to_end(key)
+            img = self._memory[key]
+        else:
+            self._misses += 1
+            img = response.image
+            self._remember(key, img)
+
+        if self._folder != None:
+            await asyncio.to_thread(self._store, digest, response.content, dict(self._index))
+        return (img, 200)
+
+    def _has_image(self, digest: str) -> bool:
+        return digest in self._files or any(key[0] == digest for key in self._memory)
+
+    async def _async_get_image(self, digest: str, size: Optional[tuple[int,int]], mode: Optional[str]) -> Optional[Image.Image]:
+        key = (digest, size, mode)
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        if digest in self._files:
+            try:
+                img = await asyncio.to_thread(self._read, digest, size, mode)
+            except OSError as exce:
+                _LOGGER.warning(f"Unable to read cached image {digest}: {exce}")
+                with self._fileLock:
+                    self._files.pop(digest, None)
+                return None
+        elif (digest, None, mode) in self._memory and size != None:
+            ##Only cached in memory, at full size
+            img = await asyncio.to_thread(reduce_image, self._memory[(digest, None, mode)], size)
+        else:
+            return None
+
+        self._remember(key, img)
+        return img
+
+    def _remember(self, key: MemoryKey, img: Image.Image):
+        self._memory[key] = img
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._memorySize:
+            self._memory.popitem(last=False)
+
+    def _load_index(self):
+        try:
+            self._folder.mkdir(parents=True, exist_ok=True)
+            for file in self._folder.iterdir():
+                if file.name != INDEX_FILE and file.is_file():
+                    self._files[file.name] = file.stat().st_size
+        except OSError as exce:
+            _LOGGER.warning(f"Unable to use image cache folder {self._folder}, caching images in memory only: {exce}")
+            self._folder = None
+            return
+
+        index_file = self._folder / INDEX_FILE
+        if not index_file.exists():
+            return
+        try:
+            with open(index_file) as f:
+                index = json.load(f)
+            self._index = {url: CacheEntry(*entry) for url, entry in index.items() if entry[0] in self._files}
+        except (OSError, ValueError, TypeError) as exce:
+            _LOGGER.warning(f"Unable to read image cache index: {exce}")
+
+    def _read(self, digest: str, size: Optional[tuple[int,int]], mode: Optional[str]) -> Image.Image:
+        file = self._folder / digest
+        with open(file, "rb") as f:
+            content = f.read()
+        ##Update the modification time to keep track of recently used files
+        os.utime(file)
+        return decode_image(content, size, mode)
+
+    def _store(self, digest: str, content: bytes, index: dict[str, CacheEntry]):
+        try:
+            with self._fileLock:
+                if digest not in self._files:
+                    with open(self._folder / digest, "wb") as f:
+                        f.write(content)
+                    self._files[digest] = len(content)
+                    self._evict_files()
+                else:
+                    os.utime(self._folder / digest)
+
+                ##Urls of removed files are removed from the index when reading it
+                with open(self._folder / INDEX_FILE, "w") as f:
+                    json.dump(index, f)
+        except OSError as exce:
+            _LOGGER.warning(f"Unable to write image to the cache: {exce}")
+
+    def _evict_files(self):
+        ##Called with the file lock held
+        if sum(self._files.values()) <= self._diskSize:
+            return
+
+        files = sorted(self._files, key=lambda digest: (self._folder / digest).stat().st_mtime)
+        total = sum(self._files.values())
+        for digest in files:
+            if total <= self._diskSize:
+                break
+            try:
+                (self._folder / digest).unlink()
+            except OSError:
+                continue
+            total -= self._files.pop(digest)
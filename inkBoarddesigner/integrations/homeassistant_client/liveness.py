@@ -0,0 +1,87 @@
+"""
+Estimates the round trip time of the connection to Home Assistant, to decide how long to wait on a pong before considering it missed.
+Uses the same estimator as TCP's retransmission timer (RFC 6298): a smoothed round trip time and its variation, with the timeout doubling after each missed pong.
+"""
+
+from typing import Optional
+
+from .constants import PONG_TIMEOUT_INITIAL, PONG_TIMEOUT_MIN, PONG_TIMEOUT_MAX
+
+ALPHA = 1/8
+"Weight of a new sample in the smoothed round trip time"
+
+BETA = 1/4
+"Weight of a new sample in the round trip time variation"
+
+class RTTEstimator:
+    """Keeps a smoothed round trip time from ping samples, and the time to wait on the next pong.
+
+    Parameters
+    ----------
+    initial : float, optional
+        Time in seconds to wait on a pong before any round trip time was measured, by default `PONG_TIMEOUT_INITIAL`
+    minimum : float, optional
+        Minimum time in seconds to wait on a pong, by default `PONG_TIMEOUT_MIN`
+    maximum : float, optional
+        Maximum time in seconds to wait on a pong, by default `PONG_TIMEOUT_MAX`
+    """
+
+    def __init__(self, initial: float = PONG_TIMEOUT_INITIAL, minimum: float = PONG_TIMEOUT_MIN, maximum: float = PONG_TIMEOUT_MAX):
+        self._min = minimum
+        self._max = maximum
+        self._timeout = min(max(initial, minimum), maximum)
+
+        self._rtt: Optional[float] = None
+        self._srtt: Optional[float] = None
+        self._rttvar: Optional[float] = None
+        self._samples = 0
+        self._missed = 0
+
+    #region
+    @property
+    def rtt(self) -> Optional[float]:
+        "The last measured round trip time, in seconds"
+        return self._rtt
+
+    @property
+    def srtt(self) -> Optional[float]:
+        "The smoothed round trip time, in seconds"
+        return self._srtt
+
+    @property
+    def rttvar(self) -> Optional[float]:
+        "The variation of the round trip time, in seconds"
+        return self._rttvar
+
+    @property
+    def timeout(self) -> float:
+        "Time in seconds to wait on the next pong"
+        return self._timeout
+
+    @property
+    def stats(self) -> dict:
+        "The round trip times in milliseconds, the pong timeout in seconds, and the amount of pongs received and missed"
+        return {"rtt": _ms(self._rtt), "srtt": _ms(self._srtt), "rttvar": _ms(self._rttvar),
+                "timeout": self._timeout, "pongs": self._samples, "missed": self._missed}
+    #endregion
+
+    def update(self, sample: float):
+        "Adds a measured round trip time, in seconds"
+        if self._srtt == None:
+            self._srtt = sample
+            self._rttvar = sample/2
+        else:
+            self._rttvar = (1 - BETA)*self._rttvar + BETA*abs(self._srtt - sample)
+            self._srtt = (1 - ALPHA)*self._srtt + ALPHA*sample
+
+        self._rtt = sample
+        self._samples += 1
+        self._timeout = min(max(self._srtt + 4*self._rttvar, self._min), self._max)
+
+    def backoff(self):
+        "Registers a missed pong, doubling the time to wait on the next one"
+        self._missed += 1
+        self._timeout = min(self._timeout*2, self._max)
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value*1000, 1) if value != None else None
@@ -0,0 +1,57 @@
+"""
+Message ids and the outbound message queue of the client.
+Home Assistant requires the id of each message to be higher than that of the previous one, so ids are handed out by a single allocator, when a message is actually sent.
+Messages put in the queue are sent in batches: everything queued by the time the commander runs is written in one go, with a single timeout for the batch.
+"""
+
+import asyncio
+from typing import Callable, NamedTuple, Optional
+
+class IdAllocator:
+    "Hands out message ids for a websocket connection. Ids only increase."
+
+    def __init__(self, last: int = 0):
+        self._last = last
+
+    #region
+    @property
+    def last(self) -> int:
+        "The last id that was handed out"
+        return self._last
+    #endregion
+
+    def next(self) -> int:
+        "Returns a new id"
+        self._last += 1
+        return self._last
+
+    def take(self, count: int) -> range:
+        "Returns a range of new ids, e.g. for messages that are sent directly, in order"
+        start = self._last + 1
+        self._last += count
+        return range(start, self._last + 1)
+
+    def observe(self, message_id: int) -> bool:
+        """Registers an id that was assigned elsewhere.
+
+        Returns
+        -------
+        bool
+            True if the id can still be used, i.e. is higher than the last id handed out. False if the message needs a new id.
+        """
+        if message_id <= self._last:
+            return False
+        self._last = message_id
+        return True
+
+class OutboundMessage(NamedTuple):
+    "A message in the outbound queue"
+
+    message: dict
+    "The message. Its id is set when it is sent."
+
+    response: Optional[asyncio.Future] = None
+    "Future to pass the response of the server to, if it is needed"
+
+    on_send: Optional[Callable[[int], None]] = None
+    "Function called with the id of the message right before it is sent, for callers that need to know the id before the response comes in"
@@ -0,0 +1,182 @@
+"""
+Routes responses from the Home Assistant server to the requests waiting on them.
+Each request that expects a response gets a future, keyed by its message id, which the listener resolves when the response comes in.
+Futures that time out or are cancelled are removed, pending futures fail when the connection is lost, and the table is capped so orphaned entries cannot pile up.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional, Union
+
+from .constants import RESPONSE_TIMEOUT, MAX_PENDING_RESPONSES
+
+_LOGGER = logging.getLogger(__name__)
+
+class ResponseLostError(ConnectionError):
+    "The response to a message will not arrive, because the connection was lost or the entry was evicted"
+
+class SendFailedError(ResponseLostError):
+    "The response to a message will not arrive, because the message could not be sent"
+
+def error_result(message_id: Optional[int], code: str, message: str) -> dict:
+    "Returns a result message in the format of the server, for a request that did not get a response"
+    return {"id": message_id, "type": "result", "success": False, "error": {"code": code, "message": message}}
+
+class ResponseRouter:
+    """Keeps a future per message id for which a response is expected.
+
+    Parameters
+    ----------
+    max_pending : int, optional
+        Maximum amount of futures to keep, by default `MAX_PENDING_RESPONSES`. When exceeded, the oldest ones fail.
+    timeout : float, optional
+        Default time in seconds to wait for a response, by default `RESPONSE_TIMEOUT`
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING_RESPONSES, timeout: float = RESPONSE_TIMEOUT):
+        self._maxPending = max_pending
+        self._timeout = timeout
+        self._pending: OrderedDict[int, asyncio.Future] = OrderedDict()
+
+        self._resolved = 0
+        self._timedOut = 0
+        self._evicted = 0
+        self._lost = 0
+
+    #region
+    @property
+    def pending(self) -> int:
+        "Amount of messages waiting on a response"
+        return len(self._pending)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        "Counts of responses that were resolved, timed out, evicted from the table, and lost to connection loss"
+        return {"pending": self.pending, "resolved": self._resolved, "timed_out": self._timedOut,
+                "evicted": self._evicted, "lost": self._lost}
+    #endregion
+
+    def expect(self, message_id: int) -> asyncio.Future:
+        """Registers that the response to the message is needed.
+
+        Parameters
+        ----------
+        message_id : int
+            The id of the message
+
+        Returns
+        -------
+        asyncio.Future
+            Future that is set to the response. If a future for the id already exists, that one is returned.
+        """
+        if message_id in self._pending:
+            _LOGGER.warning(f"A message with id {message_id} is already waiting on a response. Returning that one")
+            return self._pending[message_id]
+
+        fut = asyncio.get_running_loop().create_future()
+        self.attach(message_id, fut)
+        return fut
+
+    def attach(self, message_id: int, fut: asyncio.Future):
+        "Registers a future for the response to a message, for futures that were made before the message got its id"
+        if fut.done():
+            ##Stopped waiting before the message was sent
+            return
+        fut.add_done_callback(lambda f: self._discard(message_id, f))
+        self._pending[message_id] = fut
+
+        while len(self._pending) > self._maxPending:
+            (old_id, old_fut) = self._pending.popitem(last=False)
+            _LOGGER.warning(f"Too many messages waiting on a response, dropping the oldest one (id {old_id})")
+            self._evicted += 1
+            self._fail(old_fut, ResponseLostError(f"Waiting on message {old_id} was dropped"))
+
+    def resolve(self, message: dict) -> bool:
+        "Passes a message to the future waiting on its id. Returns whether one was waiting."
+        fut = self._pending.pop(message.get("id", None), None)
+        if fut == None or fut.done():
+            return False
+        fut.set_result(message)
+        self._resolved += 1
+        return True
+
+    def cancel(self, message_id: int) -> bool:
+        "Stops waiting on the response to a message. Returns whether it was waited on."
+        fut = self._pending.pop(message_id, None)
+        if fut == None:
+            return False
+        fut.cancel()
+        return True
+
+    def rekey(self, old_id: int, new_id: int):
+        "Moves the future of a message to a new id, for messages of which the id was changed before sending"
+        if old_id not in self._pending:
+            return
+        fut = self._pending.pop(old_id)
+        self._pending[new_id] = fut
+        ##The callback for the old id does nothing anymore, since the old id is not mapped to the future
+        fut.add_done_callback(lambda f: self._discard(new_id, f))
+
+    def fail_all(self, reason: str = "Connection lost"):
+        "Fails all pending futures, e.g. when the connection is lost, so nothing waits on responses that will not arrive"
+        pending = list(self._pending.values())
+        self._pending.clear()
+        for fut in pending:
+            self._lost += 1
+            self._fail(fut, ResponseLostError(reason))
+
+    async def async_wait(self, response: Union[int, asyncio.Future], timeout: Optional[float] = None) -> dict:
+        """Waits on the response to a message.
+
+        Parameters
+        ----------
+        response : Union[int, asyncio.Future]
+            The future for the response, or the id of the message, in which case the future registered for the id is used (registering one if needed)
+        timeout : Optional[float], optional
+            Time in seconds to wait, by default None, which uses the router's timeout
+
+        Returns
+        -------
+        dict
+            The response. If it did not arrive in time, or will not arrive, an unsuccessful result with error code `timeout`, `send_failed` or `connection_lost`.
+        """
+        if isinstance(response, int):
+            message_id = response
+            fut = self.expect(message_id)
+        else:
+            message_id = None
+            fut = response
+        if timeout == None:
+            timeout = self._timeout
+        try:
+            return await asyncio.wait_for(fut, timeout) #@IgnoreException
+        except asyncio.TimeoutError:
+            self._timedOut += 1
+            return error_result(message_id, "timeout", f"No response within {timeout} seconds")
+        except SendFailedError as exce:
+            return error_result(message_id, "send_failed", str(exce))
+        except ResponseLostError as exce:
+            return error_result(message_id, "connection_lost", str(exce))
+
+    def fail(self, fut: asyncio.Future, reason: str):
+        "Fails a future that is not registered (yet), e.g. for a message that was never sent"
+        self._lost += 1
+        self._fail(fut, ResponseLostError(reason))
+
+    def fail_send(self, fut: asyncio.Future, reason: str):
+        "Fails the future of a message that could not be sent. Removes it if it was registered already."
+        self._lost += 1
+        self._fail(fut, SendFailedError(reason))
+
+    def _discard(self, message_id: int, fut: asyncio.Future):
+        if self._pending.get(message_id, None) is fut:
+            self._pending.pop(message_id)
+
+    @staticmethod
+    def _fail(fut: asyncio.Future, exce: Exception):
+        if fut.done():
+            return
+        fut.set_exception(exce)
+        ##Retrieve the exception, so futures nobody waits on anymore do not log it
+        fut.exception()
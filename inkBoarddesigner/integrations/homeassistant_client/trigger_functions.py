@@ -15,7 +15,8 @@ import mdi_pil as mdi
 # from inkBoard import core as CORE
 
 from .constants import DEFAULT_DOMAIN_ACTIONS, UNKNOWN_ICON, UNAVAILABLE_ICON, UNAVAILABLE_COLOR, UNKNOWN_COLOR
-from .helpers import triggerDictType, request_image_threadsafe
+from .helpers import triggerDictType
+from .conditions import Condition, compile_condition, evaluate
 
 if TYPE_CHECKING:    
     from .HAelements import HAelement
@@ -32,30 +33,33 @@ attribute_stylesType = TypedDict('attribute_stylesDict', {'attribute': str, 'sta
 
 state_color_dict: dict = {} 
 
-def get_condition_key(state : str, conditions : list[str]):
+def get_condition_key(state : str, conditions : Union[list[str], tuple["Condition", ...]]):
     """
     Tests if any of the conditional strings in conditions return true. 
     Conditions can be defined as e.g. 'state < 5', the first one to evaluate as true is returned, otherwise None.
     state is the element state, i.e. if an attribute is set, it will set state to that attribute.
+    conditions can also be already compiled conditions, in which case they are not parsed again.
     """
     if isinstance(state,str):
-        str_state = state
-        try:
-            ##First check if state can be converted into a different type
-            state = literal_eval(str_state) #@IgnoreException
-        except (SyntaxError, ValueError):
-            ##state cannot be evaluated as something else than a string
-            pass
+        state = _parse_state(state)
+
     for cond in conditions:
-        if "state" not in cond: continue
-        try:
-            if eval(cond): return cond #@IgnoreException
-        except (SyntaxError, NameError, TypeError, ZeroDivisionError):
-            continue
+        if not isinstance(cond, Condition):
+            cond = compile_condition(cond)
+            if cond == None: continue
+        if evaluate(cond, state): return cond.condition
     
     ##Return default if no matches were found
     return "default" if "default" in conditions else None
 
+def _parse_state(str_state: str) -> Any:
+    try:
+        ##First check if state can be converted into a different type
+        return literal_eval(str_state) #@IgnoreException
+    except (SyntaxError, ValueError):
+        ##state cannot be evaluated as something else than a string
+        return str_state
+
 def get_new_state(element : "HAelement", trigger_dict : "triggerDictType", skip_conditions : bool=False):
     """
     Returns the current state of the entity associated with this element.
@@ -82,8 +86,9 @@ def get_new_state(element : "HAelement", trigger_dict : "triggerDictType", skip_
         new_state = trigger_dict["to_state"]["state"]
     
     if element.state_conditionals and not skip_conditions: # and not new_state in element.state_styles:
-        conditions = element.state_styles.keys()
-        key = get_condition_key(new_state,conditions)
+        key = get_condition_key(new_state, element.state_conditions)
+        if key == None and "default" in element.state_styles:
+            key = "default"
         new_state = key if key != None else new_state
 
     return new_state
@@ -138,25 +143,16 @@ def get_attribute_styles(element : "HAelement", trigger_dict : "triggerDictType"
             state = 'None'
 
         if attr == "state":
-            str_state = state
-            try:
-                ##First check if state can be converted into a different type
-                state = literal_eval(str_state) #@IgnoreException
-            except (SyntaxError, ValueError):
-                ##state cannot be evaluated as something else than a string
-                pass
+            state = _parse_state(state)
 
         for conf_state in attr_conf["states"]:
             if state == conf_state["state"]:
                 prop_dict.update(conf_state.get("properties", {}))
                 continue
 
-            str_state = conf_state["state"]
-            try:
-                if eval(str_state): #@IgnoreException
-                    prop_dict.update(conf_state.get("properties", {}))
-            except (SyntaxError, NameError, TypeError, ZeroDivisionError):
-                pass
+            cond = compile_condition(conf_state["state"])
+            if cond != None and evaluate(cond, state):
+                prop_dict.update(conf_state.get("properties", {}))
 
         if not prop_dict and "else" in attr_conf:
             upd_dict.update(attr_conf["else"])
@@ -165,10 +161,11 @@ def get_attribute_styles(element : "HAelement", trigger_dict : "triggerDictType"
     
     return upd_dict
 
-async def get_entity_picture(entity_picture : str, client : "HAclient") -> tuple[Union["Image.Image", "requests.Response"],int]:
+async def get_entity_picture(entity_picture : str, client : "HAclient", size: Optional[tuple[int,int]] = None) -> tuple[Union["Image.Image", "requests.Response"],int]:
     """
     Gets the entity_picture from an entity's entity_picture attribute.
-    Appends the client's url if needed.   
+    Appends the client's url if needed.
+    Pictures are gotten via the client's image cache and http session, so pictures used by multiple elements are only downloaded and decoded once.
 
     Parameters
     ----------
@@ -176,9 +173,9 @@ async def get_entity_picture(entity_picture : str, client : "HAclient") -> tuple
         The entity_picture attribute, as gotten from a trigger_dict
     client : HAclient
         The Home Assistant client to get the picture from
+    size : Optional[tuple[int,int]], optional
+        The size of the element showing the picture, by default None. Large pictures are decoded at a reduced scale that still covers this size, and converted to the screen's image mode.
 
-    Returns
-    -------
     Returns
     -------
     tuple[Image.Image | requests.response, status_code] | 
@@ -186,18 +183,15 @@ async def get_entity_picture(entity_picture : str, client : "HAclient") -> tuple
         Otherwise a tuple with the full response and the status code is returned.
     """
 
-    if "http" not in entity_picture:
-        hass_url = client.hass_data["url"]
-        ##I assume this should take care of getting a correct url?
-        ##The SSL protocol should be present anyways if using an external url
-        if not "http" in hass_url:
-            hass_url = "http://" + hass_url
-
-        url = hass_url + entity_picture
-    else:
-        url = entity_picture
+    url = client.httpSession.make_url(entity_picture)
+    return await client.imageCache.async_get(url, size, client.pssmScreen.imgMode)
 
-    return await request_image_threadsafe(url)
+def _element_size(element: "elts.Element") -> Optional[tuple[int,int]]:
+    "Returns the size of the element, or None if it has not been given an area yet"
+    if getattr(element, "area", None) == None:
+        return None
+    [_, size] = element.area
+    return tuple(size)
 
 async def button_trigger(element: Union["elts.Button", "HAelement"],trigger_dict : "triggerDictType"):
     """
@@ -295,7 +289,7 @@ async def icon_trigger(element: Union["elts.Icon", "HAelement"],trigger_dict : "
             elif element.iconData[0] != trigger_dict["to_state"]["attributes"]["entity_picture"] or element.iconData[1] != 200:
 
                 picture_link =  trigger_dict["to_state"]["attributes"]["entity_picture"]
-                (resp, status) = await get_entity_picture(picture_link, client=element.HAclient)
+                (resp, status) = await get_entity_picture(picture_link, client=element.HAclient, size=_element_size(element))
 
                 if status == 200:
                     newAttributes.update({'icon': resp})
@@ -377,7 +371,7 @@ async def picture_trigger(element: Union["elts.Picture", "HAelement"],trigger_di
             element.pictureData[1] != 200):
 
             picture_link =  trigger_dict["to_state"]["attributes"][pic_attr]
-            (resp, status) = await get_entity_picture(picture_link, client=element.HAclient)
+            (resp, status) = await get_entity_picture(picture_link, client=element.HAclient, size=_element_size(element))
 
             if status == 200:
                 newAttributes.update({'picture': resp})
@@ -614,7 +608,7 @@ def min_max_setter(element : Union["HAelement",elts.Slider, elts.BoxSlider, elts
             # element.on_count = element.HAclient.call_service_action
             v = defaultDomains[domain]["action"]
             d = {"action": "service-action", 
-                "data": {"action": defaultDomains[domain]["action"]}, "map": defaultDomains[domain]["action_data_map"]}
+                "data": {"action": defaultDomains[domain]["action"], "debounce": True}, "map": defaultDomains[domain]["action_data_map"]}
             element.on_count = d
             ##So set on_count_map and on_count_data
             ##service_action_data should be made from the kwargs
@@ -622,7 +616,7 @@ def min_max_setter(element : Union["HAelement",elts.Slider, elts.BoxSlider, elts
         if element._tap_action == None:
             # element.tap_action = element.HAclient.call_service_action
             d = {"action": "service-action", 
-                "data": {"action": defaultDomains[domain]["action"]}, "map": defaultDomains[domain]["action_data_map"]}
+                "data": {"action": defaultDomains[domain]["action"], "debounce": True}, "map": defaultDomains[domain]["action_data_map"]}
             element.tap_action = d
 
     for attr in toset.__required_keys__:
@@ -0,0 +1,141 @@
+"""
+Tracks the files of the integrations imported by a loaded config, so a reload only re-imports the integrations that changed.
+The config yaml files and the custom folder are not tracked, since inkBoard parses the config and reloads the custom modules on every reload anyway.
+Does not import tkinter.
+"""
+
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+from . import _LOGGER
+
+MODULE_SUFFIXES = (".py",)
+"File suffixes tracked in integration packages"
+
+FileStamp = tuple[int, int, str]
+"The (mtime_ns, size, sha1) of a tracked file"
+
+@dataclass
+class ReloadChanges:
+    "The tracked files that changed since the config was loaded, grouped by the integration they belong to"
+
+    integrations: dict[str, list[Path]] = field(default_factory=dict)
+    "Changed files of imported integrations, per integration"
+
+    def __bool__(self):
+        return bool(self.integrations)
+
+    def summary(self) -> str:
+        "Returns a short description of the changes, for logging"
+        if not self:
+            return "no integrations changed"
+        return f"integration(s) {', '.join(sorted(self.integrations))} changed"
+
+def _hash_file(file: Path) -> str:
+    with open(file, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+class ReloadTracker:
+    """Keeps a snapshot of the integration packages imported by the loaded config.
+
+    Files are compared by modification time and size first, and only hashed when those differ, so touching a file without changing it does not count as a change.
+    """
+
+    def __init__(self):
+        self._configFile: Optional[Path] = None
+        self._integrations: dict[str, dict[Path, FileStamp]] = {}
+        self._integrationFolders: dict[str, Path] = {}
+
+    #region
+    @property
+    def configFile(self) -> Optional[Path]:
+        "The config file currently being tracked"
+        return self._configFile
+    #endregion
+
+    def track(self, config_file: Union[str, Path], integrations: dict[str, Path]):
+        """Takes a new snapshot of the files belonging to the config.
+
+        Parameters
+        ----------
+        config_file : Union[str, Path]
+            The YAML file with the configuration
+        integrations : dict[str, Path]
+            The imported integrations, and the folder they are in
+        """
+        self._configFile = Path(config_file).absolute()
+        self._integrationFolders = {name: Path(folder) for name, folder in integrations.items()}
+
+        self._integrations = {name: self._stamp_files(self._module_files(folder), self._integrations.get(name, {}))
+                            for name, folder in self._integrationFolders.items()}
+        _LOGGER.debug(f"Tracking {len(self._integrations)} integrations for reloading")
+
+    def get_changes(self, config_file: Union[str, Path]) -> Optional[ReloadChanges]:
+        """Compares the tracked files to the snapshot.
+
+        Parameters
+        ----------
+        config_file : Union[str, Path]
+            The config file being reloaded
+
+        Returns
+        -------
+        Optional[ReloadChanges]
+            The changed files, or None if the config file is not the one being tracked, in which case the changes are unknown.
+        """
+        config_file = Path(config_file).absolute()
+        if config_file != self._configFile:
+            return None
+
+        changes = ReloadChanges()
+        for name, folder in self._integrationFolders.items():
+            changed = self._compare(self._integrations.get(name, {}), self._module_files(folder))
+            if changed:
+                changes.integrations[name] = changed
+        return changes
+
+    def clear(self):
+        "Removes the snapshot"
+        self.__init__()
+
+    @staticmethod
+    def _module_files(folder: Path) -> list[Path]:
+        if not folder.is_dir():
+            return []
+        return [f for f in folder.rglob("*") if f.suffix in MODULE_SUFFIXES or f.name == "manifest.json"]
+
+    @staticmethod
+    def _stamp_files(files: list[Path], previous: dict[Path, FileStamp]) -> dict[Path, FileStamp]:
+        stamps = {}
+        for file in files:
+            try:
+                stat = file.stat()
+                old = previous.get(file, None)
+                if old and old[:2] == (stat.st_mtime_ns, stat.st_size):
+                    stamps[file] = old
+                else:
+                    stamps[file] = (stat.st_mtime_ns, stat.st_size, _hash_file(file))
+            except OSError:
+                continue
+        return stamps
+
+    @staticmethod
+    def _compare(snapshot: dict[Path, FileStamp], files: list[Path]) -> list[Path]:
+        removed = set(snapshot).difference(files)
+        changed = sorted(removed)
+        for file in files:
+            old = snapshot.get(file, None)
+            if old == None:
+                changed.append(file)
+                continue
+            try:
+                stat = file.stat()
+                if old[:2] == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                if _hash_file(file) != old[2]:
+                    changed.append(file)
+            except OSError:
+                changed.append(file)
+        return changed
@@ -21,6 +21,8 @@ from inkBoard.helpers import QuitInkboard, ConfigError, DashboardError, DeviceEr
 
 from . import util, const, _LOGGER
 from .settings import save_settings
+from .startup import async_setup_inkboard, StartupTimer
+from .reloadtracker import ReloadTracker
 
 from .tkinter import window, functions as tk_functions
 from .tkinter.builders import build_window
@@ -32,6 +34,12 @@ if TYPE_CHECKING:
     import inkBoard.helpers
 
 importer_thread = concurrent.futures.ThreadPoolExecutor(None,const.IMPORTER_THREADPOOL)
+reload_tracker = ReloadTracker()
+
+startup_timer: StartupTimer = None
+"Timer of the last started config"
+startup_report_file: Path = None
+"json file to write the startup timings to after each start, if set"
 
 
 def stop_designer():
@@ -73,6 +81,10 @@ async def async_unload_inkBoard(reload_modules: bool = False):
 
     await asyncio.sleep(0)
 
+    if stop_loop and hasattr(CORE, "integration_loader"):
+        ##inkBoard 0.2.6 does not stop integrations when reloading. They are stopped on their own loop, which is not running anymore since the thread finished.
+        await asyncio.to_thread(stop_loop.run_until_complete, CORE.integration_loader.async_stop_integrations(CORE))
+
     if hasattr(CORE,"screen"):
         for task in asyncio.all_tasks(CORE.screen.mainLoop):
             task.cancel()
@@ -94,21 +106,36 @@ def unload_inkBoard(reload_modules: bool = False):
     return t
 
 async def reload_config(config, full_reload: bool = False):
-    await unload_inkBoard(True)
+    """Reloads the config. Only does a full reload if requested, or if it is unknown what changed since the config was loaded.
+    Otherwise the inkBoard core and custom modules are reloaded, and only the integrations whose files changed are imported again.
+
+    The screen and the integration objects are always set up again, so integrations with a connection (like the Home Assistant client) reconnect and get all their states again.
+    """
+    changes = await asyncio.to_thread(reload_tracker.get_changes, config)
+    if changes == None:
+        full_reload = True
+    elif not full_reload:
+        _LOGGER.info(f"Reloading {Path(config).name}: {changes.summary()}")
+        if changes.integrations:
+            from .integrationloader import IntegrationLoader
+            IntegrationLoader.mark_for_reload(*changes.integrations)
+
+    await unload_inkBoard(full_reload)
     window.set_progress_bar(value=-1)
     window._mainLoop.create_task(run_inkboard_config(config))
 
 async def run_inkboard_thread(config_file):
     
+    global startup_timer
     reload_finally = True
+    timer = StartupTimer()
     try:
         config_path = Path(config_file)
-        config_folder = config_path.parent.absolute()
-        custom_folder = config_folder / "custom"
 
         if window._inkBoard_lock.locked():
             _LOGGER.warning("Attempting to run new inkBoard thread before the last one has fully shut down.")
 
+        timer.start_phase("Acquiring resources")
         window.set_progress_bar(1, text="Acquiring resources", title=f"Loading {config_path.name}")
         tkthread.call_nosync(window.configLabel.configure, 
                             text = config_path.name, cursor=const.INTERACT_CURSOR)
@@ -116,6 +143,7 @@ async def run_inkboard_thread(config_file):
         window._inkBoard_lock.acquire()
         window._inkBoard_clean = False
 
+        timer.start_phase("Importing base functions")
         window.set_progress_bar(5, "Importing base functions")
 
         from inkBoard import core as CORE
@@ -129,67 +157,22 @@ async def run_inkboard_thread(config_file):
         from inkBoard import bootstrap 
 
         from .integrationloader import IntegrationLoader
-        
-        CORE.integration_loader = IntegrationLoader
-
-        window.set_progress_bar(value=10, text="Gathering available integrations")
-        folders = {"custom.integrations": custom_folder / "integrations"} | const.INTEGRATION_DIRS
-
-        IntegrationLoader.get_integrations(folders)
-
-        window.set_progress_bar(value=20, text="Importing PythonScreenStackManager")
-
         from PythonScreenStackManager.exceptions import ReloadWarning, FullReloadWarning
 
-        window.set_progress_bar(value=25, text="Reading out base config")
-
-        CORE.config = bootstrap.setup_base_config(config_file)
-
-        bootstrap.setup_logging(CORE)
-
-        window.set_progress_bar(30, "Importing integrations")
-        CORE.integration_loader.import_integrations(CORE,window.set_progress_bar,(30,42))
-
-        ##Is there a reason to not do this after setting up the screen and stuff?
-        ##Except disallowing defining the screen outside of core
-        CORE.custom_functions = bootstrap.import_custom_functions(CORE)
-
-        bootstrap.import_custom_elements(CORE)
-
-        window.set_progress_bar(40, "Setting up styles")
-        bootstrap.setup_styles(CORE)
-        ##May seperate these. One for setting up color shorthands, one for setting up the actual styles.
-
-        ##Implement error catchers for these as well
-        window.set_progress_bar(42, "Setting up emulator device")
-        CORE.device = await bootstrap.setup_device(CORE)
-
-        window.set_progress_bar(45, "Setting up PythonScreenStackManager screen")
-        CORE.screen = await bootstrap.setup_screen(CORE)
-        screen = CORE.screen
-        screen.add_shorthand_function_group("custom", CORE.parse_custom_function)
-
-        # window.set_progress_bar(50, "Setting up styles")
-        # bootstrap.setup_styles(CORE)
-
-        window.set_progress_bar(52, "Setting up integrations")
-        max_integration_progress = 70
-        CORE.integration_objects = await IntegrationLoader.async_setup_integrations(CORE, window.set_progress_bar, 
-                                                                                (window._progressBar["value"],max_integration_progress))
-
-        window.set_progress_bar(max_integration_progress, "Setting up dashboard")
-        main_layout = bootstrap.setup_dashboard_config(CORE)
-
-        window.set_progress_bar(75, "Readying screen")
-        screen.clear()
-        screen.start_batch_writing()
+        await async_setup_inkboard(CORE, config_file, IntegrationLoader, bootstrap.setup_device, window.set_progress_bar,
+                                importer_thread, timer)
 
-        window.set_progress_bar(77, "Starting integrations")
-        await IntegrationLoader.async_start_integrations(CORE)
+        timer.finish(config_file)
+        timer.log()
+        startup_timer = timer
+        if startup_report_file:
+            try:
+                timer.save_json(startup_report_file)
+            except OSError as exce:
+                _LOGGER.warning(f"Unable to save startup timings to {startup_report_file}: {exce}")
 
-        window.set_progress_bar(90, "Preparing screen and elements for printing")
-        await screen.async_add_element(main_layout, skipPrint=True)
-        screen.stop_batch_writing()
+        ##Snapshot is taken before printing, so changes made while running are picked up by the next reload
+        await asyncio.to_thread(reload_tracker.track, config_file, IntegrationLoader.imported_integrations)
 
         window.set_progress_bar(95, "Starting printing")
 
@@ -281,7 +264,10 @@ async def async_run_designer(args):
     ##Settings for logging: same as run
     ##Config command: not required. For now, do not load anything if so, but will provide an option to open on the last opened config by default
 
+    global startup_report_file
     threading.excepthook = util.threading_except_hook
+    if getattr(args, "startup_report", None):
+        startup_report_file = Path(args.startup_report)
     tk_functions.runners = sys.modules[__name__]
 
     window = build_window()
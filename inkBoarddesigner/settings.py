@@ -10,10 +10,14 @@ logger = logging.getLogger(__name__)
 EM_SETTINGS_FILE = Path(__file__).parent / "files" / "settings.ini"
 "json file to save the emulator settings to."
 
+MANIFEST_INDEX_FILE = Path(__file__).parent / "files" / "manifest_index.json"
+"json file caching the integration manifests found in integration folders, keyed by folder path and modification time."
+
 DEFAULT_EM_SETTINGS = {
                     const.DARKMODE_VAR_NAME: False, 
                     const.SAVEAS_VAR_NAME: False, 
                     const.HIGHLIGHT_VAR_NAME: False, 
+                    const.PROFILER_VAR_NAME: False,
                     const.LIST_VAR_NAME: "None", 
                     "backlight": False, 
                     "battery_rnd": False, 
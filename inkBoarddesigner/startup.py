@@ -0,0 +1,213 @@
+"""
+Bootstrap steps to set up an inkBoard instance from a config file.
+Shared by the designer window and the headless emulator, so this module must not import anything from tkinter.
+"""
+
+import json
+import time
+from datetime import datetime as dt
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Awaitable, Optional, Union
+
+from . import const, _LOGGER, __version__
+
+if TYPE_CHECKING:
+    import concurrent.futures
+    from inkBoard import core as CORE, loaders
+    from inkBoard.platforms import BaseDevice
+    from PythonScreenStackManager.elements import Layout
+
+ProgressFunc = Callable[[float, Optional[str]], None]
+
+def _no_progress(value, text=None):
+    return
+
+class StartupTimer:
+    """Times the phases of setting up inkBoard with a monotonic clock.
+
+    Starting a phase finishes the previous one. The timer starts when it is instantiated.
+    """
+
+    def __init__(self):
+        self._start = time.monotonic()
+        self._started = dt.now()
+        self._phases: list[dict] = []
+        self._currentPhase: Optional[str] = None
+        self._phaseStart: float = self._start
+        self._total: Optional[float] = None
+        self._config: Optional[str] = None
+
+    #region
+    @property
+    def finished(self) -> bool:
+        "Whether the timer has been stopped"
+        return self._total != None
+
+    @property
+    def total(self) -> float:
+        "Total time, in seconds, since the timer started, or until it finished"
+        if self._total != None:
+            return self._total
+        return time.monotonic() - self._start
+    #endregion
+
+    def start_phase(self, name: str):
+        "Finishes the current phase, and starts timing a new one"
+        now = time.monotonic()
+        self._end_phase(now)
+        self._currentPhase = name
+        self._phaseStart = now
+
+    def finish(self, config: Union[str, Path] = None):
+        "Finishes the current phase and stops the timer"
+        now = time.monotonic()
+        self._end_phase(now)
+        self._total = now - self._start
+        if config:
+            self._config = Path(config).name
+
+    def _end_phase(self, now: float):
+        if self._currentPhase == None or self.finished:
+            return
+        self._phases.append({
+            "name": self._currentPhase,
+            "start": self._phaseStart - self._start,
+            "duration": now - self._phaseStart
+        })
+        self._currentPhase = None
+
+    def report(self) -> dict:
+        "Returns the timings as a dict, holding the config, versions, total time and the start and duration of each phase, in seconds"
+        from inkBoard import __version__ as ib_version
+        return {
+            "config": self._config,
+            "started": self._started.isoformat(timespec="seconds"),
+            "inkBoard_version": ib_version,
+            "designer_version": __version__,
+            "total": self.total,
+            "phases": [phase.copy() for phase in self._phases]
+        }
+
+    def log(self):
+        "Logs the duration of each phase"
+        lines = [f"{p['name']}: {p['duration']*1000:.0f}ms" for p in self._phases]
+        _LOGGER.info(f"Startup of {self._config or 'config'} took {self.total:.2f}s\n  " + "\n  ".join(lines))
+
+    def save_json(self, file: Union[str, Path]):
+        "Writes the report to a json file"
+        with open(file, "w") as f:
+            json.dump(self.report(), f, indent=4)
+        _LOGGER.info(f"Saved startup timings to {file}")
+
+async def async_setup_inkboard(core: "CORE", config_file: Union[str, Path],
+                            integration_loader: type["loaders.IntegrationLoader"],
+                            setup_device: Callable[["CORE"], Awaitable["BaseDevice"]],
+                            progress_func: ProgressFunc = None,
+                            import_executor: "concurrent.futures.Executor" = None,
+                            timer: StartupTimer = None) -> "Layout":
+    """Sets up the config, device, screen, integrations and dashboard of an inkBoard instance.
+
+    When this returns, the screen holds the main layout and `inkBoard.bootstrap.run_core` can be called to start printing.
+
+    Parameters
+    ----------
+    core : CORE
+        The inkBoard core module
+    config_file : Union[str, Path]
+        The YAML file with the configuration
+    integration_loader : type[loaders.IntegrationLoader]
+        The loader used to find, import and set up integrations
+    setup_device : Callable[[CORE], Awaitable[BaseDevice]]
+        Coroutine function that returns the device instance to use
+    progress_func : ProgressFunc, optional
+        Function called with the progress (0-100) and a description of the current step, by default None
+    import_executor : concurrent.futures.Executor, optional
+        Executor to import integrations on concurrently, by default None. Only used if the integration loader supports it.
+    timer : StartupTimer, optional
+        Timer to time each setup phase with, by default None. It is not finished when this returns.
+
+    Returns
+    -------
+    Layout
+        The main layout of the dashboard
+    """
+
+    from inkBoard import bootstrap
+
+    if progress_func == None:
+        progress_func = _no_progress
+
+    def phase(name: str, progress: float = None):
+        if timer != None:
+            timer.start_phase(name)
+        if progress != None:
+            progress_func(progress, name)
+
+    config_path = Path(config_file)
+    custom_folder = config_path.parent.absolute() / "custom"
+
+    core.integration_loader = integration_loader
+
+    phase("Gathering available integrations", 10)
+    folders = {"custom.integrations": custom_folder / "integrations"} | const.INTEGRATION_DIRS
+
+    integration_loader.get_integrations(folders)
+
+    phase("Importing PythonScreenStackManager", 20)
+
+    import PythonScreenStackManager
+
+    phase("Reading out base config", 25)
+
+    core.config = bootstrap.setup_base_config(config_file)
+
+    bootstrap.setup_logging(core)
+
+    phase("Importing integrations", 30)
+    if import_executor != None:
+        core.integration_loader.import_integrations(core, progress_func, (30,42), executor=import_executor)
+    else:
+        core.integration_loader.import_integrations(core, progress_func, (30,42))
+
+    ##Is there a reason to not do this after setting up the screen and stuff?
+    ##Except disallowing defining the screen outside of core
+    phase("Importing custom functions")
+    core.custom_functions = bootstrap.import_custom_functions(core)
+
+    phase("Importing custom elements")
+    bootstrap.import_custom_elements(core)
+
+    phase("Setting up styles", 40)
+    bootstrap.setup_styles(core)
+    ##May seperate these. One for setting up color shorthands, one for setting up the actual styles.
+
+    ##Implement error catchers for these as well
+    phase("Setting up emulator device", 42)
+    core.device = await setup_device(core)
+
+    phase("Setting up PythonScreenStackManager screen", 45)
+    core.screen = await bootstrap.setup_screen(core)
+    screen = core.screen
+    screen.add_shorthand_function_group("custom", core.parse_custom_function)
+
+    phase("Setting up integrations", 52)
+    max_integration_progress = 70
+    core.integration_objects = await integration_loader.async_setup_integrations(core, progress_func,
+                                                                            (52,max_integration_progress))
+
+    phase("Setting up dashboard", max_integration_progress)
+    main_layout = bootstrap.setup_dashboard_config(core)
+
+    phase("Readying screen", 75)
+    screen.clear()
+    screen.start_batch_writing()
+
+    phase("Starting integrations", 77)
+    await integration_loader.async_start_integrations(core)
+
+    phase("Preparing screen and elements for printing", 90)
+    await screen.async_add_element(main_layout, skipPrint=True)
+    screen.stop_batch_writing()
+
+    _LOGGER.debug(f"inkBoard set up from {config_path.name}")
+    return main_layout
@@ -166,6 +166,11 @@ def build_settings_frame(interface_frame: ttk.Frame):
                         text="Highlight", tiptext=const.HIGHLIGHT_TIP, var=hlVar)
     hlFrame.grid(row=1,column=0, sticky="e",padx=const.SETTINGS_PADDING)
 
+    profVar = window.profiler_variable
+    profFrame = build_label_toggle(settFrame,(const.SETTINGS_WIDTH, int(const.SETTINGS_HEIGHT/2)), 
+                        text="Profiler", tiptext=const.PROFILER_TIP, var=profVar, command=tk_functions.toggle_profiler)
+    profFrame.grid(row=2,column=1, sticky="e",padx=const.SETTINGS_PADDING)
+
     blVar = tk.BooleanVar(window, value=EM_SETTINGS.getboolean("backlight"), name="backlight")
     blFrame = build_label_icon(settFrame,(const.SETTINGS_WIDTH, int(const.SETTINGS_HEIGHT/2)), 
                         text="Config", tiptext=const.CONFIG_OPTIONS_TIP, command=tk_functions.open_config_window)
@@ -212,6 +217,19 @@ def build_tree_frame(frame: ttk.Frame):
     
     treeFrame._base_trees[const.ELEMENT_TREE_OPTION.lower()] = element_treeview
     treeFrame._element_tree = element_treeview
+
+    profiler_columns = ("area", "generate", "print", "wait")
+    profiler_treeview = Treeview(ttk.Treeview(columns=profiler_columns,))
+    profiler_treeview.heading("#0", text="Element", anchor="w")
+    profiler_treeview.column("#0", width= floor(const.INTERFACE_WIDTH*0.3))
+    profiler_treeview.heading("area", text="Area", anchor="w")
+    profiler_treeview.column("area", width= floor(const.INTERFACE_WIDTH*0.25))
+    for col in profiler_columns[1:]:
+        profiler_treeview.heading(col, text=col.title(), anchor="e")
+        profiler_treeview.column(col, width= floor(const.INTERFACE_WIDTH*0.15), anchor="e")
+
+    treeFrame._base_trees[const.PROFILER_TREE_OPTION.lower()] = profiler_treeview
+    treeFrame._profiler_tree = profiler_treeview
     return
 
 
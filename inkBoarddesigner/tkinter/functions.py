@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from pathlib import Path
 from typing import *
@@ -223,6 +224,84 @@ def save_image(img: Image.Image, base_name: str = "Inkboard_Screenshot_"):
     img.save(filename)
     _LOGGER.info(f"Screenshot saved as {filename}")
 
+def export_refresh_profile(*args):
+    "Exports the timings collected by the refresh profiler of the emulated device to a csv file."
+    profiler = getattr(getattr(CORE, "device", None), "profiler", None)
+    if profiler == None:
+        _LOGGER.warning("No device is being emulated, cannot export the refresh budget")
+        return
+
+    date = dt.now().strftime("%Y_%m_%d_%H%M%S")
+    files = [("CSV", "*.csv")]
+    file = asksaveasfile(filetypes = files, defaultextension = files,
+                        initialdir=CORE.config.baseFolder, initialfile=f"refresh_budget_{date}")
+    if file == None:
+        return
+    file.close()
+    profiler.export_csv(file.name)
+
+def toggle_profiler(*args):
+    "Hooks the refresh profiler of the emulated device in or out, based on the value of the profiler variable"
+    profiler = getattr(getattr(CORE, "device", None), "profiler", None)
+    if profiler == None or not hasattr(CORE, "screen"):
+        return
+
+    ##The hooks replace methods used by the inkBoard thread, so they are changed in its loop
+    if window.profiler_variable.get():
+        CORE.screen.mainLoop.call_soon_threadsafe(profiler.install, CORE.screen)
+    else:
+        CORE.screen.mainLoop.call_soon_threadsafe(profiler.uninstall)
+
+def toggle_touch_recording(*args) -> str:
+    """Starts or stops recording touches on the emulated device. When stopping, asks where to save the touch script.
+    Returns the text for the record button."""
+    recorder = getattr(getattr(CORE, "device", None), "touchRecorder", None)
+    if recorder == None:
+        _LOGGER.warning("No device is being emulated, cannot record touches")
+        return "Record Touches"
+
+    if not recorder.recording:
+        recorder.start()
+        return "Stop Recording"
+
+    recorder.stop()
+    date = dt.now().strftime("%Y_%m_%d_%H%M%S")
+    files = [("JSON", "*.json")]
+    file = asksaveasfile(filetypes = files, defaultextension = files,
+                        initialdir=CORE.config.baseFolder, initialfile=f"touches_{date}")
+    if file != None:
+        file.close()
+        recorder.save(file.name)
+    return "Record Touches"
+
+def replay_touches(*args, speed: Optional[float] = 1):
+    """Asks for a touch script and replays it on the emulated device. The latency report is logged when done.
+
+    Parameters
+    ----------
+    speed : Optional[float], optional
+        Speed to replay at, by default 1. None replays as fast as possible.
+    """
+    device = getattr(CORE, "device", None)
+    if not hasattr(device, "replay_touches") or not hasattr(CORE, "screen"):
+        _LOGGER.warning("No device is being emulated, cannot replay touches")
+        return
+
+    from ..emulator.touchreplay import load_touch_script
+
+    file = askopenfile(filetypes=[("JSON", "*.json")], initialdir=CORE.config.baseFolder)
+    if file == None:
+        return
+    file.close()
+
+    try:
+        script = load_touch_script(file.name)
+    except (ValueError, AssertionError, KeyError) as exce:
+        _LOGGER.error(f"Invalid touch script {file.name}: {exce}")
+        return
+
+    asyncio.run_coroutine_threadsafe(device.replay_touches(script, speed), CORE.screen.mainLoop)
+
 def make_package(*args):
     ##Will extend this later to include dealing saveas screens etc.
 
@@ -260,9 +339,26 @@ def open_device_window(event):
     return
 
 def open_config_window(event):
-    windows.ConfigWindow(CORE)
+    windows.ConfigWindow(CORE, runners.startup_timer)
     return
 
+def export_startup_timings(*args):
+    "Exports the startup timings of the last started config to a json file."
+    timer = runners.startup_timer
+    if timer == None:
+        _LOGGER.warning("No config has been started yet, cannot export startup timings")
+        return
+
+    date = dt.now().strftime("%Y_%m_%d_%H%M%S")
+    files = [("JSON", "*.json")]
+    initialdir = CORE.config.baseFolder if hasattr(CORE, "config") else None
+    file = asksaveasfile(filetypes = files, defaultextension = files,
+                        initialdir=initialdir, initialfile=f"startup_timings_{date}")
+    if file == None:
+        return
+    file.close()
+    timer.save_json(file.name)
+
 
 def set_slider_left_click(event : tk.Event):
     """Sets a sliders position when left clicking by simulating a right click. Bind this function to a sliders left click to do so."""
@@ -27,6 +27,8 @@ if TYPE_CHECKING:
     from PythonScreenStackManager.elements import Element
     from inkBoarddesigner.emulator.device import Device
     from inkBoard import core
+    from inkBoarddesigner.startup import StartupTimer
+    from inkBoarddesigner.emulator.profiler import UpdateRecord
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -80,6 +82,7 @@ class DesignerWindow(ttk.Window):
         self._darkmode_variable = tk.BooleanVar(self, value=EM_SETTINGS.getboolean(const.DARKMODE_VAR_NAME), name=const.DARKMODE_VAR_NAME)
         self._saveasvariable = tk.BooleanVar(self, value=EM_SETTINGS.getboolean(const.SAVEAS_VAR_NAME), name=const.SAVEAS_VAR_NAME)
         self._hightlight_variable = tk.BooleanVar(self, value=EM_SETTINGS.getboolean(const.HIGHLIGHT_VAR_NAME), name=const.HIGHLIGHT_VAR_NAME)
+        self._profiler_variable = tk.BooleanVar(self, value=EM_SETTINGS.getboolean(const.PROFILER_VAR_NAME), name=const.PROFILER_VAR_NAME)
 
         self._tree_list_variable = ttk.StringVar(self, name=const.LIST_VAR_NAME, 
                                                 value=const.NO_TREE_OPTION)
@@ -102,7 +105,7 @@ class DesignerWindow(ttk.Window):
 
         self.interface_buttons : list[ttk.Button] = []
 
-        vars = (self._darkmode_variable, self._saveasvariable, self._hightlight_variable, self._tree_list_variable)
+        vars = (self._darkmode_variable, self._saveasvariable, self._hightlight_variable, self._profiler_variable, self._tree_list_variable)
 
         for var in vars:
             var.trace_add("write", self.trace_variable)
@@ -135,6 +138,11 @@ class DesignerWindow(ttk.Window):
     def darkmode_variable(self) -> tk.BooleanVar:
         "Variable tracking if darkmode is on"
         return self._darkmode_variable
+
+    @property
+    def profiler_variable(self) -> tk.BooleanVar:
+        "Variable tracking if the refresh profiler times element updates"
+        return self._profiler_variable
     
     @property
     def tree_list_variable(self) -> ttk.StringVar:
@@ -415,6 +423,7 @@ class TreeFrame(ttk.Frame):
         super().__init__(master, **kwargs)
 
         self._base_trees = {"none": None}
+        self._profiler_records: dict[str,"UpdateRecord"] = {}
         
         self.__current_tree_option = "none"
         self.__tree = None
@@ -428,7 +437,7 @@ class TreeFrame(ttk.Frame):
                                 style=const.SCROLLBAR_STYLE)
         self.__scrollbar = scrollbar
 
-        self.__base_options = (const.NO_TREE_OPTION, const.ELEMENT_TREE_OPTION)
+        self.__base_options = (const.NO_TREE_OPTION, const.ELEMENT_TREE_OPTION, const.PROFILER_TREE_OPTION)
         self.list_menu["values"] = self.__base_options
         self.list_menu.bind('<<ComboboxSelected>>', self._select_tree)
         
@@ -475,6 +484,16 @@ class TreeFrame(ttk.Frame):
     @property
     def element_tree(self) -> Treeview:
         return self._element_tree
+
+    @property
+    def profiler_tree(self) -> Treeview:
+        "Tree showing the timings of element updates"
+        return self._profiler_tree
+
+    @property
+    def profiler_records(self) -> dict[str,"UpdateRecord"]:
+        "The profiler records shown in the profiler tree, by their iid"
+        return self._profiler_records
     #endregion
 
     def _select_tree(self, event: tk.Event):
@@ -555,6 +574,9 @@ class TreeFrame(ttk.Frame):
         self.list_menu["values"] = self.__base_options
         self._element_tree: Treeview
         self._element_tree.delete(*self._element_tree.get_children())
+        self._profiler_tree.delete(*self._profiler_tree.get_children())
+        ##Records hold the elements of the config that was unloaded
+        self._profiler_records.clear()
 
     def _setup(self):
         
@@ -717,11 +739,34 @@ class DeviceWindow(_AdditionalWindow):
         textw.grid(sticky=ttk.NSEW, pady=(5,10),
                 row=0, column=0, columnspan=feature_col)
 
+        if hasattr(device, "profiler"):
+            button_frame = ttk.Frame(self)
+            button_frame.grid(row=2, column=0, columnspan=max(feature_col,1), pady=(0,10))
+
+            export_button = ttk.Button(button_frame,text="Export Refresh Budget", command=tk_functions.export_refresh_profile)
+            export_button.pack(side=tk.LEFT, padx=5)
+            ToolTip(export_button,const.PROFILER_EXPORT_TIP, const.TOOLTIP_STYLE)
+
+            record_text = "Stop Recording" if device.touchRecorder.recording else "Record Touches"
+            record_button = ttk.Button(button_frame,text=record_text)
+            record_button.configure(command=lambda: record_button.configure(text=tk_functions.toggle_touch_recording()))
+            record_button.pack(side=tk.LEFT, padx=5)
+            ToolTip(record_button,const.TOUCH_RECORD_TIP, const.TOOLTIP_STYLE)
+
+            replay_button = ttk.Button(button_frame,text="Replay Touches", command=tk_functions.replay_touches)
+            replay_button.pack(side=tk.LEFT, padx=5)
+            ToolTip(replay_button,const.TOUCH_REPLAY_TIP, const.TOOLTIP_STYLE)
+
+            benchmark_button = ttk.Button(button_frame,text="Benchmark Touches", command=lambda: tk_functions.replay_touches(speed=None))
+            benchmark_button.pack(side=tk.LEFT, padx=5)
+            ToolTip(benchmark_button,const.TOUCH_BENCHMARK_TIP, const.TOOLTIP_STYLE)
+
     def create_device_text(self, device: "Device"):
         text = f"{device.model}"
         
         attr_list = {"Platform": "_emulated_platform", "Model": "model", "Screen type": "screenType", 
-                    "Width": "width", "Height": "height"}
+                    "Width": "width", "Height": "height",
+                    "Frames presented": "framesPresented", "Frames dropped": "framesDropped"}
 
         for t, attr in attr_list.items():
             val = getattr(device,attr,None)
@@ -737,6 +782,13 @@ class DeviceWindow(_AdditionalWindow):
         
         text = f"{text}\n    Features: {feature_text}"
 
+        refresh_model = getattr(device, "refreshCostModel", None)
+        if refresh_model != None and refresh_model.enabled:
+            report = refresh_model.report()
+            refresh_text = ", ".join(f"{waveform}: {count}" for waveform, count in report["refreshes"].items())
+            text = f"{text}\n    Panel refresh time: {report['refresh_time']:.2f}s ({report['duty_cycle']:.1%} of {report['elapsed']:.0f}s)"
+            text = f"{text}\n    Refreshes: {refresh_text or 'None'}"
+
         return text
     
     def add_seperator(self, row, col):
@@ -745,13 +797,14 @@ class DeviceWindow(_AdditionalWindow):
 
 class ConfigWindow(_AdditionalWindow):
 
-    def __init__(self, core: "core", **kwargs):
+    def __init__(self, core: "core", startup_timer: "StartupTimer" = None, **kwargs):
         ##Need to determine what to show in this window
         ##At least: config name; platform; loaded integrations
         ##Also: allow for installing integration/platform requirements from here
         ##Likely: also the ui to run examples
 
         self._core = core
+        self._startupTimer = startup_timer
 
         super().__init__("Configuration", **kwargs)
         label = ttk.Label(self, text=self.gather_integrations(), 
@@ -760,6 +813,30 @@ class ConfigWindow(_AdditionalWindow):
 
         label.pack()
 
+        if startup_timer != None and startup_timer.finished:
+            self.build_startup_timings()
+
+    def build_startup_timings(self):
+        "Builds the list with the duration of each phase of the last startup"
+        report = self._startupTimer.report()
+
+        ttk.Label(self, text=f"Startup took {report['total']:.2f}s").pack(pady=(10,0))
+
+        tree = ttk.Treeview(self, columns=("start", "duration"), height=min(len(report["phases"]), 20))
+        tree.heading("#0", text="Phase", anchor=tk.W)
+        tree.heading("start", text="Start (ms)")
+        tree.heading("duration", text="Duration (ms)")
+        tree.column("start", width=80, anchor=tk.E)
+        tree.column("duration", width=100, anchor=tk.E)
+        for phase in report["phases"]:
+            tree.insert("", tk.END, text=phase["name"],
+                        values=(f"{phase['start']*1000:.0f}", f"{phase['duration']*1000:.0f}"))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        export_button = ttk.Button(self, text="Export Startup Timings", command=tk_functions.export_startup_timings)
+        export_button.pack(pady=(0,10))
+        ToolTip(export_button,const.STARTUP_EXPORT_TIP, const.TOOLTIP_STYLE)
+
     def gather_integrations(self):
         if not hasattr(self._core, "config"):
             text = "No config loaded"